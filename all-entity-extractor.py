@@ -1,129 +1,176 @@
+import argparse
+import csv
 import json
+import math
 import os
 import sys
+import time
+from array import array
 from pathlib import Path
-from collections import defaultdict
-
-# Define entity tags mapping
-ENTITY_TAGS = {
-    0: "B_AGE",                   23: "I_AGE",
-    1: "B_STAGE",                 24: "I_STAGE",
-    2: "B_DATE",                  25: "I_DATE",
-    3: "B_IMPLICIT_DATE",         26: "I_IMPLICIT_DATE",
-    4: "B_TNM",                   27: "I_TNM",
-    5: "B_FAMILY",                28: "I_FAMILY",
-    6: "B_OCURRENCE_EVENT",       29: "I_OCURRENCE_EVENT",
-    7: "B_TOXIC_HABITS",          30: "I_TOXIC_HABITS",
-    8: "B_HABIT-QUANTITY",        31: "I_HABIT-QUANTITY",
-    9: "B_TREATMENT_NAME",        32: "I_TREATMENT_NAME",
-    10: "B_LINE_CICLE_NUMBER",    33: "I_LINE_CICLE_NUMBER",
-    11: "B_SURGERY",              34: "I_SURGERY",
-    12: "B_DRUG",                 35: "I_DRUG",
-    13: "B_DOSE",                 36: "I_DOSE",
-    14: "B_FREQ",                 37: "I_FREQ",
-    15: "B_BIOMARKER",            38: "I_BIOMARKER",
-    16: "B_CLINICAL_SERVICE",     39: "I_CLINICAL_SERVICE",
-    17: "B_COMORBIDITY",          40: "I_COMORBIDITY",
-    18: "B_PROGRESION",           41: "I_PROGRESION",
-    19: "B_GINECOLOGICAL_HISTORY", 42: "I_GINECOLOGICAL_HISTORY",
-    20: "B_GINE_OBSTETRICS",      43: "I_GINE_OBSTETRICS",
-    21: "B_ALLERGIES",            44: "I_ALLERGIES",
-    22: "B_DURATION",             45: "I_DURATION",
-    46: "B-CANCER_CONCEPT",       47: "I-CANCER_CONCEPT",
-}
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, repeat
+
+from corpus_bin import CorpusBin, es_corpus_bin
+from entity_sketch import SKETCH_DEPTH, SKETCH_WIDTH, TOP_K, EntitySketch
+from tag_schema import TAG_SCHEMA
+from vocabulary import Vocabulary
+
+# Frases de entidad internadas: cada frase distinta se guarda una sola vez aunque
+# aparezca en los Counter de muchos archivos y en el total
+PHRASES = Vocabulary()
 
 # Get entity type from tag number
 def get_entity_type(tag_num):
-    # Get base entity type by removing B_ or I_ prefix
-    tag_name = ENTITY_TAGS.get(tag_num, "UNKNOWN")
-    if tag_name.startswith("B_") or tag_name.startswith("B-"):
-        return tag_name[2:]
-    elif tag_name.startswith("I_") or tag_name.startswith("I-"):
-        return tag_name[2:]
-    return tag_name
+    return TAG_SCHEMA.entity_type(tag_num)
 
 # Get beginning tag for entity type
 def get_beginning_tag(entity_type):
-    for tag_num, tag_name in ENTITY_TAGS.items():
-        if (tag_name == f"B_{entity_type}" or 
-            tag_name == f"B-{entity_type}") and tag_num % 23 == tag_num % 24:
-            return tag_num
-    return None
+    return TAG_SCHEMA.beginning_tag(entity_type)
 
 # Get inside tag for entity type
 def get_inside_tag(entity_type):
-    for tag_num, tag_name in ENTITY_TAGS.items():
-        if tag_name == f"I_{entity_type}" or tag_name == f"I-{entity_type}":
-            return tag_num
-    return None
+    return TAG_SCHEMA.inside_tag(entity_type)
 
-def print_results(files_entities, all_entities):
-    """
-    Imprime los resultados del análisis de entidades por archivo y el total de entidades únicas.
-    
-    Args:
-        files_entities (dict): Diccionario con archivos y sus entidades agrupadas por tipo
-        all_entities (dict): Diccionario con todas las entidades únicas agrupadas por tipo
-    """
-    print("\n=== RESULTADOS POR ARCHIVO ===")
+# Caracteres acumulados antes de cada escritura del informe
+REPORT_BUFFER = 1 << 16
+
+def write_buffered(stream, chunks, buffer_size=REPORT_BUFFER):
+    """Escribe los fragmentos de texto de `chunks` agrupados en escrituras de ~buffer_size caracteres."""
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            stream.write(''.join(buffer))
+            buffer.clear()
+            size = 0
+    if buffer:
+        stream.write(''.join(buffer))
+
+def sort_phrases(entities):
+    """Ordena una sola vez las frases de cada tipo: tipo -> lista ordenada, por tipo."""
+    return {entity_type: sorted(phrases) for entity_type, phrases in sorted(entities.items())}
+
+def _numbered(phrases, indent):
+    return ''.join([f'{indent}{i}. "{phrase}"\n' for i, phrase in enumerate(phrases, 1)])
+
+def _report_chunks(files_entities, sorted_totals):
+    yield "\n=== RESULTADOS POR ARCHIVO ===\n"
     for filename, entity_types in files_entities.items():
-        print(f"\nArchivo: {filename}")
-        
+        yield f"\nArchivo: {filename}\n"
         for entity_type, phrases in sorted(entity_types.items()):
-            print(f"\n  {entity_type}:")
             if phrases:
-                for i, phrase in enumerate(sorted(phrases), 1):
-                    print(f"    {i}. \"{phrase}\"")
+                yield f"\n  {entity_type}:\n" + _numbered(sorted(phrases), "    ")
             else:
-                print(f"    No se encontraron entidades de tipo {entity_type} en este archivo.")
+                yield f"\n  {entity_type}:\n    No se encontraron entidades de tipo {entity_type} en este archivo.\n"
     
-    print("\n=== ENTIDADES ENCONTRADAS POR TIPO ===")
+    yield "\n=== ENTIDADES ENCONTRADAS POR TIPO ===\n"
     total_entities = 0
-    
+    for entity_type, phrases in sorted_totals.items():
+        if phrases:
+            yield f"\n{entity_type}:\n" + _numbered(phrases, "  ") + f"  Total {entity_type}: {len(phrases)}\n"
+            total_entities += len(phrases)
+        else:
+            yield f"\n{entity_type}:\n  No se encontraron entidades de tipo {entity_type} en ningún archivo.\n"
+    yield f"\nTotal entidades encontradas: {total_entities}\n"
+
+def _summary_chunks(all_entities):
+    yield "\n=== RESUMEN POR TIPO ===\n"
+    total_entities = total_occurrences = 0
     for entity_type, phrases in sorted(all_entities.items()):
-        print(f"\n{entity_type}:")
+        occurrences = sum(phrases.values())
+        yield f"  {entity_type}: {len(phrases)} entidades distintas, {occurrences} apariciones\n"
+        total_entities += len(phrases)
+        total_occurrences += occurrences
+    yield f"\nTotal entidades encontradas: {total_entities} ({total_occurrences} apariciones)\n"
+
+def _text_file_chunks(sorted_totals):
+    yield "=== ENTIDADES ENCONTRADAS POR TIPO ===\n"
+    total_entities = 0
+    for entity_type, phrases in sorted_totals.items():
         if phrases:
-            for i, phrase in enumerate(sorted(phrases), 1):
-                print(f"  {i}. \"{phrase}\"")
-            print(f"  Total {entity_type}: {len(phrases)}")
+            yield f"\n{entity_type}:\n" + _numbered(phrases, "  ") + f"  Total {entity_type}: {len(phrases)}\n"
             total_entities += len(phrases)
         else:
-            print(f"  No se encontraron entidades de tipo {entity_type} en ningún archivo.")
+            yield f"\n{entity_type}:\n  No se encontraron entidades de tipo {entity_type}.\n"
+    yield f"\nTotal entidades encontradas: {total_entities}\n"
+
+def print_results(files_entities, all_entities, summary=False, sorted_totals=None, stream=None):
+    """
+    Imprime los resultados del análisis de entidades por archivo y el total de entidades únicas.
     
-    print(f"\nTotal entidades encontradas: {total_entities}")
+    El texto se genera por bloques y se escribe en escrituras grandes (write_buffered)
+    en lugar de con un print por frase.
+    
+    Args:
+        files_entities (dict): Diccionario con archivos y sus entidades agrupadas por tipo
+        all_entities (dict): Diccionario con todas las entidades únicas agrupadas por tipo
+            (Counter de frecuencias por tipo; aquí solo se listan las frases)
+        summary (bool): Imprimir solo cuántas entidades distintas y apariciones hay de cada tipo
+        sorted_totals (dict): Resultado de sort_phrases(all_entities), si ya se calculó
+        stream: Flujo de salida (por defecto, sys.stdout)
+    """
+    stream = stream or sys.stdout
+    if summary:
+        write_buffered(stream, _summary_chunks(all_entities))
+    else:
+        if sorted_totals is None:
+            sorted_totals = sort_phrases(all_entities)
+        write_buffered(stream, _report_chunks(files_entities, sorted_totals))
+    stream.flush()
+
+def write_text_report(sorted_totals, output_filename):
+    """Escribe el informe de texto (listas numeradas por tipo) a partir de sort_phrases()."""
+    with open(output_filename, 'w', encoding='utf-8') as f:
+        write_buffered(f, _text_file_chunks(sorted_totals))
 
-def extract_entities(sentencia, tag):
+def extract_entities(sentencia, tag, schema=TAG_SCHEMA):
     """
     Extrae entidades de una sentencia y sus etiquetas.
     
     Args:
-        sentencia (list): Lista de palabras en la sentencia
-        tag (list): Lista de etiquetas correspondientes a cada palabra
+        sentencia (list): Lista de palabras en la sentencia (o una vocabulary.TokenView)
+        tag (list): Lista de etiquetas (enteros) correspondientes a cada palabra
+        schema (TagSchema): Tablas de consulta de etiquetas precompiladas
         
     Returns:
-        dict: Diccionario con entidades agrupadas por tipo
+        dict: Diccionario tipo -> Counter con la frecuencia de cada entidad
     """
-    entities_by_type = defaultdict(set)
+    try:
+        return _extract_int_entities(sentencia, tag, schema)
+    except TypeError:
+        # Etiquetas que no son int (1.0 en un JSON escrito con floats): se convierten con
+        # el mismo criterio que la consulta `in ENTITY_TAGS` original y se reintenta
+        if all(type(t) is int for t in tag):
+            raise
+        return _extract_int_entities(sentencia, [t if type(t) is int else schema.tag_id(t) for t in tag], schema)
+
+def _extract_int_entities(sentencia, tag, schema):
+    # Bucle de extract_entities para etiquetas int; con otras puede lanzar TypeError
+    entities_by_type = defaultdict(Counter)
+    size = schema.size
+    is_begin = schema.is_begin
+    inside_of = schema.inside_of
+    tag_type = schema.tag_type
+    type_names = schema.type_names
+    n = len(tag)
     i = 0
     
-    while i < len(tag):
+    while i < n:
+        t = tag[i]
         # Detectar si es una etiqueta de inicio (B_)
-        if tag[i] in ENTITY_TAGS and ENTITY_TAGS[tag[i]].startswith('B'):
-            entity_type = get_entity_type(tag[i])
-            inside_tag = get_inside_tag(entity_type)
-            
-            # Recolectar palabras de la entidad
-            entity_words = [sentencia[i]]
-            j = i + 1
+        if 0 <= t < size and is_begin[t]:
+            inside_tag = inside_of[t]
             
             # Continuar mientras sea una etiqueta inside (I_) del mismo tipo
-            while j < len(tag) and tag[j] == inside_tag:
-                entity_words.append(sentencia[j])
+            j = i + 1
+            while j < n and tag[j] == inside_tag:
                 j += 1
             
             # Agregar la entidad completa al conjunto correspondiente
-            if entity_words:
-                entities_by_type[entity_type].add(' '.join(entity_words))
+            entities_by_type[type_names[tag_type[t]]][' '.join(sentencia[i:j])] += 1
             
             i = j
         else:
@@ -131,41 +178,190 @@ def extract_entities(sentencia, tag):
             
     return entities_by_type
 
-def process_single_file(file_path):
+def extract_entities_batch(sentencias, tags, schema=TAG_SCHEMA):
     """
-    Procesa un único archivo JSON y extrae las entidades.
+    Extrae entidades de un lote de sentencias con el decodificador vectorizado de
+    bio_spans (requiere NumPy).
     
     Args:
-        file_path (str): Ruta al archivo JSON a procesar
+        sentencias (list): Lista con la lista de palabras de cada sentencia
+        tags (list): Lista con la lista de etiquetas de cada sentencia
+        schema (TagSchema): Tablas de consulta de etiquetas precompiladas
         
     Returns:
-        tuple: (dict con el archivo y sus entidades por tipo, dict con todas las entidades por tipo)
+        dict: Diccionario tipo -> Counter con la frecuencia de cada entidad
+    """
+    from bio_spans import decode_spans, pack_sentences, span_phrases
+    
+    flat_tags, offsets = pack_sentences(tags)
+    spans = decode_spans(flat_tags, offsets, schema)
+    tokens = list(chain.from_iterable(sentencias))
+    
+    entities_by_type = defaultdict(Counter)
+    for entity_type, phrase in span_phrases(spans, offsets, tokens, schema):
+        entities_by_type[entity_type][phrase] += 1
+    return entities_by_type
+
+def extract_entities_interned(ids, lengths, tags, vocabulary, schema=TAG_SCHEMA):
+    """
+    Extrae entidades de un lote guardado como columnas planas, con los tokens internados
+    en un vocabulario (requiere NumPy).
+    
+    Args:
+        ids (array): array('I') con los ids de los tokens de todas las sentencias
+        lengths (array): array('q') con la longitud de cada sentencia
+        tags (array): array('q') con las etiquetas de todas las sentencias
+        vocabulary (Vocabulary): Vocabulario con el que se internaron los tokens
+        schema (TagSchema): Tablas de consulta de etiquetas precompiladas
+        
+    Returns:
+        dict: Diccionario tipo -> Counter con la frecuencia de cada entidad
+    """
+    import numpy as np
+    from bio_spans import decode_spans, span_phrases
+    
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(np.frombuffer(lengths, dtype=np.int64), out=offsets[1:])
+    spans = decode_spans(np.frombuffer(tags, dtype=np.int64), offsets, schema)
+    
+    entities_by_type = defaultdict(Counter)
+    for entity_type, phrase in span_phrases(spans, offsets, vocabulary.view(ids), schema):
+        entities_by_type[entity_type][phrase] += 1
+    return entities_by_type
+
+def _extract_entities_bin(file_path, schema=TAG_SCHEMA):
+    """
+    Extrae las entidades de un corpus binario .nerbin mapeado en memoria con el
+    decodificador vectorizado, que trabaja directamente sobre las columnas de etiquetas
+    y offsets del archivo; solo se decodifican los tokens de cada span.
+    
+    Returns:
+        dict: Diccionario tipo -> Counter con la frecuencia de cada entidad
+    """
+    from bio_spans import decode_spans, span_phrases
+    
+    entities_by_type = defaultdict(Counter)
+    with CorpusBin(file_path) as corpus:
+        flat_tags, offsets = corpus.arrays()
+        offsets = offsets.astype('int64')
+        spans = decode_spans(flat_tags, offsets, schema)
+        del flat_tags
+        for entity_type, phrase in span_phrases(spans, offsets, corpus.tokens, schema):
+            entities_by_type[entity_type][phrase] += 1
+    return entities_by_type
+
+def iter_file_entities(file_path, batch=False):
+    """
+    Recorre un archivo JSON o .nerbin y genera sus entidades por partes: un diccionario
+    tipo -> Counter por línea, o uno para todo el archivo en modo lote. Las líneas mal
+    formadas se informan y se omiten; cualquier otro error de lectura se propaga.
+    
+    Args:
+        file_path (str): Ruta al archivo JSON o .nerbin
+        batch (bool): Decodificar todo el archivo en un solo lote vectorizado
     """
-    all_entities = defaultdict(set)
+    filename = os.path.basename(file_path)
+    if es_corpus_bin(file_path):
+        if batch:
+            yield _extract_entities_bin(file_path)
+        else:
+            with CorpusBin(file_path) as corpus:
+                for sentencia, tag in corpus:
+                    yield extract_entities(sentencia, tag)
+        return
+    
+    batch_vocabulary = Vocabulary()
+    batch_ids = array('I')
+    batch_lengths = array('q')
+    batch_tags = array('q')
+    
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            try:
+                data = json.loads(line.strip())
+                sentencia = data['sentencia']
+                tag = data['tag']
+            except json.JSONDecodeError as e:
+                print(f"Error al decodificar línea en {filename}: {e}")
+                continue
+            
+            if batch:
+                # En modo lote una longitud discrepante desalinearía todo el lote
+                if len(sentencia) != len(tag):
+                    print(f"Longitud discrepante entre sentencia y tag en {filename}, línea omitida")
+                    continue
+                start = len(batch_tags)
+                try:
+                    batch_tags.extend(tag)
+                except (TypeError, OverflowError):
+                    # Etiquetas que no son int de 64 bits (15.0, None...): se convierten
+                    # como en extract_entities; extend deja añadidas las anteriores
+                    del batch_tags[start:]
+                    batch_tags.extend(map(TAG_SCHEMA.tag_id, tag))
+                batch_vocabulary.extend(batch_ids, sentencia)
+                batch_lengths.append(len(tag))
+                continue
+            
+            # Extraer entidades de la línea actual
+            yield extract_entities(sentencia, tag)
+    
+    if batch:
+        yield extract_entities_interned(batch_ids, batch_lengths, batch_tags, batch_vocabulary)
+
+def _process_single_file_cached(file_path, batch, cache):
+    """process_single_file a través de la caché de etapas (ver stage_cache.py)."""
+    try:
+        key = cache.clave(file_path, 'entidades', version=2)
+    except OSError:
+        return process_single_file(file_path, batch=batch)
+    
+    found, entities = cache.obtener(key)
+    if not found:
+        files_entities, all_entities = process_single_file(file_path, batch=batch)
+        # Un archivo que no se pudo procesar no se guarda, para volver a informar del error
+        if files_entities:
+            cache.guardar(key, dict(all_entities))
+        return files_entities, all_entities
+    
+    files_entities = {os.path.basename(file_path): defaultdict(Counter, {t: Counter(p) for t, p in entities.items()})}
+    return files_entities, defaultdict(Counter, {t: Counter(p) for t, p in entities.items()})
+
+def process_single_file(file_path, batch=False, cache=None):
+    """
+    Procesa un único archivo JSON (o un corpus binario .nerbin) y cuenta sus entidades.
+    
+    Args:
+        file_path (str): Ruta al archivo JSON o .nerbin a procesar
+        batch (bool): Decodificar todas las líneas del archivo en un solo lote con
+            extract_entities_interned en lugar de línea a línea; el lote se guarda como
+            ids de un vocabulario y etiquetas en arrays, no como listas de str
+        cache (CacheEtapas): Si se indica, las entidades de un archivo cuyo contenido
+            no cambió se toman de la caché sin leerlo
+        
+    Returns:
+        tuple: (dict con el archivo y sus entidades por tipo, dict con todas las entidades
+            por tipo), ambos con un Counter de frecuencias por tipo
+    """
+    if cache is not None:
+        return _process_single_file_cached(file_path, batch, cache)
+    
+    all_entities = defaultdict(Counter)
     files_entities = {}
+    intern = PHRASES.intern
     
     try:
         filename = os.path.basename(file_path)
-        current_file_entities = defaultdict(set)
+        current_file_entities = defaultdict(Counter)
         
-        with open(file_path, 'r', encoding='utf-8') as file:
-            for line in file:
-                try:
-                    data = json.loads(line.strip())
-                    sentencia = data['sentencia']
-                    tag = data['tag']
-                    
-                    # Extraer entidades de la línea actual
-                    entities = extract_entities(sentencia, tag)
-                    
-                    # Actualizar entidades del archivo actual
-                    for entity_type, phrases in entities.items():
-                        current_file_entities[entity_type].update(phrases)
-                        all_entities[entity_type].update(phrases)
-                    
-                except json.JSONDecodeError as e:
-                    print(f"Error al decodificar línea en {filename}: {e}")
-                    continue
+        for entities in iter_file_entities(file_path, batch=batch):
+            # Actualizar entidades del archivo actual
+            for entity_type, phrases in entities.items():
+                file_counts = current_file_entities[entity_type]
+                total_counts = all_entities[entity_type]
+                for phrase, count in phrases.items():
+                    phrase = intern(phrase)
+                    file_counts[phrase] += count
+                    total_counts[phrase] += count
         
         files_entities[filename] = current_file_entities
     except Exception as e:
@@ -173,23 +369,170 @@ def process_single_file(file_path):
     
     return files_entities, all_entities
 
-def extract_entities_from_directory(directory_path='.'):
+def _process_file_chunk(file_paths, batch=False, cache=None):
+    """Procesa un bloque de archivos en un proceso trabajador y combina sus resultados."""
+    files_entities = {}
+    all_entities = defaultdict(Counter)
+    for file_path in file_paths:
+        file_results, file_entities = process_single_file(file_path, batch=batch, cache=cache)
+        files_entities.update(file_results)
+        for entity_type, phrases in file_entities.items():
+            all_entities[entity_type].update(phrases)
+    return files_entities, all_entities
+
+def _merge_entity_sets(left, right):
+    """Suma dos diccionarios tipo -> Counter de frases (un nodo de la reducción en árbol)."""
+    for entity_type, phrases in right.items():
+        left[entity_type].update(phrases)
+    return left
+
+def extract_entities_parallel(file_paths, workers, batch=False, cache=None):
     """
-    Extrae entidades de todos los archivos JSON en el directorio especificado.
+    Extrae entidades de una lista de archivos repartiéndolos en un pool de procesos.
+    
+    Cada trabajador procesa un bloque contiguo de archivos; los conjuntos parciales por
+    tipo se combinan después por parejas, nivel a nivel, dentro del mismo pool. El
+    resultado es idéntico al del recorrido secuencial, incluido el orden de los archivos.
+    
+    Args:
+        file_paths (list): Rutas de los archivos JSON a procesar
+        workers (int): Número de procesos
+        batch (bool): Usar el decodificador vectorizado por archivo
+        cache (CacheEtapas): Caché de etapas; cada trabajador la reabre sobre el mismo directorio
+        
+    Returns:
+        tuple: (dict con archivos y sus entidades por tipo, dict con todas las entidades por tipo)
+    """
+    files_entities = {}
+    if not file_paths:
+        return files_entities, defaultdict(Counter)
+    
+    # Varios bloques por trabajador para repartir mejor archivos de tamaño desigual
+    chunk_size = max(1, math.ceil(len(file_paths) / (workers * 4)))
+    chunks = [file_paths[i:i + chunk_size] for i in range(0, len(file_paths), chunk_size)]
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        partials = []
+        for chunk_files, chunk_entities in pool.map(_process_file_chunk, chunks, repeat(batch), repeat(cache)):
+            files_entities.update(chunk_files)
+            partials.append(chunk_entities)
+        
+        # Reducción en árbol: cada nivel une los parciales por parejas en paralelo
+        while len(partials) > 1:
+            merged = list(pool.map(_merge_entity_sets, partials[0::2], partials[1::2]))
+            if len(partials) % 2:
+                merged.append(partials[-1])
+            partials = merged
+    
+    return files_entities, partials[0]
+
+def _sketch_file_chunk(file_paths, batch, width, depth, top_k):
+    """Cuenta en un EntitySketch las entidades de un bloque de archivos, línea a línea."""
+    sketch = EntitySketch(width, depth, top_k)
+    for file_path in file_paths:
+        try:
+            for entities in iter_file_entities(file_path, batch=batch):
+                sketch.update(entities)
+        except Exception as e:
+            print(f"Error al procesar el archivo {os.path.basename(file_path)}: {e}")
+    return sketch
+
+def sketch_entities(file_paths, batch=False, workers=1, width=SKETCH_WIDTH, depth=SKETCH_DEPTH, top_k=TOP_K):
+    """
+    Cuenta aproximadamente las entidades de una lista de archivos con memoria fija
+    (Count-Min Sketch más las top_k entidades de cada tipo, ver entity_sketch.py).
+    
+    No se guardan entidades por archivo: cada línea se suma al sketch en cuanto se
+    decodifica. Con varios procesos cada uno cuenta un bloque de archivos en su propio
+    sketch y los sketches se suman al final; una entidad que no llega a candidata en
+    ningún bloque puede faltar del top-k combinado aunque su total la incluyera.
+    
+    Args:
+        file_paths (list): Rutas de los archivos JSON o .nerbin
+        batch (bool): Decodificar cada archivo como un lote vectorizado
+        workers (int): Número de procesos
+        width (int): Contadores por fila del sketch
+        depth (int): Filas del sketch
+        top_k (int): Entidades más frecuentes que se conservan de cada tipo
+        
+    Returns:
+        EntitySketch: Sketch con las frecuencias estimadas
+    """
+    if workers <= 1 or len(file_paths) <= 1:
+        return _sketch_file_chunk(file_paths, batch, width, depth, top_k)
+    
+    chunk_size = max(1, math.ceil(len(file_paths) / (workers * 4)))
+    chunks = [file_paths[i:i + chunk_size] for i in range(0, len(file_paths), chunk_size)]
+    sketch = None
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for partial in pool.map(_sketch_file_chunk, chunks, repeat(batch), repeat(width), repeat(depth), repeat(top_k)):
+            sketch = partial if sketch is None else sketch.merge(partial)
+    return sketch
+
+def list_entity_files(directory_path='.', exclude=()):
+    """Rutas de los archivos JSON y .nerbin de un directorio, salvo las de `exclude`."""
+    exclude = {os.path.abspath(path) for path in exclude}
+    file_paths = [os.path.join(directory_path, f) for f in os.listdir(directory_path) if f.endswith(('.json', '.nerbin'))]
+    return [path for path in file_paths if os.path.abspath(path) not in exclude]
+
+def _most_common_first(phrases):
+    return sorted(phrases.items(), key=lambda item: (-item[1], item[0]))
+
+def write_entity_counts(all_entities, output_filename, output_format, files_entities=None, metadata=None):
+    """
+    Escribe la frecuencia de cada entidad, de más a menos frecuente dentro de cada tipo.
+    
+    Args:
+        all_entities (dict): tipo -> Counter de frases
+        output_filename (str): Archivo de salida
+        output_format (str): 'tsv' o 'csv' (columnas tipo, entidad, frecuencia, con
+            cabecera) o 'json' ({"total": {tipo: {entidad: frecuencia}}, "archivos": ...})
+        files_entities (dict): En JSON, frecuencias de cada archivo a incluir en "archivos"
+        metadata (dict): En JSON, datos adicionales a incluir (p. ej. los del modo --sketch)
+    """
+    if output_format in ('tsv', 'csv'):
+        with open(output_filename, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, delimiter='\t' if output_format == 'tsv' else ',', lineterminator='\n')
+            writer.writerow(['tipo', 'entidad', 'frecuencia'])
+            for entity_type, phrases in sorted(all_entities.items()):
+                writer.writerows((entity_type, phrase, count) for phrase, count in _most_common_first(phrases))
+        return
+    
+    def by_type(entities):
+        return {entity_type: dict(_most_common_first(phrases)) for entity_type, phrases in sorted(entities.items())}
+    
+    result = dict(metadata or {})
+    result['total'] = by_type(all_entities)
+    if files_entities is not None:
+        result['archivos'] = {filename: by_type(entities) for filename, entities in files_entities.items()}
+    with open(output_filename, 'w', encoding='utf-8') as f:
+        # Una sola escritura: json.dump escribiría el documento en miles de fragmentos
+        f.write(json.dumps(result, ensure_ascii=False, indent=2) + '\n')
+
+def extract_entities_from_directory(directory_path='.', batch=False, workers=1, cache=None, exclude=()):
+    """
+    Extrae entidades de todos los archivos JSON y .nerbin en el directorio especificado.
     
     Args:
         directory_path (str): Ruta al directorio a procesar
+        batch (bool): Usar el decodificador vectorizado por archivo
+        workers (int): Número de procesos; con más de uno se usa extract_entities_parallel
+        cache (CacheEtapas): Caché de etapas para no releer los archivos sin cambios
+        exclude (list): Archivos del directorio que no se procesan (p. ej. un resultado .json previo)
         
     Returns:
         tuple: (dict con archivos y sus entidades por tipo, dict con todas las entidades por tipo)
     """
-    all_entities = defaultdict(set)
+    file_paths = list_entity_files(directory_path, exclude)
+    if workers > 1:
+        return extract_entities_parallel(file_paths, workers, batch=batch, cache=cache)
+    
+    all_entities = defaultdict(Counter)
     files_entities = {}
     
     # Procesar solo archivos JSON en el directorio
-    for filename in [f for f in os.listdir(directory_path) if f.endswith('.json')]:
-        file_path = os.path.join(directory_path, filename)
-        file_results, file_entities = process_single_file(file_path)
+    for file_path in file_paths:
+        file_results, file_entities = process_single_file(file_path, batch=batch, cache=cache)
         files_entities.update(file_results)
         
         # Actualizar todas las entidades
@@ -199,42 +542,94 @@ def extract_entities_from_directory(directory_path='.'):
     return files_entities, all_entities
 
 def main():
+    parser = argparse.ArgumentParser(description="Extrae las entidades anotadas de archivos JSON.")
+    parser.add_argument('archivo', nargs='?', help="Archivo .json o .nerbin a procesar (por defecto, todos los del directorio actual)")
+    parser.add_argument('--batch', action='store_true',
+                        help="Decodificar cada archivo como un lote con NumPy en lugar de línea a línea")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Número de procesos para procesar el directorio (por defecto 1, secuencial)")
+    parser.add_argument('--cache', nargs='?', const='.cache_etapas', default=None,
+                        help="Reutilizar las entidades de los archivos sin cambios (directorio de la caché; no aplica a --sketch)")
+    parser.add_argument('--sketch', action='store_true',
+                        help="Conteo aproximado con memoria fija: Count-Min Sketch y las --top-k entidades más frecuentes de cada tipo")
+    parser.add_argument('--top-k', type=int, default=TOP_K,
+                        help=f"Entidades que se conservan de cada tipo en modo --sketch (por defecto {TOP_K})")
+    parser.add_argument('--sketch-width', type=int, default=SKETCH_WIDTH,
+                        help=f"Contadores por fila del sketch (por defecto {SKETCH_WIDTH}); el error es de e/ancho veces el total")
+    parser.add_argument('--sketch-depth', type=int, default=SKETCH_DEPTH,
+                        help=f"Filas del sketch (por defecto {SKETCH_DEPTH})")
+    parser.add_argument('--format', choices=['txt', 'tsv', 'csv', 'json'], default='txt',
+                        help="Formato del archivo de resultados: listas numeradas (txt), frecuencias en TSV, CSV o JSON")
+    parser.add_argument('--output', default=None,
+                        help="Archivo de resultados (por defecto, resultados_entidades.<formato>)")
+    console = parser.add_mutually_exclusive_group()
+    console.add_argument('--quiet', action='store_true',
+                         help="No mostrar los resultados en consola (solo se escribe el archivo de resultados)")
+    console.add_argument('--summary', action='store_true',
+                         help="Mostrar en consola solo el número de entidades de cada tipo, sin listarlas")
+    args = parser.parse_args()
+    
+    cache = None
+    if args.cache and not args.sketch:
+        from stage_cache import CacheEtapas
+        cache = CacheEtapas(args.cache)
+    
     try:
         # Verificar si se proporcionó un archivo específico como argumento
-        if len(sys.argv) > 1 and sys.argv[1].endswith('.json'):
-            file_path = sys.argv[1]
-            if os.path.isfile(file_path):
-                print(f"Procesando archivo específico: {file_path}")
-                files_entities, all_entities = process_single_file(file_path)
-            else:
+        if args.archivo and args.archivo.endswith(('.json', '.nerbin')):
+            file_path = args.archivo
+            if not os.path.isfile(file_path):
                 print(f"El archivo {file_path} no existe.")
                 return
+            print(f"Procesando archivo específico: {file_path}")
+            file_paths = [file_path]
         else:
             # Si no se proporciona un archivo específico, procesar todos los archivos JSON en el directorio actual
             print("Procesando todos los archivos JSON en el directorio actual.")
-            files_entities, all_entities = extract_entities_from_directory()
+            file_paths = None
         
-        print_results(files_entities, all_entities)
+        output_filename = args.output or f'resultados_entidades.{args.format}'
+        # Un resultado .json en el directorio no debe leerse como corpus en la siguiente ejecución
+        exclude = [output_filename]
         
-        # Guardar resultados en un archivo
-        output_filename = 'resultados_entidades.txt'
-        with open(output_filename, 'w', encoding='utf-8') as f:
-            f.write("=== ENTIDADES ENCONTRADAS POR TIPO ===\n")
-            total_entities = 0
-            
-            for entity_type, phrases in sorted(all_entities.items()):
-                f.write(f"\n{entity_type}:\n")
-                if phrases:
-                    for i, phrase in enumerate(sorted(phrases), 1):
-                        f.write(f"  {i}. \"{phrase}\"\n")
-                    f.write(f"  Total {entity_type}: {len(phrases)}\n")
-                    total_entities += len(phrases)
-                else:
-                    f.write(f"  No se encontraron entidades de tipo {entity_type}.\n")
-            
-            f.write(f"\nTotal entidades encontradas: {total_entities}\n")
+        start = time.perf_counter()
+        metadata = None
+        if args.sketch:
+            sketch = sketch_entities(file_paths if file_paths is not None else list_entity_files(exclude=exclude), batch=args.batch,
+                                     workers=args.workers, width=args.sketch_width, depth=args.sketch_depth,
+                                     top_k=args.top_k)
+            files_entities, all_entities = {}, sketch.most_common()
+            metadata = {'aproximado': True, 'top_k': args.top_k, 'sketch_width': args.sketch_width,
+                        'sketch_depth': args.sketch_depth, 'entidades_contadas': sketch.sketch.total,
+                        'error_maximo': sketch.error_bound()}
+            print(f"\nModo aproximado: {sketch.sketch.total} entidades contadas; las frecuencias pueden "
+                  f"sobrestimarse hasta en {sketch.error_bound():.1f}")
+        elif file_paths is not None:
+            files_entities, all_entities = process_single_file(file_paths[0], batch=args.batch, cache=cache)
+        else:
+            files_entities, all_entities = extract_entities_from_directory(batch=args.batch, workers=args.workers, cache=cache,
+                                                                           exclude=exclude)
+        
+        extraction_time = time.perf_counter() - start
+        
+        # Informe: las frases de cada tipo se ordenan una sola vez para la consola y el archivo
+        start = time.perf_counter()
+        sorted_totals = None
+        if args.format == 'txt' or not (args.quiet or args.summary):
+            sorted_totals = sort_phrases(all_entities)
+        if not args.quiet:
+            print_results(files_entities, all_entities, summary=args.summary, sorted_totals=sorted_totals)
+        
+        if args.format == 'txt':
+            # Guardar resultados en un archivo
+            write_text_report(sorted_totals, output_filename)
+        else:
+            write_entity_counts(all_entities, output_filename, args.format,
+                                None if args.sketch else files_entities, metadata)
+        report_time = time.perf_counter() - start
         
         print(f"\nLos resultados se han guardado en {output_filename}")
+        print(f"Tiempo de extracción: {extraction_time:.2f} s; informe: {report_time:.2f} s", file=sys.stderr)
                 
     except Exception as e:
         print(f"Error durante la ejecución: {e}")
@@ -0,0 +1,628 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de rendimiento del kit de preprocesamiento.
+
+Cada subcomando genera un corpus sintético con la misma forma que los archivos
+anotados ({"sentencia": [...], "tag": [...]}) y mide la implementación actual
+frente a la de referencia.
+
+Uso:
+    python3 benchmarks.py tag_lookup --tokens 10000000
+    python3 benchmarks.py parallel_extract --files 2000 --max-workers 16
+    python3 benchmarks.py split_assign --files 100000
+    python3 benchmarks.py parallel_validate --files 20000 --max-workers 16
+    python3 benchmarks.py parser_backends --size-mb 1024
+    python3 benchmarks.py chunked_validate --size-mb 1024 --max-workers 16
+    python3 benchmarks.py semantic_checks --size-mb 256
+    python3 benchmarks.py corpus_bin --size-mb 1024
+    python3 benchmarks.py iterable_dataset --tokens 20000000 --shards 8
+    python3 benchmarks.py tokenizer --size-mb 2048
+    python3 benchmarks.py vocabulary --sentences 5000000
+"""
+
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from tag_schema import ENTITY_TAGS, OUTSIDE_TAG
+
+
+def cargar_script(nombre):
+    """Importa un script del repositorio aunque su nombre contenga guiones."""
+    ruta = Path(__file__).with_name(nombre)
+    nombre_modulo = ruta.stem.replace('-', '_')
+    if nombre_modulo in sys.modules:
+        return sys.modules[nombre_modulo]
+    spec = importlib.util.spec_from_file_location(nombre_modulo, ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    # Registrar el módulo para que sus funciones se puedan enviar a procesos trabajadores
+    sys.modules[nombre_modulo] = modulo
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def generar_sentencias(total_tokens, seed=0, longitud_media=20, prob_entidad=0.15):
+    """
+    Genera sentencias sintéticas con spans B_/I_ válidos hasta sumar `total_tokens`.
+
+    Returns:
+        list: Lista de tuplas (sentencia, tag)
+    """
+    rng = random.Random(seed)
+    begin_tags = [n for n, name in ENTITY_TAGS.items() if name[0] == 'B']
+    inside = {n: n + 1 if n == 46 else n + 23 for n in begin_tags}
+    vocab = [f"tok{i}" for i in range(5000)]
+    sentencias = []
+    producidos = 0
+
+    while producidos < total_tokens:
+        largo = max(1, int(rng.gauss(longitud_media, longitud_media / 4)))
+        largo = min(largo, total_tokens - producidos)
+        tags = []
+        while len(tags) < largo:
+            if rng.random() < prob_entidad:
+                b = rng.choice(begin_tags)
+                tags.append(b)
+                tags.extend([inside[b]] * min(rng.randint(0, 3), largo - len(tags)))
+            else:
+                tags.append(OUTSIDE_TAG)
+        sentencias.append(([rng.choice(vocab) for _ in tags], tags))
+        producidos += largo
+
+    return sentencias
+
+
+def escribir_corpus(directorio, sentencias, num_archivos):
+    """
+    Reparte las sentencias en `num_archivos` archivos JSONL dentro de `directorio`.
+
+    Returns:
+        list: Rutas de los archivos escritos
+    """
+    rutas = []
+    por_archivo = max(1, -(-len(sentencias) // num_archivos))
+    for k in range(num_archivos):
+        ruta = os.path.join(directorio, f"historia_{k:06d}.json")
+        with open(ruta, 'w', encoding='utf-8') as f:
+            for sentencia, tag in sentencias[k * por_archivo:(k + 1) * por_archivo]:
+                f.write(json.dumps({"sentencia": sentencia, "tag": tag}, ensure_ascii=False) + '\n')
+        rutas.append(ruta)
+    return rutas
+
+
+def _extract_entities_lineal(sentencia, tag):
+    """Implementación original: búsqueda lineal en ENTITY_TAGS por cada B_."""
+    def get_entity_type(tag_num):
+        tag_name = ENTITY_TAGS.get(tag_num, "UNKNOWN")
+        if tag_name.startswith("B_") or tag_name.startswith("B-"):
+            return tag_name[2:]
+        elif tag_name.startswith("I_") or tag_name.startswith("I-"):
+            return tag_name[2:]
+        return tag_name
+
+    def get_inside_tag(entity_type):
+        for tag_num, tag_name in ENTITY_TAGS.items():
+            if tag_name == f"I_{entity_type}" or tag_name == f"I-{entity_type}":
+                return tag_num
+        return None
+
+    entities_by_type = defaultdict(set)
+    i = 0
+    while i < len(tag):
+        if tag[i] in ENTITY_TAGS and ENTITY_TAGS[tag[i]].startswith('B'):
+            entity_type = get_entity_type(tag[i])
+            inside_tag = get_inside_tag(entity_type)
+            entity_words = [sentencia[i]]
+            j = i + 1
+            while j < len(tag) and tag[j] == inside_tag:
+                entity_words.append(sentencia[j])
+                j += 1
+            if entity_words:
+                entities_by_type[entity_type].add(' '.join(entity_words))
+            i = j
+        else:
+            i += 1
+    return entities_by_type
+
+
+def _medir(funcion, sentencias):
+    inicio = time.perf_counter()
+    resultado = defaultdict(set)
+    for sentencia, tag in sentencias:
+        for entity_type, phrases in funcion(sentencia, tag).items():
+            resultado[entity_type].update(phrases)
+    return time.perf_counter() - inicio, resultado
+
+
+def bench_tag_lookup(args):
+    extractor = cargar_script('all-entity-extractor.py')
+    print(f"Generando corpus sintético de {args.tokens:,} tokens...")
+    sentencias = generar_sentencias(args.tokens, seed=args.seed)
+
+    t_lineal, r_lineal = _medir(_extract_entities_lineal, sentencias)
+    t_tablas, r_tablas = _medir(extractor.extract_entities, sentencias)
+
+    if r_lineal != r_tablas:
+        print("❌ Los resultados de ambas implementaciones no coinciden")
+        return 1
+
+    print(f"Búsqueda lineal:    {t_lineal:8.2f} s  ({args.tokens / t_lineal:,.0f} tokens/s)")
+    print(f"Tablas compiladas:  {t_tablas:8.2f} s  ({args.tokens / t_tablas:,.0f} tokens/s)")
+    print(f"Aceleración:        {t_lineal / t_tablas:8.2f}x")
+    return 0
+
+
+def bench_parallel_extract(args):
+    extractor = cargar_script('all-entity-extractor.py')
+    sentencias = generar_sentencias(args.tokens, seed=args.seed)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        escribir_corpus(directorio, sentencias, args.files)
+        print(f"Corpus sintético: {args.files} archivos, {args.tokens:,} tokens (CPUs disponibles: {os.cpu_count()})")
+
+        referencia = None
+        t_base = None
+        workers = 1
+        while workers <= args.max_workers:
+            inicio = time.perf_counter()
+            resultado = extractor.extract_entities_from_directory(directorio, workers=workers)
+            transcurrido = time.perf_counter() - inicio
+
+            if referencia is None:
+                referencia, t_base = resultado, transcurrido
+            elif resultado != referencia:
+                print(f"❌ El resultado con {workers} procesos difiere del secuencial")
+                return 1
+
+            print(f"  {workers:2d} procesos: {transcurrido:8.2f} s  (aceleración {t_base / transcurrido:5.2f}x)")
+            workers *= 2
+    return 0
+
+
+def _conteos_sinteticos(num_archivos, seed):
+    """Líneas y entidades por tipo de archivos de longitud muy variable (log-normal)."""
+    from tag_schema import TAG_SCHEMA
+    rng = random.Random(seed)
+    num_tipos = len(TAG_SCHEMA.type_names)
+    lineas, entidades = [], []
+    for _ in range(num_archivos):
+        n = max(1, int(rng.lognormvariate(3, 1)))
+        conteos = {}
+        for _ in range(rng.randint(1, 12)):
+            # Tipos frecuentes y raros, como en el corpus anotado
+            tipo = min(num_tipos - 1, int(rng.expovariate(0.3)))
+            conteos[tipo] = conteos.get(tipo, 0) + rng.randint(1, max(1, n // 5))
+        lineas.append(n)
+        entidades.append(conteos)
+    return lineas, entidades
+
+
+def bench_split_assign(args):
+    from split_assigner import balanced_assign, cut_assign, split_deviations
+    lineas, entidades = _conteos_sinteticos(args.files, args.seed)
+    print(f"Conteos sintéticos de {args.files:,} archivos, {sum(lineas):,} líneas")
+
+    for nombre, asignar in (("cortes", lambda: cut_assign(args.files, seed=args.seed)),
+                            ("estratificado", lambda: balanced_assign(lineas, entidades, seed=args.seed)[0])):
+        inicio = time.perf_counter()
+        splits = asignar()
+        transcurrido = time.perf_counter() - inicio
+        filas = split_deviations(lineas, entidades, splits)
+        print(f"  {nombre:<14} {transcurrido:6.3f} s  desviación líneas ±{filas[0][3]:.3%}, "
+              f"máxima por tipo ±{max(fila[3] for fila in filas[1:]):.3%}")
+    return 0
+
+
+def bench_parallel_validate(args):
+    from jsonl_validation import validate_files
+    sentencias = generar_sentencias(args.tokens, seed=args.seed)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        escribir_corpus(directorio, sentencias, args.files)
+        rutas = sorted(str(ruta) for ruta in Path(directorio).glob('*.json'))
+        print(f"Corpus sintético: {args.files} archivos, {args.tokens:,} tokens (CPUs disponibles: {os.cpu_count()})")
+
+        referencia = None
+        t_base = None
+        workers = 1
+        while workers <= args.max_workers:
+            inicio = time.perf_counter()
+            resultado = list(validate_files(rutas, jobs=workers))
+            transcurrido = time.perf_counter() - inicio
+
+            if referencia is None:
+                referencia, t_base = resultado, transcurrido
+            elif resultado != referencia:
+                print(f"❌ El resultado con {workers} procesos difiere del secuencial")
+                return 1
+
+            print(f"  {workers:2d} procesos: {transcurrido:8.2f} s  (aceleración {t_base / transcurrido:5.2f}x)")
+            workers *= 2
+    return 0
+
+
+def escribir_jsonl_grande(ruta, tamano_bytes, seed=0):
+    """Escribe un único JSONL de al menos `tamano_bytes` repitiendo un bloque de sentencias."""
+    bloque = ''.join(
+        json.dumps({"sentencia": tokens, "tag": tags}, ensure_ascii=False) + '\n'
+        for tokens, tags in generar_sentencias(200_000, seed=seed)
+    ).encode('utf-8')
+    escritos = 0
+    with open(ruta, 'wb') as f:
+        while escritos < tamano_bytes:
+            f.write(bloque)
+            escritos += len(bloque)
+    return escritos
+
+
+def bench_parser_backends(args):
+    from jsonl_validation import BACKENDS, available_backends, validate_file
+    instalados = available_backends()
+    print(f"Backends instalados: {', '.join(instalados)} (no instalados: "
+          f"{', '.join(b for b in BACKENDS if b not in instalados) or 'ninguno'})")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'corpus.jsonl')
+        tamano = escribir_jsonl_grande(ruta, args.size_mb * 1024 * 1024, seed=args.seed)
+        print(f"Archivo sintético de {tamano / 1024 / 1024:,.0f} MB")
+
+        referencia, t_json = None, None
+        for backend in ['json'] + [b for b in instalados if b != 'json']:
+            inicio = time.perf_counter()
+            errores = validate_file(ruta, backend=backend)
+            transcurrido = time.perf_counter() - inicio
+            if referencia is None:
+                referencia, t_json = errores, transcurrido
+            elif errores != referencia:
+                print(f"❌ El resultado con {backend} difiere del de json")
+                return 1
+            print(f"  {backend:<9} {transcurrido:8.2f} s  ({tamano / 1024 / 1024 / transcurrido:7.1f} MB/s, "
+                  f"{t_json / transcurrido:5.2f}x)")
+    return 0
+
+
+def bench_chunked_validate(args):
+    from jsonl_validation import validate_file, validate_file_chunked
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'corpus.jsonl')
+        tamano = escribir_jsonl_grande(ruta, args.size_mb * 1024 * 1024, seed=args.seed)
+        # Errores repartidos por el archivo para comprobar la numeración global de líneas
+        with open(ruta, 'ab') as f:
+            f.write(b'\n{"sentencia": ["a"], "tag": ["x"]}\nno es json\n')
+        print(f"Archivo sintético de {tamano / 1024 / 1024:,.0f} MB (CPUs disponibles: {os.cpu_count()})")
+
+        inicio = time.perf_counter()
+        referencia = validate_file(ruta)
+        t_base = time.perf_counter() - inicio
+        print(f"  serie:       {t_base:8.2f} s")
+
+        workers = 2
+        while workers <= args.max_workers:
+            inicio = time.perf_counter()
+            errores = validate_file_chunked(ruta, workers)
+            transcurrido = time.perf_counter() - inicio
+            if errores != referencia:
+                print(f"❌ El resultado con {workers} procesos difiere del secuencial")
+                return 1
+            print(f"  {workers:2d} procesos: {transcurrido:8.2f} s  (aceleración {t_base / transcurrido:5.2f}x)")
+            workers *= 2
+    return 0
+
+
+def bench_semantic_checks(args):
+    from jsonl_validation import validate_file
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'corpus.jsonl')
+        tamano = escribir_jsonl_grande(ruta, args.size_mb * 1024 * 1024, seed=args.seed)
+        print(f"Archivo sintético de {tamano / 1024 / 1024:,.0f} MB (backend {args.parser})")
+
+        tiempos = {}
+        for semantica in (False, True):
+            inicio = time.perf_counter()
+            errores = validate_file(ruta, backend=args.parser, semantic=semantica)
+            tiempos[semantica] = time.perf_counter() - inicio
+            if errores:
+                print(f"❌ El corpus sintético no debería tener errores: {errores[0]}")
+                return 1
+
+        print(f"  solo estructura:       {tiempos[False]:8.2f} s  ({tamano / 1024 / 1024 / tiempos[False]:7.1f} MB/s)")
+        print(f"  estructura + semántica: {tiempos[True]:7.2f} s  ({tamano / 1024 / 1024 / tiempos[True]:7.1f} MB/s)")
+        print(f"  Coste de las comprobaciones semánticas: {tiempos[True] / tiempos[False] - 1:+.1%}")
+    return 0
+
+
+def bench_corpus_bin(args):
+    from corpus_bin import CorpusBin, jsonl_a_bin
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'corpus.json')
+        ruta_bin = os.path.join(directorio, 'corpus.nerbin')
+        tamano = escribir_jsonl_grande(ruta, args.size_mb * 1024 * 1024, seed=args.seed)
+
+        inicio = time.perf_counter()
+        jsonl_a_bin([ruta], ruta_bin)
+        t_conversion = time.perf_counter() - inicio
+
+        # Referencia: cargar el JSONL entero como listas, como hacen hoy los scripts
+        inicio = time.perf_counter()
+        num_sentencias = num_tokens = 0
+        with open(ruta, 'r', encoding='utf-8') as f:
+            for linea in f:
+                entrada = json.loads(linea)
+                num_sentencias += 1
+                num_tokens += len(entrada['tag'])
+        t_json = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        corpus = CorpusBin(ruta_bin)
+        t_apertura = time.perf_counter() - inicio
+        if (corpus.num_sentences, corpus.num_tokens) != (num_sentencias, num_tokens):
+            print("❌ El corpus binario no tiene las mismas sentencias y tokens que el JSONL")
+            return 1
+
+        # Recorrer una columna completa desde el mapa: tokens fuera de entidad
+        inicio = time.perf_counter()
+        fuera = corpus.tags.tobytes().count(bytes((OUTSIDE_TAG,)))
+        t_columna = time.perf_counter() - inicio
+        corpus.close()
+
+        print(f"JSONL sintético de {tamano / 1024 / 1024:,.0f} MB: {num_sentencias:,} sentencias, {num_tokens:,} tokens")
+        print(f"  .nerbin de {os.path.getsize(ruta_bin) / 1024 / 1024:,.0f} MB, conversión en {t_conversion:.2f} s")
+        print(f"  cargar el JSONL:          {t_json:9.3f} s")
+        print(f"  abrir el .nerbin (mmap):  {t_apertura:9.6f} s  ({t_json / t_apertura:,.0f}x)")
+        print(f"  recorrer la columna tags: {t_columna:9.3f} s  ({fuera:,} tokens fuera de entidad)")
+    return 0
+
+
+def bench_iterable_dataset(args):
+    try:
+        cargador = cargar_script('load_dataset_mama_es.py')
+    except ImportError as e:
+        print(f"❌ Este benchmark requiere datasets y pyarrow: {e}")
+        return 1
+
+    with tempfile.TemporaryDirectory() as directorio:
+        sentencias = generar_sentencias(args.tokens, seed=args.seed)
+        train = escribir_corpus(directorio, sentencias, args.shards)
+        print(f"Train sintético: {len(sentencias):,} sentencias en {args.shards} fragmentos")
+        del sentencias
+
+        # valid y test mínimos: solo se mide el train
+        resto = os.path.join(directorio, 'resto.json')
+        with open(resto, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"sentencia": ["a"], "tag": [OUTSIDE_TAG]}) + '\n')
+
+        for modo in ('memoria', 'streaming'):
+            inicio = time.perf_counter()
+            if modo == 'memoria':
+                datos = cargador.load_dataset_from_json(train, resto, resto)['train']
+            else:
+                datos = cargador.load_dataset_from_json(train, resto, resto, streaming=True,
+                                                        shuffle_buffer=args.buffer, seed=args.seed)['train']
+            vistos, primer_lote = 0, None
+            for _ in datos:
+                vistos += 1
+                if vistos == args.batch_size:
+                    primer_lote = time.perf_counter()
+            fin = time.perf_counter()
+            primer_lote = primer_lote or fin
+            continuo = (vistos - args.batch_size) / (fin - primer_lote) if fin > primer_lote else float('nan')
+            print(f"  {modo:<9} primer lote de {args.batch_size}: {primer_lote - inicio:8.3f} s  "
+                  f"régimen: {continuo:10,.0f} ejemplos/s  total: {fin - inicio:7.2f} s ({vistos:,} ejemplos)")
+    return 0
+
+
+def _tokenize_line_original(line):
+    """Implementación original de script_tokenizeText.py: alternancia verbosa con re.findall."""
+    return re.findall(r'''
+        \d+[+\-]?%?      # Números con +/- o % (ej: 3+, 90%)
+        |\d+\.\d+        # Decimales (ej: 3.5)
+        |\w+[\-/]\w+     # Palabras con guiones o barras (ej: HER2/neu, ki-67)
+        |\w+              # Palabras normales
+        |[^\s]            # Símbolos individuales (ej: (, ), /, :)
+    ''', line, re.X | re.UNICODE)
+
+
+def escribir_texto_clinico(ruta, tamano_bytes, seed=0):
+    """Escribe un .txt de al menos `tamano_bytes` con líneas de estilo clínico sintéticas."""
+    rng = random.Random(seed)
+    plantillas = [
+        "Paciente de {n} años con carcinoma ductal infiltrante de mama {lado}, estadio {e}.",
+        "HER2/neu {h}, RE {p}%, RP {p}% y ki-67 del {p}% en la biopsia del {d}/{m}/20{a}.",
+        "Recibe {f} {x} mg/m2 cada {n} días (ciclo {c}); tolera bien el tratamiento.",
+        "Tumor de {x} cm en CSE, cT{c}N{c}M0, sin adenopatías axilares palpables.",
+        "Antecedentes: HTA, DM2 y exfumadora de {n} paquetes/año; madre con cáncer de ovario.",
+        "Se solicita PET-TC y RM de mama; control en consultas de Oncología Médica en {c} meses.",
+    ]
+    bloque = []
+    for _ in range(20_000):
+        bloque.append(rng.choice(plantillas).format(
+            n=rng.randint(1, 90), lado=rng.choice(["izquierda", "derecha"]), e=rng.choice(["I", "IIA", "IIIB"]),
+            h=rng.choice(["0", "1+", "2+", "3+"]), p=rng.randint(0, 100), d=rng.randint(1, 28),
+            m=rng.randint(1, 12), a=rng.randint(10, 25), f=rng.choice(["5-FU", "paclitaxel", "AC-T"]),
+            x=f"{rng.uniform(0.1, 9.9):.1f}", c=rng.randint(1, 6)))
+    bloque = ('\n'.join(bloque) + '\n').encode('utf-8')
+    escritos = 0
+    with open(ruta, 'wb') as f:
+        while escritos < tamano_bytes:
+            f.write(bloque)
+            escritos += len(bloque)
+    return escritos
+
+
+def bench_tokenizer(args):
+    from script_tokenizeText import tokenize_line
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'clinico.txt')
+        tamano = escribir_texto_clinico(ruta, args.size_mb * 1024 * 1024, seed=args.seed)
+        print(f"Texto sintético de {tamano / 1024 / 1024:,.0f} MB")
+
+        resultados = {}
+        for nombre, tokenizar in (('original', _tokenize_line_original), ('actual', tokenize_line)):
+            tokens = 0
+            inicio = time.perf_counter()
+            with open(ruta, 'r', encoding='utf-8') as f:
+                for linea in f:
+                    tokens += len(tokenizar(linea))
+            resultados[nombre] = (time.perf_counter() - inicio, tokens)
+
+        # Las únicas diferencias permitidas son los decimales, que antes se partían
+        decimal = re.compile(r'\d\.\d')
+        distintas = sin_decimal = 0
+        with open(ruta, 'r', encoding='utf-8') as f:
+            for linea, _ in zip(f, range(100_000)):
+                if _tokenize_line_original(linea) != tokenize_line(linea):
+                    distintas += 1
+                    sin_decimal += not decimal.search(linea)
+        if sin_decimal:
+            print(f"❌ {sin_decimal} líneas sin decimales tokenizadas de forma distinta")
+            return 1
+
+        t_original = resultados['original'][0]
+        for nombre, (transcurrido, tokens) in resultados.items():
+            print(f"  {nombre:<9} {transcurrido:8.2f} s  ({tamano / 1024 / 1024 / transcurrido:6.1f} MB/s, "
+                  f"{tokens:,} tokens, {t_original / transcurrido:5.2f}x)")
+        print(f"  {distintas} de las primeras 100,000 líneas cambian, todas por decimales ahora unidos")
+    return 0
+
+
+def _pico_memoria_carga(ruta, modo):
+    """
+    Carga un JSONL entero en memoria, como dicts de json.loads ('listas') o con los
+    tokens internados en un Vocabulary ('vocabulario').
+
+    Returns:
+        tuple: (MB de pico de RSS sobre el del proceso antes de cargar, segundos, tokens distintos)
+    """
+    import resource
+    from array import array
+    from vocabulary import Vocabulary
+
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    vocabulario = Vocabulary()
+    registros = []
+    inicio = time.perf_counter()
+    with open(ruta, 'r', encoding='utf-8') as f:
+        for linea in f:
+            entrada = json.loads(linea)
+            if modo == 'vocabulario':
+                registros.append((vocabulario.encode(entrada['sentencia']), array('B', entrada['tag'])))
+            else:
+                registros.append(entrada)
+    transcurrido = time.perf_counter() - inicio
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en KB en Linux
+    return (pico - base) / 1024, transcurrido, len(vocabulario)
+
+
+def bench_vocabulary(args):
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'corpus.json')
+        bloque = [json.dumps({"sentencia": tokens, "tag": tags}, ensure_ascii=False) + '\n'
+                  for tokens, tags in generar_sentencias(200_000, seed=args.seed)]
+        with open(ruta, 'w', encoding='utf-8') as f:
+            for i in range(args.sentences):
+                f.write(bloque[i % len(bloque)])
+        print(f"JSONL sintético: {args.sentences:,} sentencias, {os.path.getsize(ruta) / 1024 / 1024:,.0f} MB")
+
+        # Cada modo en un proceso nuevo, para que el pico de RSS de uno no cuente en el otro
+        resultados = {}
+        for modo in ('listas', 'vocabulario'):
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                resultados[modo] = pool.submit(_pico_memoria_carga, ruta, modo).result()
+
+        mb_listas = resultados['listas'][0]
+        for modo, (mb, transcurrido, distintos) in resultados.items():
+            detalle = f", {distintos:,} tokens distintos" if distintos else ""
+            print(f"  {modo:<12} pico de RSS +{mb:9,.0f} MB ({mb_listas / max(mb, 1e-9):5.2f}x menos)  "
+                  f"carga en {transcurrido:7.2f} s{detalle}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    p = subparsers.add_parser('tag_lookup', help='extract_entities con tablas precompiladas vs búsqueda lineal')
+    p.add_argument('--tokens', type=int, default=10_000_000)
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_tag_lookup)
+
+    p = subparsers.add_parser('parallel_extract', help='escalado de extract_entities_from_directory con --workers')
+    p.add_argument('--files', type=int, default=2000)
+    p.add_argument('--tokens', type=int, default=5_000_000)
+    p.add_argument('--max-workers', type=int, default=16)
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_parallel_extract)
+
+    p = subparsers.add_parser('split_assign', help='asignador estratificado vs cortes fijos en la división por archivos')
+    p.add_argument('--files', type=int, default=100_000)
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_split_assign)
+
+    p = subparsers.add_parser('parallel_validate', help='escalado de validate-all-json.py con --jobs')
+    p.add_argument('--files', type=int, default=20_000)
+    p.add_argument('--tokens', type=int, default=20_000_000)
+    p.add_argument('--max-workers', type=int, default=16)
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_parallel_validate)
+
+    p = subparsers.add_parser('parser_backends', help='validación de un JSONL grande con cada backend de parseo')
+    p.add_argument('--size-mb', type=int, default=1024)
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_parser_backends)
+
+    p = subparsers.add_parser('chunked_validate', help='validación por rangos de un único JSONL grande')
+    p.add_argument('--size-mb', type=int, default=1024)
+    p.add_argument('--max-workers', type=int, default=16)
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_chunked_validate)
+
+    p = subparsers.add_parser('semantic_checks', help='coste de comprobar ids de etiqueta y transiciones BIO')
+    p.add_argument('--size-mb', type=int, default=256)
+    p.add_argument('--parser', default=None, help='backend de parseo (por defecto, el más rápido instalado)')
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_semantic_checks)
+
+    p = subparsers.add_parser('corpus_bin', help='carga de un JSONL grande vs apertura del mismo corpus en .nerbin')
+    p.add_argument('--size-mb', type=int, default=1024)
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_corpus_bin)
+
+    p = subparsers.add_parser('iterable_dataset', help='tiempo hasta el primer lote y ritmo del modo streaming del cargador')
+    p.add_argument('--tokens', type=int, default=20_000_000)
+    p.add_argument('--shards', type=int, default=8)
+    p.add_argument('--batch-size', type=int, default=32)
+    p.add_argument('--buffer', type=int, default=10_000)
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_iterable_dataset)
+
+    p = subparsers.add_parser('tokenizer', help='tokenize_line actual vs la alternancia original sobre texto clínico')
+    p.add_argument('--size-mb', type=int, default=2048)
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_tokenizer)
+
+    p = subparsers.add_parser('vocabulary', help='pico de memoria del corpus en listas de str vs tokens internados')
+    p.add_argument('--sentences', type=int, default=5_000_000)
+    p.add_argument('--seed', type=int, default=0)
+    p.set_defaults(func=bench_vocabulary)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
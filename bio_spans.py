@@ -0,0 +1,142 @@
+"""
+Decodificador vectorizado de spans BIO con NumPy.
+
+Trabaja sobre muchas sentencias a la vez, representadas como un único arreglo plano
+de etiquetas más un arreglo de offsets por sentencia (offsets[k]:offsets[k + 1] son
+los tokens de la sentencia k). Todos los spans B_→I_ se localizan con máscaras
+booleanas y búsquedas ordenadas, sin trabajo de Python por token.
+
+La tabla de spans resultante (SpanTable) se convierte en frases de entidad con
+span_phrases, que es lo que usa all-entity-extractor.py.
+
+Las etiquetas numéricas no enteras (15.5) no se truncan al convertirlas a enteros: se
+tratan como fuera del esquema, igual que TagSchema.tag_id en el camino de Python.
+"""
+
+from collections import namedtuple
+from itertools import chain
+
+import numpy as np
+
+from tag_schema import TAG_SCHEMA
+
+# Arreglos paralelos: sentencia, inicio y fin (exclusivo, relativos a la sentencia) y tipo
+SpanTable = namedtuple('SpanTable', ['sentence', 'start', 'end', 'type'])
+
+_schema_arrays_cache = {}
+
+
+def schema_arrays(schema=TAG_SCHEMA):
+    """
+    Devuelve las tablas del esquema como arreglos NumPy con una entrada centinela
+    adicional en la posición `schema.size` para etiquetas fuera de rango.
+
+    Returns:
+        tuple: (is_begin, is_inside, tag_type)
+    """
+    arrays = _schema_arrays_cache.get(id(schema))
+    if arrays is None:
+        is_begin = np.array(schema.is_begin + [False], dtype=bool)
+        is_inside = np.zeros(schema.size + 1, dtype=bool)
+        is_inside[[t for t in schema.inside_of_type if t >= 0]] = True
+        tag_type = np.array(schema.tag_type + [-1], dtype=np.int32)
+        arrays = (is_begin, is_inside, tag_type)
+        _schema_arrays_cache[id(schema)] = arrays
+    return arrays
+
+
+def pack_sentences(tag_lists):
+    """
+    Empaqueta una secuencia de listas de etiquetas en un arreglo plano más offsets.
+
+    Args:
+        tag_lists (list): Lista con la lista de etiquetas de cada sentencia
+
+    Returns:
+        tuple: (arreglo int64 de etiquetas, arreglo int64 de offsets de longitud n + 1)
+    """
+    lengths = np.fromiter((len(t) for t in tag_lists), dtype=np.int64, count=len(tag_lists))
+    offsets = np.zeros(len(tag_lists) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    # Se leen como float64 (exacto para cualquier id del esquema) porque fromiter con
+    # int64 truncaría 15.5 a 15 sin avisar
+    tags = np.fromiter(chain.from_iterable(tag_lists), dtype=np.float64, count=int(offsets[-1]))
+    return _tag_ids(tags), offsets
+
+
+def _tag_ids(tags):
+    """
+    Convierte etiquetas a int64 sin truncar: las no enteras, infinitas o NaN pasan a -1,
+    que decode_spans trata como fuera del esquema.
+    """
+    tags = np.asarray(tags)
+    if tags.dtype.kind == 'f':
+        integral = np.isfinite(tags) & (tags == np.trunc(tags)) & (np.abs(tags) < 2.0 ** 62)
+        tags = np.where(integral, tags, -1)
+    return tags.astype(np.int64, copy=False)
+
+
+def decode_spans(tags, offsets, schema=TAG_SCHEMA):
+    """
+    Encuentra todos los spans de entidades de un lote de sentencias.
+
+    Un span empieza en cada etiqueta B_ y se extiende mientras los tokens siguientes
+    de la misma sentencia lleven la etiqueta I_ de su mismo tipo, igual que
+    extract_entities en all-entity-extractor.py.
+
+    Args:
+        tags (np.ndarray): Etiquetas de todas las sentencias concatenadas
+        offsets (np.ndarray): Offsets de inicio de cada sentencia, de longitud n + 1
+        schema (TagSchema): Esquema de etiquetas
+
+    Returns:
+        SpanTable: Spans ordenados por posición en el lote
+    """
+    tags = _tag_ids(tags)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    is_begin, is_inside, tag_type = schema_arrays(schema)
+    n = tags.shape[0]
+
+    # Etiquetas fuera del esquema apuntan a la entrada centinela
+    safe = np.where((tags >= 0) & (tags < schema.size), tags, schema.size)
+
+    starts = np.flatnonzero(is_begin[safe])
+    if starts.size == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return SpanTable(empty, empty, empty, empty.astype(np.int32))
+
+    # continues[j]: el token j es I_ del mismo tipo que el token j - 1 (que por tanto es
+    # B_ o I_ de ese tipo), es decir, prolonga el span anterior
+    types = tag_type[safe]
+    continues = np.zeros(n + 1, dtype=bool)
+    continues[1:n] = is_inside[safe[1:]] & (types[1:] == types[:-1])
+    # Un span nunca cruza el límite entre sentencias
+    continues[offsets[:-1][offsets[:-1] < n]] = False
+
+    # El fin de cada span es la primera posición posterior al inicio que no continúa
+    breaks = np.flatnonzero(~continues)
+    ends = breaks[np.searchsorted(breaks, starts + 1)]
+
+    sentence = np.searchsorted(offsets, starts, side='right') - 1
+    base = offsets[sentence]
+    return SpanTable(sentence, starts - base, ends - base, types[starts])
+
+
+def span_phrases(spans, offsets, tokens, schema=TAG_SCHEMA):
+    """
+    Genera (tipo de entidad, frase) para cada span.
+
+    Args:
+        spans (SpanTable): Tabla de spans de decode_spans
+        offsets (np.ndarray): Offsets de sentencia usados al decodificar
+        tokens (list): Tokens de todas las sentencias concatenados
+
+    Yields:
+        tuple: (nombre del tipo de entidad, frase unida con espacios)
+    """
+    type_names = schema.type_names
+    global_start = (offsets[spans.sentence] + spans.start).tolist()
+    global_end = (offsets[spans.sentence] + spans.end).tolist()
+    for type_id, s, e in zip(spans.type.tolist(), global_start, global_end):
+        yield type_names[type_id], ' '.join(tokens[s:e])
+
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Formato binario columnar del corpus (.nerbin) y conversores desde y hacia JSONL.
+
+Un archivo .nerbin guarda todas las sentencias en columnas contiguas:
+
+    cabecera      magic, versión, flags, contadores y offset de cada sección
+    token_offsets offset en bytes de cada token dentro del blob (uint32, o uint64 si
+                  el blob supera 4 GiB), num_tokens + 1 valores
+    tags          una etiqueta uint8 por token
+    sentences     offset del primer token de cada sentencia (uint64), num_sentences + 1
+    files         id del archivo de origen de cada sentencia (uint32)
+    lines         línea de origen de cada sentencia (uint32)
+    sources       rutas de los archivos de origen, como lista JSON en UTF-8
+    blob          todos los tokens en UTF-8, uno tras otro
+
+Todas las secciones están alineadas a 8 bytes y en little-endian. CorpusBin abre el
+archivo con mmap y expone cada sección como un memoryview sobre el mapa, sin copiar
+nada: abrir un corpus de 100M tokens cuesta lo mismo que abrir uno vacío, y solo se
+decodifican los tokens que se piden.
+
+Uso:
+    python3 corpus_bin.py a-bin carpeta_o_archivos... -o corpus.nerbin
+    python3 corpus_bin.py a-jsonl corpus.nerbin -o corpus.json
+    python3 corpus_bin.py info corpus.nerbin
+"""
+
+import argparse
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+from itertools import accumulate
+
+EXTENSION = ".nerbin"
+MAGIC = b"NERBIN01"
+VERSION = 1
+FLAG_OFFSETS_32 = 1
+
+# magic, versión, flags, sentencias, tokens, bytes del blob, fuentes y offsets de las 7 secciones
+_HEADER = struct.Struct('<8sIIQQQQ7Q')
+_SECTIONS = ('token_offsets', 'tags', 'sentences', 'files', 'lines', 'sources', 'blob')
+
+# Elementos acumulados en memoria antes de volcar cada columna a su archivo temporal
+_FLUSH_ITEMS = 1 << 20
+
+
+def es_corpus_bin(ruta):
+    """True si la ruta tiene la extensión del formato binario."""
+    return str(ruta).endswith(EXTENSION)
+
+
+def _align(f):
+    """Rellena con ceros hasta la siguiente posición múltiplo de 8 y la devuelve."""
+    posicion = f.tell()
+    relleno = -posicion % 8
+    if relleno:
+        f.write(b'\0' * relleno)
+    return posicion + relleno
+
+
+class CorpusWriter:
+    """
+    Escribe un .nerbin sentencia a sentencia sin mantener el corpus en memoria.
+
+    Cada columna se acumula en un array y se vuelca a un archivo temporal anónimo; al
+    cerrar se ensamblan las secciones en un temporal junto al destino, que lo reemplaza
+    con os.replace. Si se produce un error, el destino no se modifica.
+
+    Args:
+        ruta (str): Archivo .nerbin de salida
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.num_sentences = 0
+        self.num_tokens = 0
+        self.blob_size = 0
+        self._fuentes = {}
+        self._spills = {nombre: tempfile.TemporaryFile() for nombre in ('token_offsets', 'tags', 'files', 'lines', 'sentences', 'blob')}
+        self._token_offsets = array('Q')
+        self._tags = array('B')
+        self._sentences = array('Q')
+        self._files = array('I')
+        self._lines = array('I')
+        self._blob = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, *exc):
+        if tipo is None:
+            self.close()
+        else:
+            self._descartar()
+
+    def add(self, tokens, tags, source="", line=0):
+        """
+        Añade una sentencia.
+
+        Args:
+            tokens (list): Tokens de la sentencia
+            tags (list): Etiquetas enteras entre 0 y 255, una por token
+            source (str): Archivo de origen
+            line (int): Línea de origen
+
+        Raises:
+            ValueError: Si las longitudes no coinciden o alguna etiqueta no cabe en un byte
+        """
+        if len(tokens) != len(tags):
+            raise ValueError(f"Longitud discrepante | Sentencia: {len(tokens)} vs Tag: {len(tags)}")
+        # Todo se valida y se codifica antes de tocar las columnas: una sentencia
+        # rechazada no debe dejar nada añadido que desplace a las siguientes
+        try:
+            etiquetas = array('B', tags)
+        except (OverflowError, TypeError) as e:
+            raise ValueError(f"Las etiquetas deben ser enteros entre 0 y 255: {e}") from None
+
+        texto = ''.join(tokens)
+        if texto.isascii():
+            # Caso habitual: en ASCII la longitud en bytes es la longitud del token
+            longitudes = map(len, tokens)
+            datos = texto.encode('ascii')
+        else:
+            codificados = [token.encode('utf-8') for token in tokens]
+            longitudes = map(len, codificados)
+            datos = b''.join(codificados)
+        offsets = array('Q', accumulate(longitudes, initial=self.blob_size))
+        offsets.pop()  # el fin de la sentencia es el inicio de la siguiente
+
+        self._tags.extend(etiquetas)
+        self._token_offsets.extend(offsets)
+        self.blob_size += len(datos)
+        self._blob.append(datos)
+
+        self._sentences.append(self.num_tokens)
+        self.num_tokens += len(tags)
+        id_fuente = self._fuentes.setdefault(source, len(self._fuentes))
+        self._files.append(id_fuente)
+        self._lines.append(line)
+        self.num_sentences += 1
+
+        if len(self._tags) >= _FLUSH_ITEMS:
+            self._volcar()
+
+    def _volcar(self):
+        for nombre in ('token_offsets', 'tags', 'sentences', 'files', 'lines'):
+            columna = getattr(self, '_' + nombre)
+            columna.tofile(self._spills[nombre])
+            del columna[:]
+        self._spills['blob'].write(b''.join(self._blob))
+        self._blob.clear()
+
+    def _descartar(self):
+        for spill in self._spills.values():
+            spill.close()
+
+    def close(self):
+        """Ensambla el archivo final y lo coloca en su ruta de forma atómica."""
+        self._token_offsets.append(self.blob_size)
+        self._sentences.append(self.num_tokens)
+        self._volcar()
+
+        offsets_32 = self.blob_size < 1 << 32
+        fuentes = json.dumps(list(self._fuentes), ensure_ascii=False).encode('utf-8')
+        directorio = os.path.dirname(os.path.abspath(self.ruta))
+        fd, temporal = tempfile.mkstemp(dir=directorio, prefix=f".{os.path.basename(self.ruta)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(b'\0' * _HEADER.size)
+                posiciones = {}
+                for nombre in _SECTIONS:
+                    posiciones[nombre] = _align(f)
+                    if nombre == 'sources':
+                        f.write(fuentes)
+                        continue
+                    spill = self._spills[nombre]
+                    spill.seek(0)
+                    if nombre == 'token_offsets' and offsets_32:
+                        # Los offsets se acumulan en 64 bits y se reducen a 32 por bloques
+                        while True:
+                            bloque = array('Q')
+                            bloque.frombytes(spill.read(_FLUSH_ITEMS * 8))
+                            if not bloque:
+                                break
+                            array('I', bloque).tofile(f)
+                    else:
+                        shutil.copyfileobj(spill, f, 1 << 20)
+                f.seek(0)
+                f.write(_HEADER.pack(MAGIC, VERSION, FLAG_OFFSETS_32 if offsets_32 else 0,
+                                     self.num_sentences, self.num_tokens, self.blob_size, len(self._fuentes),
+                                     *(posiciones[nombre] for nombre in _SECTIONS)))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporal, self.ruta)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        finally:
+            self._descartar()
+
+
+class _TokenSequence:
+    """Vista de todos los tokens del corpus que decodifica solo los índices pedidos."""
+
+    def __init__(self, corpus):
+        self._offsets = corpus.token_offsets
+        self._blob = corpus.blob
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            inicio, fin, paso = indice.indices(len(self))
+            if paso != 1:
+                return [self[i] for i in range(inicio, fin, paso)]
+            offsets = self._offsets[inicio:fin + 1].tolist() if fin > inicio else []
+            blob = self._blob
+            return [str(blob[a:b], 'utf-8') for a, b in zip(offsets, offsets[1:])]
+        if indice < 0:
+            indice += len(self)
+        return str(self._blob[self._offsets[indice]:self._offsets[indice + 1]], 'utf-8')
+
+
+class CorpusBin:
+    """
+    Lector de un .nerbin mapeado en memoria.
+
+    Attributes:
+        num_sentences (int): Número de sentencias
+        num_tokens (int): Número de tokens
+        tags (memoryview): Etiqueta de cada token (formato 'B')
+        token_offsets (memoryview): Offsets de los tokens en el blob ('I' o 'Q')
+        sentence_offsets (memoryview): Primer token de cada sentencia ('Q')
+        files (memoryview): Id de archivo de origen de cada sentencia ('I')
+        lines (memoryview): Línea de origen de cada sentencia ('I')
+        sources (list): Rutas de origen, indexadas por id de archivo
+        blob (memoryview): Tokens en UTF-8
+        tokens: Secuencia indexable de todos los tokens (decodifica bajo demanda)
+    """
+
+    def __init__(self, ruta):
+        if sys.byteorder != 'little':
+            raise OSError("El formato .nerbin solo se puede mapear en máquinas little-endian")
+        self.ruta = ruta
+        with open(ruta, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._abrir()
+        except BaseException:
+            self._mmap.close()
+            raise
+
+    def _abrir(self):
+        mv = memoryview(self._mmap)
+        self._views = [mv]
+        if len(mv) < _HEADER.size:
+            raise ValueError(f"{self.ruta} no es un corpus {EXTENSION}")
+        (magic, version, flags, self.num_sentences, self.num_tokens, blob_size, num_fuentes,
+         *posiciones) = _HEADER.unpack_from(mv)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.ruta} no es un corpus {EXTENSION} (versión {VERSION})")
+        seccion = dict(zip(_SECTIONS, posiciones))
+        ancho = 4 if flags & FLAG_OFFSETS_32 else 8
+
+        def vista(nombre, elementos, tamano, formato):
+            inicio = seccion[nombre]
+            v = mv[inicio:inicio + elementos * tamano].cast(formato)
+            self._views.append(v)
+            return v
+
+        self.token_offsets = vista('token_offsets', self.num_tokens + 1, ancho, 'I' if ancho == 4 else 'Q')
+        self.tags = vista('tags', self.num_tokens, 1, 'B')
+        self.sentence_offsets = vista('sentences', self.num_sentences + 1, 8, 'Q')
+        self.files = vista('files', self.num_sentences, 4, 'I')
+        self.lines = vista('lines', self.num_sentences, 4, 'I')
+        self.blob = vista('blob', blob_size, 1, 'B')
+        self.sources = json.loads(bytes(mv[seccion['sources']:seccion['blob']]).rstrip(b'\0'))
+        if len(self.sources) != num_fuentes:
+            raise ValueError(f"{self.ruta}: tabla de fuentes dañada")
+        self.tokens = _TokenSequence(self)
+
+    def close(self):
+        """
+        Libera las vistas y cierra el mapa. Si aún quedan arreglos de arrays() vivos,
+        el mapa se cierra cuando el último de ellos se libere.
+        """
+        try:
+            for v in reversed(self._views):
+                v.release()
+            self._mmap.close()
+        except BufferError:
+            pass
+        self._views = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.num_sentences
+
+    def sentence_tokens(self, i):
+        """Tokens de la sentencia i."""
+        return self.tokens[self.sentence_offsets[i]:self.sentence_offsets[i + 1]]
+
+    def sentence_tags(self, i):
+        """Etiquetas de la sentencia i como lista de enteros."""
+        return self.tags[self.sentence_offsets[i]:self.sentence_offsets[i + 1]].tolist()
+
+    def __getitem__(self, i):
+        """(tokens, etiquetas) de la sentencia i."""
+        if i < 0:
+            i += self.num_sentences
+        if not 0 <= i < self.num_sentences:
+            raise IndexError(i)
+        return self.sentence_tokens(i), self.sentence_tags(i)
+
+    def __iter__(self):
+        for i in range(self.num_sentences):
+            yield self.sentence_tokens(i), self.sentence_tags(i)
+
+    def records(self):
+        """Genera cada sentencia como {"sentencia": [...], "tag": [...]}, igual que en JSONL."""
+        for tokens, tags in self:
+            yield {"sentencia": tokens, "tag": tags}
+
+    def provenance(self, i):
+        """(archivo de origen, línea de origen) de la sentencia i."""
+        return self.sources[self.files[i]], self.lines[i]
+
+    def source_ranges(self):
+        """
+        Agrupa las sentencias consecutivas que vienen del mismo archivo de origen.
+
+        Returns:
+            list: Tuplas (ruta de origen, primera sentencia, fin exclusivo)
+        """
+        rangos = []
+        inicio = 0
+        files = self.files
+        for i in range(1, self.num_sentences + 1):
+            if i == self.num_sentences or files[i] != files[inicio]:
+                rangos.append((self.sources[files[inicio]], inicio, i))
+                inicio = i
+        return rangos
+
+    def arrays(self):
+        """
+        Etiquetas y offsets de sentencia como arreglos de NumPy sin copia, listos para
+        bio_spans.decode_spans (requiere NumPy).
+
+        Returns:
+            tuple: (etiquetas uint8, offsets de sentencia uint64)
+        """
+        import numpy as np
+        return np.frombuffer(self.tags, dtype=np.uint8), np.frombuffer(self.sentence_offsets, dtype=np.uint64)
+
+
+def _archivos_jsonl(entradas):
+    """Expande carpetas a sus .json/.jsonl (recursivo y en orden) y conserva los archivos."""
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            for root, dirs, files in os.walk(entrada):
+                dirs.sort()
+                for archivo in sorted(files):
+                    if archivo.endswith(('.json', '.jsonl')):
+                        yield os.path.join(root, archivo)
+        else:
+            yield entrada
+
+
+def jsonl_a_bin(entradas, salida):
+    """
+    Convierte archivos JSONL (o carpetas con ellos) en un único .nerbin.
+
+    Cada sentencia conserva su archivo (como ruta absoluta, para que no dependa del
+    directorio actual) y su línea de origen. Las líneas vacías, mal formadas o con
+    etiquetas que no caben en un byte se omiten y se informan.
+
+    Returns:
+        dict: {"archivos", "sentencias", "tokens", "omitidas"}
+    """
+    estadisticas = {"archivos": 0, "sentencias": 0, "tokens": 0, "omitidas": 0}
+    with CorpusWriter(salida) as writer:
+        for ruta in _archivos_jsonl(entradas):
+            estadisticas["archivos"] += 1
+            origen = os.path.abspath(ruta)
+            try:
+                with open(ruta, 'r', encoding='utf-8') as f:
+                    for num_linea, linea in enumerate(f, start=1):
+                        if not linea.strip():
+                            continue
+                        try:
+                            entrada = json.loads(linea)
+                            writer.add(entrada['sentencia'], entrada['tag'], origen, num_linea)
+                        except (ValueError, KeyError, TypeError) as e:
+                            print(f"[ERROR] Línea omitida en {ruta}, línea {num_linea}: {e}")
+                            estadisticas["omitidas"] += 1
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"[ERROR] No se pudo leer {ruta}: {e}")
+        estadisticas["sentencias"] = writer.num_sentences
+        estadisticas["tokens"] = writer.num_tokens
+    return estadisticas
+
+
+def bin_a_jsonl(entrada, salida):
+    """
+    Escribe un .nerbin como JSONL, una sentencia por línea y en el orden del corpus.
+
+    Returns:
+        int: Número de sentencias escritas
+    """
+    with CorpusBin(entrada) as corpus, open(salida, 'w', encoding='utf-8') as f:
+        for registro in corpus.records():
+            f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        return len(corpus)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    p = subparsers.add_parser('a-bin', help='convierte archivos o carpetas JSONL en un .nerbin')
+    p.add_argument('entradas', nargs='+', help='archivos .json/.jsonl o carpetas')
+    p.add_argument('-o', '--salida', required=True, help=f'archivo {EXTENSION} de salida')
+
+    p = subparsers.add_parser('a-jsonl', help='convierte un .nerbin en JSONL')
+    p.add_argument('entrada', help=f'archivo {EXTENSION}')
+    p.add_argument('-o', '--salida', required=True, help='archivo JSONL de salida')
+
+    p = subparsers.add_parser('info', help='muestra los contadores de un .nerbin')
+    p.add_argument('entrada', help=f'archivo {EXTENSION}')
+
+    args = parser.parse_args()
+    if args.comando == 'a-bin':
+        e = jsonl_a_bin(args.entradas, args.salida)
+        print(f"✅ {e['sentencias']} sentencias y {e['tokens']} tokens de {e['archivos']} archivos "
+              f"escritos en {args.salida} ({e['omitidas']} líneas omitidas)")
+    elif args.comando == 'a-jsonl':
+        n = bin_a_jsonl(args.entrada, args.salida)
+        print(f"✅ {n} sentencias escritas en {args.salida}")
+    else:
+        with CorpusBin(args.entrada) as corpus:
+            print(f"Sentencias: {corpus.num_sentences}")
+            print(f"Tokens: {corpus.num_tokens}")
+            print(f"Bytes de texto: {len(corpus.blob)}")
+            print(f"Archivos de origen: {len(corpus.sources)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Índice persistente e incremental de sentencias para la deduplicación.
+
+Guarda en SQLite, para cada archivo .json del árbol, su mtime, tamaño y hash de
+contenido, y para cada sentencia el hash de su texto normalizado con su ubicación
+(archivo, línea). En cada ejecución solo se vuelven a parsear los archivos nuevos o
+modificados, de modo que añadir un archivo a un árbol grande no obliga a releerlo entero.
+
+Lo usan script_automatic.py y secure_erase_script.py con la opción --indice.
+"""
+
+import hashlib
+import io
+import json
+import os
+import sqlite3
+from collections import defaultdict
+
+from detect_duplicates import hash_sentencia
+
+INDICE_POR_DEFECTO = ".indice_duplicados.sqlite"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS archivos (
+    id INTEGER PRIMARY KEY,
+    ruta TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    tamano INTEGER NOT NULL,
+    hash_contenido BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sentencias (
+    hash BLOB NOT NULL,
+    id_archivo INTEGER NOT NULL,
+    linea INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sentencias_hash ON sentencias(hash);
+CREATE INDEX IF NOT EXISTS idx_sentencias_archivo ON sentencias(id_archivo);
+"""
+
+
+class IndiceDuplicados:
+    """
+    Índice hash de sentencia -> (archivo, línea) respaldado por SQLite.
+
+    Args:
+        ruta_db (str): Ruta del archivo SQLite (se crea si no existe)
+    """
+
+    def __init__(self, ruta_db=INDICE_POR_DEFECTO):
+        self.ruta_db = ruta_db
+        self.conexion = sqlite3.connect(ruta_db)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.executescript(_ESQUEMA)
+
+    def cerrar(self):
+        self.conexion.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def actualizar(self, carpeta_base):
+        """
+        Sincroniza el índice con el árbol de carpetas.
+
+        Los archivos con el mismo mtime y tamaño no se leen. Si cambia alguno de los
+        dos pero el hash de contenido coincide, solo se actualizan los metadatos. Las
+        rutas se guardan absolutas para que el índice no dependa del directorio actual.
+        Solo se dan de baja los archivos desaparecidos de `carpeta_base`, así que varias
+        carpetas pueden compartir el mismo índice.
+
+        Returns:
+            dict: Contadores {"archivos", "reindexados", "sin_cambios", "errores", "eliminados"}
+        """
+        carpeta_base = os.path.abspath(carpeta_base)
+        conocidos = {
+            ruta: (id_archivo, mtime_ns, tamano, hash_contenido)
+            for id_archivo, ruta, mtime_ns, tamano, hash_contenido
+            in self.conexion.execute("SELECT id, ruta, mtime_ns, tamano, hash_contenido FROM archivos")
+        }
+        estadisticas = {"archivos": 0, "reindexados": 0, "sin_cambios": 0, "errores": 0, "eliminados": 0}
+        vistos = set()
+
+        with self.conexion:
+            for root, _, files in os.walk(carpeta_base):
+                for archivo in files:
+                    if not archivo.endswith('.json'):
+                        continue
+                    ruta = os.path.join(root, archivo)
+                    vistos.add(ruta)
+                    estadisticas["archivos"] += 1
+                    try:
+                        st = os.stat(ruta)
+                    except OSError as e:
+                        print(f"[ERROR] No se pudo leer {ruta}: {e}")
+                        continue
+
+                    previo = conocidos.get(ruta)
+                    if previo is not None and previo[1] == st.st_mtime_ns and previo[2] == st.st_size:
+                        estadisticas["sin_cambios"] += 1
+                        continue
+                    indexado = self._indexar(ruta, st, previo)
+                    if indexado is None:
+                        estadisticas["errores"] += 1
+                    elif indexado:
+                        estadisticas["reindexados"] += 1
+                    else:
+                        estadisticas["sin_cambios"] += 1
+
+            for ruta, (id_archivo, *_) in conocidos.items():
+                if ruta.startswith(carpeta_base + os.sep) and ruta not in vistos:
+                    self.conexion.execute("DELETE FROM sentencias WHERE id_archivo = ?", (id_archivo,))
+                    self.conexion.execute("DELETE FROM archivos WHERE id = ?", (id_archivo,))
+                    estadisticas["eliminados"] += 1
+
+        return estadisticas
+
+    def reindexar_archivo(self, ruta):
+        """Vuelve a indexar un archivo concreto, por ejemplo después de reescribirlo."""
+        ruta = os.path.abspath(ruta)
+        fila = self.conexion.execute(
+            "SELECT id, mtime_ns, tamano, hash_contenido FROM archivos WHERE ruta = ?", (ruta,)).fetchone()
+        with self.conexion:
+            self._indexar(ruta, os.stat(ruta), fila)
+
+    def _indexar(self, ruta, st, previo):
+        """
+        Parsea un archivo y reemplaza sus sentencias en el índice.
+
+        Returns:
+            bool: False si el contenido no había cambiado y solo se actualizaron metadatos;
+                None si no se pudo leer (sus sentencias anteriores se borran, ver _descartar)
+        """
+        try:
+            with open(ruta, 'rb') as f:
+                contenido = f.read()
+            texto = contenido.decode('utf-8')
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"[ERROR] No se pudo leer {ruta}: {e}")
+            self._descartar(previo)
+            return None
+        hash_contenido = hashlib.blake2b(contenido, digest_size=16).digest()
+
+        if previo is not None:
+            id_archivo = previo[0]
+            self.conexion.execute(
+                "UPDATE archivos SET mtime_ns = ?, tamano = ?, hash_contenido = ? WHERE id = ?",
+                (st.st_mtime_ns, st.st_size, hash_contenido, id_archivo))
+            if previo[3] == hash_contenido:
+                return False
+            self.conexion.execute("DELETE FROM sentencias WHERE id_archivo = ?", (id_archivo,))
+        else:
+            id_archivo = self.conexion.execute(
+                "INSERT INTO archivos (ruta, mtime_ns, tamano, hash_contenido) VALUES (?, ?, ?, ?)",
+                (ruta, st.st_mtime_ns, st.st_size, hash_contenido)).lastrowid
+
+        filas = []
+        # Mismo reparto en líneas que al iterar el archivo en modo texto
+        for num_linea, linea in enumerate(io.StringIO(texto, newline=None), start=1):
+            if not linea.strip():
+                continue
+            try:
+                entrada = json.loads(linea)
+                filas.append((hash_sentencia(entrada['sentencia']), id_archivo, num_linea))
+            except json.JSONDecodeError as e:
+                print(f"[ERROR] JSON mal formado en {ruta}, línea {num_linea}: {e}")
+            except (KeyError, TypeError) as e:
+                print(f"[ERROR] Línea sin una 'sentencia' válida en {ruta}, línea {num_linea}: {e!r}")
+        self.conexion.executemany("INSERT INTO sentencias (hash, id_archivo, linea) VALUES (?, ?, ?)", filas)
+        return True
+
+    def _descartar(self, previo):
+        """
+        Borra las sentencias de un archivo indexado que ya no se pudo leer, para que sus
+        líneas anteriores no cuenten como primera ocurrencia de nada. Se vacía su hash,
+        así que se vuelve a indexar en cuanto se pueda leer.
+        """
+        if previo is None:
+            return
+        self.conexion.execute("UPDATE archivos SET hash_contenido = X'' WHERE id = ?", (previo[0],))
+        self.conexion.execute("DELETE FROM sentencias WHERE id_archivo = ?", (previo[0],))
+
+    def total_sentencias(self, carpeta_base=None):
+        """Número de sentencias indexadas, solo las de `carpeta_base` si se indica."""
+        filtro, parametros = _filtro_carpeta(carpeta_base)
+        consulta = f"SELECT COUNT(*) FROM sentencias s JOIN archivos a ON a.id = s.id_archivo WHERE {filtro}"
+        return self.conexion.execute(consulta, parametros).fetchone()[0]
+
+    def duplicados(self, carpeta_base=None):
+        """
+        Devuelve las sentencias que aparecen más de una vez.
+
+        Las ubicaciones de cada grupo se ordenan por (ruta, línea), y los grupos por su
+        primera ubicación, de modo que "la primera ocurrencia" es estable entre ejecuciones.
+
+        Args:
+            carpeta_base (str): Considerar solo los archivos de esta carpeta (por defecto,
+                todos los del índice)
+
+        Returns:
+            dict: hash de la sentencia -> lista de (ruta, línea)
+        """
+        filtro, parametros = _filtro_carpeta(carpeta_base)
+        grupos = defaultdict(list)
+        consulta = f"""
+            SELECT s.hash, a.ruta, s.linea
+            FROM sentencias s JOIN archivos a ON a.id = s.id_archivo
+            WHERE {filtro} AND s.hash IN (
+                SELECT s.hash FROM sentencias s JOIN archivos a ON a.id = s.id_archivo
+                WHERE {filtro} GROUP BY s.hash HAVING COUNT(*) > 1)
+            ORDER BY a.ruta, s.linea
+        """
+        for hash_, ruta, linea in self.conexion.execute(consulta, parametros * 2):
+            grupos[hash_].append((ruta, linea))
+        return grupos
+
+
+def _filtro_carpeta(carpeta_base):
+    """
+    Condición SQL sobre a.ruta (y sus parámetros) para los archivos bajo `carpeta_base`.
+
+    Se expresa como un rango [prefijo, prefijo con el último carácter incrementado) en
+    lugar de con LIKE, que trataría '%' y '_' del nombre como comodines.
+    """
+    if carpeta_base is None:
+        return "1", ()
+    prefijo = os.path.join(os.path.abspath(carpeta_base), '')
+    siguiente = prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+    return "a.ruta >= ? AND a.ruta < ?", (prefijo, siguiente)
@@ -0,0 +1,79 @@
+"""
+Motor de eliminación de líneas para los scripts de deduplicación.
+
+Cada archivo se recorre una sola vez, saltando los números de línea marcados, y se
+escribe en un archivo temporal del mismo directorio que después reemplaza al original
+con os.replace. Si el proceso se interrumpe, el archivo original queda intacto.
+"""
+
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+
+def eliminar_lineas(archivo, lineas_a_eliminar):
+    """
+    Elimina de un archivo las líneas indicadas (numeradas desde 1) de forma atómica.
+
+    Args:
+        archivo (str): Ruta del archivo a reescribir
+        lineas_a_eliminar (iterable): Números de línea a eliminar
+
+    Returns:
+        dict: número de línea -> contenido eliminado (sin espacios en los extremos)
+    """
+    pendientes = sorted(set(lineas_a_eliminar))
+    eliminadas = {}
+    directorio = os.path.dirname(os.path.abspath(archivo))
+    fd, temporal = tempfile.mkstemp(dir=directorio, prefix=f".{os.path.basename(archivo)}.", suffix=".tmp")
+
+    try:
+        with open(archivo, 'r', encoding='utf-8') as f_in, os.fdopen(fd, 'w', encoding='utf-8') as f_out:
+            k = 0
+            siguiente = pendientes[0] if pendientes else 0
+            for num_linea, linea in enumerate(f_in, start=1):
+                if num_linea == siguiente:
+                    eliminadas[num_linea] = linea.strip()
+                    k += 1
+                    siguiente = pendientes[k] if k < len(pendientes) else 0
+                    continue
+                f_out.write(linea)
+            f_out.flush()
+            os.fsync(f_out.fileno())
+        shutil.copymode(archivo, temporal)
+        os.replace(temporal, archivo)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+    return eliminadas
+
+
+def _eliminar_lineas_seguro(archivo, lineas_a_eliminar):
+    try:
+        return archivo, eliminar_lineas(archivo, lineas_a_eliminar), None
+    except Exception as e:
+        return archivo, None, e
+
+
+def eliminar_lineas_en_archivos(cambios_por_archivo, workers=1):
+    """
+    Aplica eliminar_lineas a varios archivos, en paralelo si workers > 1.
+
+    Args:
+        cambios_por_archivo (dict): ruta -> lista de números de línea a eliminar
+        workers (int): Número de procesos
+
+    Yields:
+        tuple: (ruta, dict de líneas eliminadas o None, excepción o None)
+    """
+    archivos = list(cambios_por_archivo)
+    if workers > 1 and len(archivos) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield from pool.map(_eliminar_lineas_seguro, archivos,
+                                [cambios_por_archivo[a] for a in archivos], chunksize=16)
+    else:
+        for archivo in archivos:
+            yield _eliminar_lineas_seguro(archivo, cambios_por_archivo[archivo])
@@ -1,31 +1,118 @@
+import os
+import json
+import argparse
+import hashlib
+import struct
+import tempfile
+from array import array
+from collections import defaultdict
+
+from corpus_bin import CorpusBin, es_corpus_bin
+from vocabulary import Vocabulary
+
+# Registro de la pasada de hashing: hash de 128 bits, id de archivo, número de línea
+REGISTRO = struct.Struct('<16sII')
+# Registro de la caché de hashes por archivo: hash de 128 bits, número de línea
+HASH_LINEA = struct.Struct('<16sI')
+
 def normalizar_texto(texto):
     return ' '.join(texto)
     #return ' '.join(texto).lower()
 
+def hash_sentencia(sentencia):
+    """Hash de 128 bits de la sentencia normalizada."""
+    return hashlib.blake2b(normalizar_texto(sentencia).encode('utf-8'), digest_size=16).digest()
+
+def _es_corpus(archivo):
+    return archivo.endswith('.json') or es_corpus_bin(archivo)
+
+def leer_sentencias(ruta):
+    """
+    Genera (número de línea, sentencia) de un .json, omitiendo las líneas vacías e
+    informando de las mal formadas, o (número de sentencia, sentencia) de un .nerbin,
+    con las sentencias numeradas desde 1 igual que las líneas.
+    """
+    if es_corpus_bin(ruta):
+        with CorpusBin(ruta) as corpus:
+            for i in range(len(corpus)):
+                yield i + 1, corpus.sentence_tokens(i)
+        return
+    with open(ruta, 'r', encoding='utf-8') as f:
+        for num_linea, linea in enumerate(f, start=1):
+            if not linea.strip():
+                continue
+            try:
+                entrada = json.loads(linea)
+            except json.JSONDecodeError as e:
+                print(f"[ERROR] JSON mal formado en {ruta}, línea {num_linea}: {e}")
+                continue
+            yield num_linea, entrada['sentencia']
+
+def _releer_lineas(ruta, lineas):
+    """Genera (número de línea, sentencia) solo para las líneas indicadas, en orden."""
+    if es_corpus_bin(ruta):
+        # Acceso directo: solo se decodifican las sentencias pedidas
+        with CorpusBin(ruta) as corpus:
+            for num_linea in sorted(lineas):
+                yield num_linea, corpus.sentence_tokens(num_linea - 1)
+        return
+    with open(ruta, 'r', encoding='utf-8') as f:
+        for num_linea, linea in enumerate(f, start=1):
+            if num_linea in lineas:
+                yield num_linea, json.loads(linea)['sentencia']
+
+def _hashes_archivo(ruta):
+    """Pares (hash, línea) empaquetados de todas las sentencias de un archivo."""
+    datos = bytearray()
+    for num_linea, sentencia in leer_sentencias(ruta):
+        datos += HASH_LINEA.pack(hash_sentencia(sentencia), num_linea)
+    return bytes(datos)
+
 def detectar_duplicados_en_subcarpetas(carpeta_base):
-    sentencias = defaultdict(list)  # clave: sentencia -> lista de (ruta, línea)
+    """
+    Detecta sentencias duplicadas con todo el corpus en memoria, en una sola pasada.
+
+    Cada sentencia normalizada se guarda como los ids de sus palabras en un Vocabulary
+    (array('I') empaquetado en bytes) en lugar de como str, y su ubicación como un
+    entero (id de archivo << 32 | línea); solo las repetidas acumulan un array('Q').
+    """
+    rutas = []  # id de archivo -> ruta
+    vocabulario = Vocabulary()
+    primeras = {}  # sentencia normalizada (ids) -> primera ubicación
+    repetidas = {}  # sentencia normalizada (ids) -> todas sus ubicaciones
 
     for root, _, files in os.walk(carpeta_base):
         for archivo in files:
-            if archivo.endswith('.json'):
+            if _es_corpus(archivo):
                 ruta = os.path.join(root, archivo)
+                id_archivo = len(rutas)
+                rutas.append(ruta)
                 try:
-                    with open(ruta, 'r', encoding='utf-8') as f:
-                        for num_linea, linea in enumerate(f, start=1):
-                            if not linea.strip():
-                                continue
-                            try:
-                                entrada = json.loads(linea)
-                                clave = normalizar_texto(entrada['sentencia'])
-                                sentencias[clave].append((ruta, num_linea))
-                            except json.JSONDecodeError as e:
-                                print(f"[ERROR] JSON mal formado en {ruta}, línea {num_linea}: {e}")
+                    for num_linea, sentencia in leer_sentencias(ruta):
+                        # Se internan las palabras del texto normalizado, de modo que dos
+                        # claves coinciden exactamente cuando coinciden sus textos
+                        clave = vocabulario.encode(normalizar_texto(sentencia).split(' ')).tobytes()
+                        ubicacion = id_archivo << 32 | num_linea
+                        primera = primeras.setdefault(clave, ubicacion)
+                        if primera != ubicacion:
+                            grupo = repetidas.get(clave)
+                            if grupo is None:
+                                grupo = repetidas[clave] = array('Q', [primera])
+                            grupo.append(ubicacion)
                 except Exception as e:
                     print(f"[ERROR] No se pudo leer {ruta}: {e}")
+    del primeras
 
-    # Filtrar las sentencias que aparecen en más de un archivo o en varias líneas
-    duplicadas = {s: ubicaciones for s, ubicaciones in sentencias.items() if len(ubicaciones) > 1}
+    # Las sentencias que aparecen en más de un archivo o en varias líneas, en orden de
+    # primera aparición
+    duplicadas = {}
+    for clave, ubicaciones in sorted(repetidas.items(), key=lambda item: item[1][0]):
+        texto = ' '.join(vocabulario.decode(array('I', clave)))
+        duplicadas[texto] = [(rutas[u >> 32], u & 0xFFFFFFFF) for u in ubicaciones]
+    imprimir_duplicadas(duplicadas)
+    return duplicadas
 
+def imprimir_duplicadas(duplicadas):
     if not duplicadas:
         print("✅ No se encontraron sentencias duplicadas entre archivos.")
     else:
@@ -36,7 +123,216 @@ def detectar_duplicados_en_subcarpetas(carpeta_base):
                 print(f"  ↳ Archivo: {archivo}, línea: {linea}")
             print()
 
+def detectar_duplicados_por_hash(carpeta_base, num_cubetas=1024, directorio_temporal=None, cache=None):
+    """
+    Detecta sentencias duplicadas con memoria acotada, sin guardar el texto del corpus.
+
+    Paso 1: cada sentencia se reduce a un registro (hash de 128 bits, id de archivo, línea)
+    que se reparte en `num_cubetas` archivos temporales según su hash.
+    Paso 2: cada cubeta se carga por separado para agrupar los hashes repetidos; las
+    ubicaciones de cada grupo se guardan empaquetadas en un array('Q') (id << 32 | línea).
+    Paso 3: solo se releen las líneas duplicadas, para imprimirlas y para descartar
+    colisiones de hash comparando el texto real.
+
+    Args:
+        carpeta_base (str): Carpeta raíz a recorrer
+        num_cubetas (int): Número de particiones en disco; más cubetas, menos memoria en el paso 2
+        directorio_temporal (str): Dónde crear las cubetas (por defecto, el temporal del sistema)
+        cache (CacheEtapas): Si se indica, los hashes de los archivos sin cambios se toman
+            de la caché en lugar de releerlos (ver stage_cache.py)
+
+    Returns:
+        dict: sentencia -> lista de (ruta, línea), solo para las sentencias duplicadas
+    """
+    rutas = []  # id de archivo -> ruta
+
+    with tempfile.TemporaryDirectory(dir=directorio_temporal) as tmp:
+        rutas_cubetas = [os.path.join(tmp, f"{k:04d}.bin") for k in range(num_cubetas)]
+        buffers = [bytearray() for _ in range(num_cubetas)]
+
+        def volcar(k):
+            with open(rutas_cubetas[k], 'ab') as f:
+                f.write(buffers[k])
+            buffers[k].clear()
+
+        # Paso 1: hashing en streaming
+        for root, _, files in os.walk(carpeta_base):
+            for archivo in files:
+                if not _es_corpus(archivo):
+                    continue
+                ruta = os.path.join(root, archivo)
+                id_archivo = len(rutas)
+                rutas.append(ruta)
+                try:
+                    if cache is not None:
+                        pares = HASH_LINEA.iter_unpack(
+                            cache.calcular(ruta, 'hashes', lambda: _hashes_archivo(ruta), version=1))
+                    else:
+                        pares = ((hash_sentencia(sentencia), num_linea) for num_linea, sentencia in leer_sentencias(ruta))
+                    for digest, num_linea in pares:
+                        k = int.from_bytes(digest[:4], 'little') % num_cubetas
+                        buffers[k] += REGISTRO.pack(digest, id_archivo, num_linea)
+                        if len(buffers[k]) >= 16384:
+                            volcar(k)
+                except Exception as e:
+                    print(f"[ERROR] No se pudo leer {ruta}: {e}")
+
+        for k in range(num_cubetas):
+            if buffers[k]:
+                volcar(k)
+
+        # Paso 2: agrupar hashes repetidos cubeta a cubeta
+        grupos = []
+        for ruta_cubeta in rutas_cubetas:
+            if not os.path.exists(ruta_cubeta):
+                continue
+            with open(ruta_cubeta, 'rb') as f:
+                datos = f.read()
+            primeras = {}
+            repetidos = {}
+            for digest, id_archivo, num_linea in REGISTRO.iter_unpack(datos):
+                ubicacion = id_archivo << 32 | num_linea
+                primera = primeras.setdefault(digest, ubicacion)
+                if primera != ubicacion:
+                    grupo = repetidos.get(digest)
+                    if grupo is None:
+                        grupo = repetidos[digest] = array('Q', [primera])
+                    grupo.append(ubicacion)
+            grupos.extend(repetidos.values())
+            del datos, primeras, repetidos
+
+    # Mismo orden que el modo en memoria: por primera aparición en el recorrido
+    grupos.sort(key=lambda g: g[0])
+    return _verificar_grupos(grupos, rutas)
+
+def _verificar_grupos(grupos, rutas):
+    """
+    Relee solo las líneas de los grupos candidatos y separa las colisiones de hash.
+
+    Las ubicaciones están ordenadas por (archivo, línea), así que al recorrer los
+    archivos en orden la primera ubicación de cada grupo se lee antes que las demás.
+    """
+    grupo_de = {}
+    lineas_por_archivo = defaultdict(set)
+    for g, ubicaciones in enumerate(grupos):
+        for ubicacion in ubicaciones:
+            grupo_de[ubicacion] = g
+            lineas_por_archivo[ubicacion >> 32].add(ubicacion & 0xFFFFFFFF)
+
+    texto_grupo = {}
+    miembros = defaultdict(list)  # (grupo, texto) -> ubicaciones verificadas
+    for id_archivo in sorted(lineas_por_archivo):
+        lineas = lineas_por_archivo[id_archivo]
+        try:
+            for num_linea, sentencia in _releer_lineas(rutas[id_archivo], lineas):
+                ubicacion = id_archivo << 32 | num_linea
+                g = grupo_de[ubicacion]
+                texto = normalizar_texto(sentencia)
+                texto_grupo.setdefault(g, texto)
+                miembros[(g, texto)].append(ubicacion)
+        except Exception as e:
+            print(f"[ERROR] No se pudo releer {rutas[id_archivo]}: {e}")
+
+    duplicadas = {}
+    for (g, texto), ubicaciones in miembros.items():
+        if texto != texto_grupo[g]:
+            print(f"[AVISO] Colisión de hash descartada en el grupo de {rutas[grupos[g][0] >> 32]}")
+        if len(ubicaciones) > 1:
+            duplicadas.setdefault(texto, []).extend(
+                (rutas[u >> 32], u & 0xFFFFFFFF) for u in ubicaciones)
+    return duplicadas
+
+def _releer_sentencias(ubicaciones, rutas):
+    """Relee solo las líneas indicadas (id << 32 | línea) y devuelve su texto normalizado."""
+    lineas_por_archivo = defaultdict(set)
+    for ubicacion in ubicaciones:
+        lineas_por_archivo[ubicacion >> 32].add(ubicacion & 0xFFFFFFFF)
+
+    textos = {}
+    for id_archivo in sorted(lineas_por_archivo):
+        lineas = lineas_por_archivo[id_archivo]
+        try:
+            for num_linea, sentencia in _releer_lineas(rutas[id_archivo], lineas):
+                textos[id_archivo << 32 | num_linea] = normalizar_texto(sentencia)
+        except Exception as e:
+            print(f"[ERROR] No se pudo releer {rutas[id_archivo]}: {e}")
+    return textos
+
+def detectar_casi_duplicados(carpeta_base, umbral=0.8, num_perm=64, directorio_temporal=None):
+    """
+    Detecta sentencias casi duplicadas (p. ej. que difieren en una fecha, una dosis o una
+    errata) con MinHash sobre shingles de tokens y LSH por bandas (requiere NumPy).
+
+    Solo se guardan en memoria la ubicación empaquetada de cada sentencia y su firma,
+    que se vuelca a disco por lotes; el texto de los grupos se relee al final.
+
+    Args:
+        carpeta_base (str): Carpeta raíz a recorrer
+        umbral (float): Similitud de Jaccard mínima entre sentencias de un mismo grupo
+        num_perm (int): Longitud de las firmas MinHash
+        directorio_temporal (str): Dónde guardar las firmas (por defecto, el temporal del sistema)
+    """
+    from near_duplicates import DetectorCasiDuplicados
+
+    rutas = []
+    ubicaciones = array('Q')
+
+    with tempfile.TemporaryDirectory(dir=directorio_temporal) as tmp:
+        detector = DetectorCasiDuplicados(umbral=umbral, num_perm=num_perm, directorio=tmp)
+        for root, _, files in os.walk(carpeta_base):
+            for archivo in files:
+                if not _es_corpus(archivo):
+                    continue
+                ruta = os.path.join(root, archivo)
+                id_archivo = len(rutas)
+                rutas.append(ruta)
+                try:
+                    for num_linea, sentencia in leer_sentencias(ruta):
+                        detector.agregar(sentencia)
+                        ubicaciones.append(id_archivo << 32 | num_linea)
+                except Exception as e:
+                    print(f"[ERROR] No se pudo leer {ruta}: {e}")
+
+        grupos = detector.grupos()
+        similitudes = [detector.similitud(ids[:1].repeat(len(ids)), ids) for ids in grupos]
+
+    if not grupos:
+        print(f"✅ No se encontraron sentencias casi duplicadas (Jaccard ≥ {umbral:.2f}).")
+        return
+
+    textos = _releer_sentencias([ubicaciones[i] for ids in grupos for i in ids], rutas)
+    print(f"🔁 Sentencias casi duplicadas encontradas (Jaccard ≥ {umbral:.2f}):\n")
+    for ids, similitud in zip(grupos, similitudes):
+        primera = ubicaciones[ids[0]]
+        print(f"- Sentencia: \"{textos.get(primera, '')}\"")
+        print(f"  ↳ Archivo: {rutas[primera >> 32]}, línea: {primera & 0xFFFFFFFF}")
+        for i, s in zip(ids[1:], similitud[1:]):
+            u = ubicaciones[i]
+            print(f"  ↳ Archivo: {rutas[u >> 32]}, línea: {u & 0xFFFFFFFF} (similitud {s:.2f}): \"{textos.get(u, '')}\"")
+        print()
+
 if __name__ == "__main__":
-    carpeta_actual = os.getcwd()
-    detectar_duplicados_en_subcarpetas(carpeta_actual)
+    parser = argparse.ArgumentParser(description="Detecta sentencias duplicadas en los .json y .nerbin de una carpeta y sus subcarpetas.")
+    parser.add_argument('carpeta', nargs='?', default=os.getcwd(), help="Carpeta base (por defecto, la actual)")
+    parser.add_argument('--hash', action='store_true',
+                        help="Modo de memoria acotada: agrupa por hash de 128 bits con cubetas en disco")
+    parser.add_argument('--cubetas', type=int, default=1024, help="Número de cubetas en disco del modo --hash")
+    parser.add_argument('--cache', nargs='?', const='.cache_etapas', default=None,
+                        help="En modo --hash, reutilizar los hashes de los archivos sin cambios (directorio de la caché)")
+    parser.add_argument('--tmp', default=None, help="Directorio para los archivos temporales de --hash y --casi-duplicados")
+    parser.add_argument('--casi-duplicados', action='store_true',
+                        help="Buscar sentencias casi duplicadas con MinHash/LSH (requiere NumPy)")
+    parser.add_argument('--umbral', type=float, default=0.8, help="Similitud de Jaccard mínima del modo --casi-duplicados")
+    parser.add_argument('--num-perm', type=int, default=64, help="Longitud de las firmas MinHash")
+    args = parser.parse_args()
 
+    if args.casi_duplicados:
+        detectar_casi_duplicados(args.carpeta, args.umbral, args.num_perm, args.tmp)
+    elif args.hash:
+        cache = None
+        if args.cache:
+            from stage_cache import CacheEtapas
+            cache = CacheEtapas(args.cache)
+        imprimir_duplicadas(detectar_duplicados_por_hash(args.carpeta, args.cubetas, args.tmp, cache))
+    else:
+        detectar_duplicados_en_subcarpetas(args.carpeta)
@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+Índice invertido persistente de entidades anotadas.
+
+Para cada entidad (tipo, frase normalizada) guarda en SQLite en qué archivos aparece y
+en qué posiciones (línea, token de inicio), de modo que preguntas como "¿qué archivos
+mencionan 'HER2/neu' como BIOMARKER?" se responden con una consulta al índice en lugar
+de volver a recorrer el corpus con all-entity-extractor.py.
+
+Las entidades se obtienen con la misma regla B_/I_ que extract_entities
+(TagSchema.spans). Las posiciones de cada (entidad, archivo) se guardan en una sola
+fila como enteros codificados en delta + varint: la diferencia de línea con la
+posición anterior y el token de inicio (relativo al anterior si la línea se repite).
+Como en dedup_index.py, el índice es incremental: solo se vuelven a leer los archivos
+nuevos o modificados (mtime, tamaño y hash de contenido).
+
+Las posiciones de un .nerbin se refieren al archivo y la línea de origen de cada
+sentencia (CorpusBin.provenance), igual que las de un .json, así que una búsqueda
+devuelve las mismas ubicaciones tanto si se indexaron los JSONL como su .nerbin. Si
+están indexados los dos, cada archivo de origen cuenta una sola vez.
+
+Uso:
+    python3 entity_index.py indexar CARPETA
+    python3 entity_index.py buscar "HER2/neu" --tipo BIOMARKER
+    python3 entity_index.py buscar her2 --prefijo --posiciones
+    python3 entity_index.py info
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import defaultdict
+
+from corpus_bin import CorpusBin, es_corpus_bin
+from tag_schema import TAG_SCHEMA
+
+INDICE_ENTIDADES_POR_DEFECTO = ".indice_entidades.sqlite"
+
+# Versión del esquema (PRAGMA user_version): un índice de otra versión se reconstruye
+_VERSION_ESQUEMA = 3
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS archivos (
+    id INTEGER PRIMARY KEY,
+    ruta TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    tamano INTEGER NOT NULL,
+    hash_contenido BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entidades (
+    id INTEGER PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    frase TEXT NOT NULL,
+    UNIQUE (tipo, frase)
+);
+CREATE INDEX IF NOT EXISTS idx_entidades_frase ON entidades(frase);
+CREATE TABLE IF NOT EXISTS apariciones (
+    id_entidad INTEGER NOT NULL,
+    id_archivo INTEGER NOT NULL,
+    fuente TEXT NOT NULL,  -- ruta absoluta del archivo de origen ('' si es el propio archivo)
+    total INTEGER NOT NULL,
+    posiciones BLOB NOT NULL,
+    PRIMARY KEY (id_entidad, id_archivo, fuente)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_apariciones_archivo ON apariciones(id_archivo);
+"""
+
+
+def normalizar_frase(texto):
+    """Frase normalizada de una entidad: tokens unidos por un espacio y en minúsculas."""
+    if not isinstance(texto, str):
+        texto = ' '.join(texto)
+    return ' '.join(texto.split()).casefold()
+
+
+def _escribir_varint(datos, n):
+    while n >= 0x80:
+        datos.append(n & 0x7F | 0x80)
+        n >>= 7
+    datos.append(n)
+
+
+def codificar_posiciones(posiciones):
+    """
+    Codifica una lista ordenada de (línea, token) en delta + varint.
+
+    Returns:
+        bytes: Pares (delta de línea, token) donde el token es relativo al anterior si
+            el delta de línea es 0
+    """
+    datos = bytearray()
+    linea_previa = token_previo = 0
+    for linea, token in posiciones:
+        delta = linea - linea_previa
+        _escribir_varint(datos, delta)
+        _escribir_varint(datos, token if delta else token - token_previo)
+        linea_previa, token_previo = linea, token
+    return bytes(datos)
+
+
+def decodificar_posiciones(datos):
+    """Inversa de codificar_posiciones: lista de (línea, token)."""
+    valores = []
+    n = desplazamiento = 0
+    for byte in datos:
+        n |= (byte & 0x7F) << desplazamiento
+        if byte & 0x80:
+            desplazamiento += 7
+        else:
+            valores.append(n)
+            n = desplazamiento = 0
+
+    posiciones = []
+    linea = token = 0
+    for delta, valor in zip(valores[0::2], valores[1::2]):
+        if delta:
+            linea += delta
+            token = valor
+        else:
+            token += valor
+        posiciones.append((linea, token))
+    return posiciones
+
+
+def _sentencias(ruta, contenido):
+    """
+    Genera (fuente, línea, sentencia, etiquetas) de un .json ya leído o de un .nerbin.
+
+    La fuente es '' para las líneas del propio archivo; en un .nerbin es la ruta
+    absoluta del archivo de origen de cada sentencia (las relativas, de un .nerbin
+    creado antes de que corpus_bin.py las guardara absolutas, se resuelven desde la
+    carpeta del .nerbin) y la línea, su línea en él.
+    Las sentencias de un .nerbin sin origen registrado usan su número de sentencia
+    dentro del contenedor.
+    """
+    if es_corpus_bin(ruta):
+        directorio = os.path.dirname(ruta)
+        absolutas = {}
+        with CorpusBin(ruta) as corpus:
+            for i, (sentencia, tags) in enumerate(corpus):
+                fuente, num_linea = corpus.provenance(i)
+                if not fuente:
+                    fuente, num_linea = '', i + 1
+                else:
+                    absoluta = absolutas.get(fuente)
+                    if absoluta is None:
+                        absoluta = absolutas[fuente] = os.path.normpath(os.path.join(directorio, fuente))
+                    fuente = absoluta
+                yield fuente, num_linea, sentencia, tags
+        return
+    # Mismo reparto en líneas que al iterar el archivo en modo texto
+    for num_linea, linea in enumerate(io.StringIO(contenido.decode('utf-8'), newline=None), start=1):
+        if not linea.strip():
+            continue
+        try:
+            entrada = json.loads(linea)
+        except json.JSONDecodeError as e:
+            print(f"[ERROR] JSON mal formado en {ruta}, línea {num_linea}: {e}")
+            continue
+        yield '', num_linea, entrada['sentencia'], entrada['tag']
+
+
+class IndiceEntidades:
+    """
+    Índice (tipo, frase normalizada) -> archivos y posiciones, respaldado por SQLite.
+
+    Args:
+        ruta_db (str): Ruta del archivo SQLite (se crea si no existe)
+        schema (TagSchema): Esquema de etiquetas con el que se extraen las entidades
+    """
+
+    def __init__(self, ruta_db=INDICE_ENTIDADES_POR_DEFECTO, schema=TAG_SCHEMA):
+        self.ruta_db = ruta_db
+        self.schema = schema
+        self.conexion = sqlite3.connect(ruta_db)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        version, = self.conexion.execute("PRAGMA user_version").fetchone()
+        if version != _VERSION_ESQUEMA:
+            # Índice vacío o de una versión anterior: se vuelve a crear desde el corpus
+            with self.conexion:
+                for tabla in ("apariciones", "entidades", "archivos"):
+                    self.conexion.execute(f"DROP TABLE IF EXISTS {tabla}")
+            self.conexion.execute(f"PRAGMA user_version = {_VERSION_ESQUEMA}")
+        self.conexion.executescript(_ESQUEMA)
+        self._ids = {}  # (tipo, frase) -> id de entidad ya consultado
+
+    def cerrar(self):
+        self.conexion.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def actualizar(self, carpeta_base):
+        """
+        Sincroniza el índice con los .json y .nerbin del árbol de carpetas.
+
+        Returns:
+            dict: Contadores {"archivos", "reindexados", "sin_cambios", "errores", "eliminados"}
+        """
+        carpeta_base = os.path.abspath(carpeta_base)
+        conocidos = {
+            ruta: (id_archivo, mtime_ns, tamano, hash_contenido)
+            for id_archivo, ruta, mtime_ns, tamano, hash_contenido
+            in self.conexion.execute("SELECT id, ruta, mtime_ns, tamano, hash_contenido FROM archivos")
+        }
+        estadisticas = {"archivos": 0, "reindexados": 0, "sin_cambios": 0, "errores": 0, "eliminados": 0}
+        vistos = set()
+
+        with self.conexion:
+            for root, _, files in os.walk(carpeta_base):
+                for archivo in sorted(files):
+                    if not (archivo.endswith('.json') or archivo.endswith('.nerbin')):
+                        continue
+                    ruta = os.path.join(root, archivo)
+                    vistos.add(ruta)
+                    estadisticas["archivos"] += 1
+                    try:
+                        st = os.stat(ruta)
+                    except OSError as e:
+                        print(f"[ERROR] No se pudo leer {ruta}: {e}")
+                        continue
+
+                    previo = conocidos.get(ruta)
+                    if previo is not None and previo[1] == st.st_mtime_ns and previo[2] == st.st_size:
+                        estadisticas["sin_cambios"] += 1
+                        continue
+                    indexado = self._indexar(ruta, st, previo)
+                    if indexado is None:
+                        estadisticas["errores"] += 1
+                    elif indexado:
+                        estadisticas["reindexados"] += 1
+                    else:
+                        estadisticas["sin_cambios"] += 1
+
+            for ruta, (id_archivo, *_) in conocidos.items():
+                if ruta.startswith(carpeta_base + os.sep) and ruta not in vistos:
+                    self.conexion.execute("DELETE FROM apariciones WHERE id_archivo = ?", (id_archivo,))
+                    self.conexion.execute("DELETE FROM archivos WHERE id = ?", (id_archivo,))
+                    estadisticas["eliminados"] += 1
+
+            if estadisticas["reindexados"] or estadisticas["errores"] or estadisticas["eliminados"]:
+                # Entidades que ya no aparecen en ningún archivo
+                self.conexion.execute(
+                    "DELETE FROM entidades WHERE id NOT IN (SELECT DISTINCT id_entidad FROM apariciones)")
+                self._ids.clear()
+
+        return estadisticas
+
+    def _id_entidad(self, tipo, frase):
+        clave = (tipo, frase)
+        id_entidad = self._ids.get(clave)
+        if id_entidad is None:
+            fila = self.conexion.execute(
+                "SELECT id FROM entidades WHERE tipo = ? AND frase = ?", clave).fetchone()
+            if fila is not None:
+                id_entidad = fila[0]
+            else:
+                id_entidad = self.conexion.execute(
+                    "INSERT INTO entidades (tipo, frase) VALUES (?, ?)", clave).lastrowid
+            self._ids[clave] = id_entidad
+        return id_entidad
+
+    def _indexar(self, ruta, st, previo):
+        """
+        Extrae las entidades de un archivo y reemplaza sus apariciones en el índice.
+
+        Returns:
+            bool: True si se indexó, False si el contenido no había cambiado y None si
+                no se pudo leer (sus apariciones anteriores se borran, ver _descartar)
+        """
+        try:
+            with open(ruta, 'rb') as f:
+                contenido = f.read()
+        except OSError as e:
+            print(f"[ERROR] No se pudo leer {ruta}: {e}")
+            self._descartar(previo)
+            return None
+        hash_contenido = hashlib.blake2b(contenido, digest_size=16).digest()
+
+        if previo is not None and previo[3] == hash_contenido:
+            self.conexion.execute("UPDATE archivos SET mtime_ns = ?, tamano = ? WHERE id = ?",
+                                  (st.st_mtime_ns, st.st_size, previo[0]))
+            return False
+
+        posiciones = defaultdict(list)  # (id de tipo, frase, fuente) -> [(línea, token)]
+        spans = self.schema.spans
+        try:
+            for fuente, num_linea, sentencia, tags in _sentencias(ruta, contenido):
+                for inicio, fin, id_tipo in spans(tags):
+                    posiciones[(id_tipo, normalizar_frase(sentencia[inicio:fin]), fuente)].append((num_linea, inicio))
+        except Exception as e:
+            print(f"[ERROR] No se pudo indexar {ruta}: {e}")
+            self._descartar(previo)
+            return None
+
+        if previo is not None:
+            id_archivo = previo[0]
+            self.conexion.execute(
+                "UPDATE archivos SET mtime_ns = ?, tamano = ?, hash_contenido = ? WHERE id = ?",
+                (st.st_mtime_ns, st.st_size, hash_contenido, id_archivo))
+            self.conexion.execute("DELETE FROM apariciones WHERE id_archivo = ?", (id_archivo,))
+        else:
+            id_archivo = self.conexion.execute(
+                "INSERT INTO archivos (ruta, mtime_ns, tamano, hash_contenido) VALUES (?, ?, ?, ?)",
+                (ruta, st.st_mtime_ns, st.st_size, hash_contenido)).lastrowid
+
+        type_names = self.schema.type_names
+        # Las sentencias de una misma fuente no tienen por qué estar seguidas en un .nerbin
+        self.conexion.executemany(
+            "INSERT INTO apariciones (id_entidad, id_archivo, fuente, total, posiciones) VALUES (?, ?, ?, ?, ?)",
+            [(self._id_entidad(type_names[id_tipo], frase), id_archivo, fuente, len(lista),
+              codificar_posiciones(sorted(lista)))
+             for (id_tipo, frase, fuente), lista in posiciones.items()])
+        return True
+
+    def _descartar(self, previo):
+        """
+        Borra las apariciones de un archivo modificado que no se pudo indexar, para que
+        las búsquedas no devuelvan posiciones de su contenido anterior. Se conservan su
+        mtime y se vacía su hash, así que se vuelve a intentar en la siguiente
+        actualización aunque recupere el contenido anterior.
+        """
+        if previo is None:
+            return
+        self.conexion.execute("UPDATE archivos SET hash_contenido = X'' WHERE id = ?", (previo[0],))
+        self.conexion.execute("DELETE FROM apariciones WHERE id_archivo = ?", (previo[0],))
+
+    def buscar(self, frase, tipo=None, prefijo=False, limite=None):
+        """
+        Busca una entidad por su frase (normalizada como en el índice).
+
+        Args:
+            frase (str): Frase a buscar
+            tipo (str): Restringir a un tipo de entidad ("BIOMARKER")
+            prefijo (bool): Devolver todas las entidades cuya frase empieza por `frase`
+            limite (int): Número máximo de entidades devueltas
+
+        Returns:
+            list: (tipo, frase, [(ruta, apariciones, posiciones codificadas)]) por entidad,
+                ordenadas por tipo y frase; las posiciones se leen con decodificar_posiciones.
+                En las entidades de un .nerbin, la ruta es el archivo de origen
+        """
+        frase = normalizar_frase(frase)
+        condiciones, parametros = [], []
+        if prefijo:
+            if frase:
+                # Rango [frase, siguiente) sobre el índice de frases en lugar de LIKE
+                condiciones.append("frase >= ?")
+                parametros.append(frase)
+                siguiente = _siguiente_prefijo(frase)
+                if siguiente is not None:
+                    condiciones.append("frase < ?")
+                    parametros.append(siguiente)
+        else:
+            condiciones.append("frase = ?")
+            parametros.append(frase)
+        if tipo is not None:
+            condiciones.append("tipo = ?")
+            parametros.append(tipo)
+        filtro = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        if limite is not None:
+            filtro += " ORDER BY tipo, frase LIMIT ?"
+            parametros.append(limite)
+
+        consulta = f"""
+            SELECT e.tipo, e.frase, CASE p.fuente WHEN '' THEN a.ruta ELSE p.fuente END AS ruta,
+                   p.total, p.posiciones
+            FROM (SELECT id, tipo, frase FROM entidades {filtro}) e
+            JOIN apariciones p ON p.id_entidad = e.id
+            JOIN archivos a ON a.id = p.id_archivo
+            ORDER BY e.tipo, e.frase, ruta, p.fuente != '', a.ruta
+        """
+        resultados = []
+        for tipo_entidad, frase_entidad, ruta, total, posiciones in self.conexion.execute(consulta, parametros):
+            if not resultados or resultados[-1][:2] != (tipo_entidad, frase_entidad):
+                resultados.append((tipo_entidad, frase_entidad, []))
+            ubicaciones = resultados[-1][2]
+            # Un mismo origen indexado dos veces (el JSONL y su .nerbin): se queda el
+            # propio archivo, que va primero
+            if not ubicaciones or ubicaciones[-1][0] != ruta:
+                ubicaciones.append((ruta, total, posiciones))
+        return resultados
+
+    def estadisticas(self):
+        """Número de archivos, entidades distintas y apariciones indexadas."""
+        archivos, = self.conexion.execute("SELECT COUNT(*) FROM archivos").fetchone()
+        entidades, = self.conexion.execute("SELECT COUNT(*) FROM entidades").fetchone()
+        # Cada (entidad, archivo de origen) cuenta una vez, como en buscar
+        apariciones, = self.conexion.execute("""
+            SELECT COALESCE(SUM(total), 0) FROM (
+                SELECT total, ROW_NUMBER() OVER (
+                    PARTITION BY p.id_entidad, CASE p.fuente WHEN '' THEN a.ruta ELSE p.fuente END
+                    ORDER BY p.fuente != '', a.ruta) AS orden
+                FROM apariciones p JOIN archivos a ON a.id = p.id_archivo)
+            WHERE orden = 1
+        """).fetchone()
+        return {"archivos": archivos, "entidades": entidades, "apariciones": apariciones}
+
+
+def _siguiente_prefijo(prefijo):
+    """
+    Menor cadena mayor que todas las que empiezan por `prefijo`, o None si no existe
+    (el prefijo solo tiene U+10FFFF, que no se puede incrementar).
+    """
+    prefijo = prefijo.rstrip('\U0010ffff')
+    if not prefijo:
+        return None
+    return prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+
+
+def _imprimir_resultados(resultados, mostrar_posiciones):
+    lineas = []
+    for tipo, frase, ubicaciones in resultados:
+        total = sum(apariciones for _, apariciones, _ in ubicaciones)
+        lineas.append(f"{tipo}\t\"{frase}\": {total} apariciones en {len(ubicaciones)} archivos")
+        for ruta, apariciones, posiciones in ubicaciones:
+            if mostrar_posiciones:
+                detalle = ' '.join(f"{linea}:{token}" for linea, token in decodificar_posiciones(posiciones))
+                lineas.append(f"  ↳ {ruta} ({apariciones}): {detalle}")
+            else:
+                lineas.append(f"  ↳ {ruta} ({apariciones})")
+    if lineas:
+        sys.stdout.write('\n'.join(lineas) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Índice invertido de las entidades anotadas del corpus.")
+    parser.add_argument('--indice', default=INDICE_ENTIDADES_POR_DEFECTO,
+                        help=f"Archivo SQLite del índice (por defecto {INDICE_ENTIDADES_POR_DEFECTO})")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    p = subparsers.add_parser('indexar', help="Crear o actualizar el índice con los .json y .nerbin de una carpeta")
+    p.add_argument('carpeta', nargs='?', default=os.getcwd(), help="Carpeta base (por defecto, la actual)")
+
+    p = subparsers.add_parser('buscar', help="Buscar en qué archivos y posiciones aparece una entidad")
+    p.add_argument('frase', help="Frase de la entidad (se normaliza: espacios simples y minúsculas)")
+    p.add_argument('--tipo', default=None, help="Tipo de entidad, p. ej. BIOMARKER")
+    p.add_argument('--prefijo', action='store_true', help="Buscar todas las entidades que empiezan por la frase")
+    p.add_argument('--posiciones', action='store_true', help="Mostrar las posiciones línea:token de cada archivo")
+    p.add_argument('--limite', type=int, default=None, help="Número máximo de entidades a mostrar")
+
+    subparsers.add_parser('info', help="Mostrar el tamaño del índice")
+    args = parser.parse_args()
+
+    with IndiceEntidades(args.indice) as indice:
+        if args.comando == 'indexar':
+            inicio = time.perf_counter()
+            estadisticas = indice.actualizar(args.carpeta)
+            print(f"Archivos: {estadisticas['archivos']} ({estadisticas['reindexados']} indexados, "
+                  f"{estadisticas['sin_cambios']} sin cambios, {estadisticas['errores']} con errores, "
+                  f"{estadisticas['eliminados']} eliminados) "
+                  f"en {time.perf_counter() - inicio:.2f} s")
+        elif args.comando == 'buscar':
+            inicio = time.perf_counter()
+            resultados = indice.buscar(args.frase, args.tipo, args.prefijo, args.limite)
+            transcurrido = time.perf_counter() - inicio
+            if resultados:
+                _imprimir_resultados(resultados, args.posiciones)
+            else:
+                print(f"No se encontraron entidades para \"{normalizar_frase(args.frase)}\"")
+            print(f"\n{len(resultados)} entidades en {transcurrido * 1000:.1f} ms")
+        else:
+            estadisticas = indice.estadisticas()
+            print(f"{args.indice}: {estadisticas['archivos']} archivos, {estadisticas['entidades']} entidades "
+                  f"distintas, {estadisticas['apariciones']} apariciones")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Conteo aproximado de entidades con memoria fija: Count-Min Sketch más las top-k
+entidades más frecuentes (heavy hitters) de cada tipo.
+
+El sketch es una tabla de `depth` filas por `width` contadores; cada (tipo, frase)
+suma su frecuencia en un contador por fila, elegido por hash, y su frecuencia estimada
+es el mínimo de esos contadores. La estimación nunca es menor que la real y la supera
+como mucho en e / width veces el total de entidades contadas, con probabilidad
+1 - e^-depth. Junto al sketch se mantienen, por tipo, hasta 2 * top_k candidatas con
+su estimación; al superar ese número se conservan las top_k de mayor estimación, así
+que una entidad frecuente vuelve a entrar (con su estimación acumulada) aunque se
+haya descartado antes.
+
+La memoria es width * depth * 8 bytes más las candidatas, sea cual sea el corpus. Dos
+sketches con las mismas dimensiones se combinan sumando sus tablas, lo que permite
+contar en paralelo (ver all-entity-extractor.py --sketch --workers).
+"""
+
+import hashlib
+import heapq
+import math
+import operator
+from array import array
+from collections import Counter, defaultdict
+
+SKETCH_WIDTH = 1 << 18
+SKETCH_DEPTH = 4
+TOP_K = 100
+
+_MASK_64 = (1 << 64) - 1
+
+
+class CountMinSketch:
+    """
+    Count-Min Sketch de contadores de 64 bits sobre claves str.
+
+    Args:
+        width (int): Contadores por fila
+        depth (int): Número de filas (funciones hash)
+    """
+
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        if width < 1 or depth < 1:
+            raise ValueError("width y depth deben ser positivos")
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.table = array('Q', bytes(8 * width * depth))
+
+    def _cells(self, key):
+        # Doble hashing (h1 + i * h2) a partir de un único blake2b de 128 bits
+        digest = hashlib.blake2b(key.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        width = self.width
+        return [row * width + ((h1 + row * h2) & _MASK_64) % width for row in range(self.depth)]
+
+    def add(self, key, count=1):
+        """Suma `count` a la clave y devuelve su frecuencia estimada tras sumarlo."""
+        table = self.table
+        estimate = None
+        for cell in self._cells(key):
+            value = table[cell] + count
+            table[cell] = value
+            if estimate is None or value < estimate:
+                estimate = value
+        self.total += count
+        return estimate
+
+    def estimate(self, key):
+        table = self.table
+        return min(table[cell] for cell in self._cells(key))
+
+    def merge(self, other):
+        """Suma a este sketch otro de las mismas dimensiones."""
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Solo se pueden combinar sketches con el mismo width y depth")
+        self.table = array('Q', map(operator.add, self.table, other.table))
+        self.total += other.total
+
+
+class EntitySketch:
+    """
+    Frecuencias aproximadas de entidades por tipo con memoria fija.
+
+    Args:
+        width (int): Contadores por fila del Count-Min Sketch
+        depth (int): Filas del Count-Min Sketch
+        top_k (int): Entidades más frecuentes que se conservan de cada tipo
+    """
+
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH, top_k=TOP_K):
+        self.sketch = CountMinSketch(width, depth)
+        self.top_k = top_k
+        self.candidates = defaultdict(dict)  # tipo -> frase -> frecuencia estimada
+
+    def add(self, entity_type, phrase, count=1):
+        estimate = self.sketch.add(f"{entity_type}\t{phrase}", count)
+        candidates = self.candidates[entity_type]
+        candidates[phrase] = estimate
+        if len(candidates) > 2 * self.top_k:
+            self._prune(entity_type)
+
+    def update(self, entities_by_type):
+        """Suma un diccionario tipo -> Counter de frases (p. ej. el de extract_entities)."""
+        for entity_type, phrases in entities_by_type.items():
+            for phrase, count in phrases.items():
+                self.add(entity_type, phrase, count)
+
+    def _prune(self, entity_type):
+        candidates = self.candidates[entity_type]
+        self.candidates[entity_type] = dict(
+            heapq.nlargest(self.top_k, candidates.items(), key=operator.itemgetter(1)))
+
+    def merge(self, other):
+        """Suma a este sketch otro con las mismas dimensiones (p. ej. el de otro proceso)."""
+        self.sketch.merge(other.sketch)
+        for entity_type, phrases in other.candidates.items():
+            self.candidates[entity_type].update(phrases)
+        # Las estimaciones de ambas partes se recalculan sobre la tabla combinada
+        for entity_type, candidates in self.candidates.items():
+            for phrase in candidates:
+                candidates[phrase] = self.sketch.estimate(f"{entity_type}\t{phrase}")
+            self._prune(entity_type)
+        return self
+
+    def most_common(self):
+        """
+        Returns:
+            dict: tipo -> Counter con las top_k entidades y su frecuencia estimada
+        """
+        return {entity_type: Counter(dict(heapq.nlargest(self.top_k, candidates.items(),
+                                                         key=operator.itemgetter(1))))
+                for entity_type, candidates in self.candidates.items()}
+
+    def error_bound(self):
+        """Sobreestimación máxima (con probabilidad 1 - e^-depth) de cada frecuencia."""
+        return math.e / self.sketch.width * self.sketch.total
@@ -1,85 +1,57 @@
-import json
 import sys
+import argparse
 
-def validate_jsonl_file(file_path):
+from jsonl_validation import (BACKENDS, load_backend, validate_file, validate_file_cached, validate_file_chunked,
+                              print_file_result)
+
+def validate_jsonl_file(file_path, backend=None, jobs=1, semantic=True, cache=None):
     """
     Valida un archivo JSONL que contiene anotaciones de tokens y etiquetas.
     
     Args:
         file_path (str): Ruta al archivo JSONL a validar
+        backend (str): Backend de parseo JSON (None: el más rápido instalado)
+        jobs (int): Con más de un proceso, el archivo se mapea en memoria y se valida
+            por rangos de líneas en paralelo (mismo resultado que en serie)
+        semantic (bool): Comprobar también que las etiquetas existan y sigan el esquema BIO
+        cache (CacheEtapas): Reutilizar el resultado si el contenido del archivo no cambió
         
     Returns:
         int: Número de errores encontrados
     """
-    error_count = 0
-    
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            for line_number, line in enumerate(file, 1):
-                try:
-                    # Verificar que la línea no esté vacía
-                    if not line.strip():
-                        print(f"\033[93m⚠️  Línea {line_number}: Línea vacía (permitida en JSONL)\033[0m")
-                        error_count += 1
-                        continue
-                    
-                    # Intentar parsear el JSON
-                    data = json.loads(line)
-                    
-                    # Verificar que el JSON tiene las claves requeridas
-                    if not all(key in data for key in ['sentencia', 'tag']):
-                        print(f"\033[91m❌ Línea {line_number}: Faltan claves requeridas 'sentencia' o 'tag'\033[0m")
-                        error_count += 1
-                        continue
-                    
-                    # Verificar que los valores son listas
-                    if not isinstance(data['sentencia'], list) or not isinstance(data['tag'], list):
-                        print(f"\033[91m❌ Línea {line_number}: 'sentencia' y 'tag' deben ser listas\033[0m")
-                        error_count += 1
-                        continue
-                    
-                    # Verificar que las longitudes coinciden
-                    if len(data['sentencia']) != len(data['tag']):
-                        print(f"\033[91m❌ Línea {line_number}: Longitud discrepante | Sentencia: {len(data['sentencia'])} vs Tag: {len(data['tag'])}\033[0m")
-                        error_count += 1
-                        continue
-                    
-                    # Verificar que todos los elementos en 'tag' son números
-                    if not all(isinstance(tag, (int, float)) for tag in data['tag']):
-                        print(f"\033[91m❌ Línea {line_number}: Todos los elementos en 'tag' deben ser números\033[0m")
-                        error_count += 1
-                        continue
-                    
-                    # Verificar que todos los elementos en 'sentencia' son strings
-                    if not all(isinstance(token, str) for token in data['sentencia']):
-                        print(f"\033[91m❌ Línea {line_number}: Todos los elementos en 'sentencia' deben ser strings\033[0m")
-                        error_count += 1
-                        continue
-                    
-                except json.JSONDecodeError as e:
-                    print(f"\033[91m❌ Línea {line_number}: {str(e)}\033[0m")
-                    error_count += 1
-                    
-    except FileNotFoundError:
-        print(f"\033[91m❌ Error: No se pudo encontrar el archivo '{file_path}'\033[0m")
-        return 1
-    except Exception as e:
-        print(f"\033[91m❌ Error inesperado: {str(e)}\033[0m")
-        return 1
-    
-    if error_count == 0:
-        print(f"\033[92m✅ {file_path} válido con la estructura requerida.\033[0m")
+    if cache is not None:
+        errors = validate_file_cached(file_path, cache, backend=backend, semantic=semantic, jobs=jobs)
+    elif jobs > 1:
+        errors = validate_file_chunked(file_path, jobs, backend=backend, semantic=semantic)
     else:
-        print(f"\n\033[91m❌ Se encontraron {error_count} errores en {file_path}\033[0m")
-    
-    return error_count
+        errors = validate_file(file_path, backend=backend, semantic=semantic)
+    print_file_result(file_path, errors)
+    return len(errors)
 
 # Ejemplo de uso
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("\033[93mUso: python validator.py <ruta_al_archivo.json>\033[0m")
-        sys.exit(1)
-        
-    file_path = sys.argv[1]
-    error_count = validate_jsonl_file(file_path)
+    parser = argparse.ArgumentParser(description="Valida un archivo JSONL de anotaciones de tokens y etiquetas.")
+    parser.add_argument('file_path', help="Ruta al archivo JSONL a validar")
+    parser.add_argument('--parser', choices=['auto'] + list(BACKENDS), default='auto',
+                        help="Backend de parseo JSON (por defecto, el más rápido instalado)")
+    parser.add_argument('--solo-estructura', action='store_true',
+                        help="No comprobar ids de etiqueta ni transiciones BIO, solo la estructura")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="Procesos para validar por rangos un archivo grande mapeado en memoria")
+    parser.add_argument('--cache', nargs='?', const='.cache_etapas', default=None,
+                        help="Reutilizar el resultado si el archivo no cambió (directorio de la caché)")
+    args = parser.parse_args()
+    
+    try:
+        backend = load_backend(args.parser).name
+    except ImportError:
+        parser.error(f"el backend '{args.parser}' no está instalado")
+    
+    cache = None
+    if args.cache:
+        from stage_cache import CacheEtapas
+        cache = CacheEtapas(args.cache)
+    
+    error_count = validate_jsonl_file(args.file_path, backend=backend, jobs=args.jobs,
+                                      semantic=not args.solo_estructura, cache=cache)
     sys.exit(1 if error_count > 0 else 0)
@@ -0,0 +1,534 @@
+"""
+Motor de validación de archivos JSONL de anotaciones ({"sentencia": [...], "tag": [...]}).
+
+Las comprobaciones no imprimen nada: cada problema se devuelve como un registro
+estructurado {"file", "line", "level", "message"} y es el script que llama quien decide
+cómo presentarlo. Así los archivos se pueden validar en procesos trabajadores y el
+proceso principal genera un único reporte al final.
+
+Las líneas se procesan por lotes: las comprobaciones de estructura (claves, listas,
+longitudes) se hacen línea a línea, pero las de tipos de los elementos se hacen una sola
+vez sobre todas las etiquetas y todos los tokens del lote. Solo si el lote falla se
+vuelve a recorrer línea a línea para localizar los errores.
+
+Con las comprobaciones semánticas (activadas por defecto) se verifica además que cada
+etiqueta sea un id de ENTITY_TAGS o la etiqueta "O", y que toda etiqueta I_ siga a una
+B_ o I_ del mismo tipo (esquema IOB2). Las etiquetas del lote se empaquetan en un único
+bytes y se comprueban con tablas de bytes.translate y operaciones de enteros grandes,
+sin recorrerlas en Python salvo para localizar los errores de un lote que falla.
+
+El parseo usa el decodificador más rápido instalado (orjson o simdjson, en ese orden)
+y, si no hay ninguno, json de la biblioteca estándar. Cuando el decodificador rápido
+rechaza una línea (con el tipo de excepción que sea), se vuelve a parsear con json:
+así los mensajes de error y los casos límite que solo acepta json (NaN, enteros
+enormes) son los mismos con cualquier backend. Las líneas que el decodificador rápido
+acepta pero no pasan las comprobaciones también se vuelven a parsear con json antes de
+informar, porque orjson lee como float los enteros que no caben en 64 bits
+(99999999999999999999999 sería "no entera" en lugar de "fuera de rango"). ujson solo
+se usa si se pide expresamente, porque acepta JSON que json rechaza (números con ceros
+a la izquierda, "01") y con él el veredicto dependería de lo que haya instalado.
+"""
+
+import importlib.util
+import io
+import json
+import mmap
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain, repeat
+
+from tag_schema import OUTSIDE_TAG, TAG_SCHEMA
+
+LEVEL_ERROR = "error"
+LEVEL_WARNING = "warning"
+
+# json.loads solo produce estos tipos para números (bool es subclase de int)
+TAG_TYPES = frozenset((int, float, bool))
+TOKEN_TYPES = frozenset((str,))
+
+# Tamaño aproximado en caracteres de cada lote de líneas leído con readlines
+BATCH_HINT = 1 << 18
+
+# Versión de las comprobaciones: cambiarla invalida los resultados en la caché de etapas
+VALIDATION_VERSION = 3
+
+JsonBackend = namedtuple('JsonBackend', ['name', 'loads'])
+
+# Backends en orden de preferencia: nombre -> (módulo, función de parseo)
+BACKENDS = {
+    'orjson': ('orjson', 'loads'),
+    'simdjson': ('simdjson', 'loads'),
+    'ujson': ('ujson', 'loads'),
+    'json': ('json', 'loads'),
+}
+
+# Backends que se prueban con 'auto': solo los que rechazan lo mismo que json
+AUTO_BACKENDS = ('orjson', 'simdjson', 'json')
+
+
+def load_backend(name=None):
+    """
+    Devuelve el backend de parseo pedido, o el más rápido disponible.
+
+    Args:
+        name (str): 'orjson', 'simdjson', 'ujson', 'json', o None/'auto' para elegir
+            automáticamente entre AUTO_BACKENDS
+
+    Returns:
+        JsonBackend: (nombre, función loads)
+
+    Raises:
+        ImportError: Si se pide un backend concreto que no está instalado
+    """
+    names = AUTO_BACKENDS if name in (None, 'auto') else [name]
+    for candidate in names:
+        module_name, function = BACKENDS[candidate]
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            if name not in (None, 'auto'):
+                raise
+            continue
+        return JsonBackend(candidate, getattr(module, function))
+    return JsonBackend('json', json.loads)
+
+
+def available_backends():
+    """Nombres de los backends instalados, en orden de preferencia."""
+    return [name for name in BACKENDS if importlib.util.find_spec(BACKENDS[name][0]) is not None]
+
+
+def _tag_tables(schema=TAG_SCHEMA, outside_tag=OUTSIDE_TAG):
+    """
+    Tablas de 256 bytes para bytes.translate, indexadas por id de etiqueta.
+
+    Returns:
+        tuple: (ids válidos como bytes, id -> tipo + 1 (0 para "O"),
+            id -> 0xFF si es una etiqueta I_, nombres de etiqueta)
+    """
+    valid = [tag for tag in range(schema.size) if schema.tag_names[tag] is not None] + [outside_tag]
+    types = bytearray(256)
+    inside = bytearray(256)
+    names = list(schema.tag_names) + [None] * (outside_tag + 1 - schema.size)
+    names[outside_tag] = "O"
+    for tag in range(schema.size):
+        if schema.tag_type[tag] >= 0:
+            types[tag] = schema.tag_type[tag] + 1
+            if not schema.is_begin[tag]:
+                inside[tag] = 0xFF
+    return bytes(valid), bytes(types), bytes(inside), names
+
+
+_VALID_TAGS, _TYPE_TABLE, _INSIDE_TABLE, _TAG_NAMES = _tag_tables()
+_SENTENCE_SEPARATOR = bytes((OUTSIDE_TAG,))
+
+
+def make_error(file_path, line_number, message, level=LEVEL_ERROR):
+    return {"file": file_path, "line": line_number, "level": level, "message": message}
+
+
+def _only_types(values, allowed):
+    """True si todos los valores son exactamente de alguno de los tipos permitidos."""
+    return set(map(type, values)) <= allowed
+
+
+def _check_structure(data):
+    """Comprobaciones que no recorren los elementos; devuelve el mensaje de error o None."""
+    if not isinstance(data, dict) or 'sentencia' not in data or 'tag' not in data:
+        return "Faltan claves requeridas 'sentencia' o 'tag'"
+    tokens, tags = data['sentencia'], data['tag']
+    if not isinstance(tokens, list) or not isinstance(tags, list):
+        return "'sentencia' y 'tag' deben ser listas"
+    if len(tokens) != len(tags):
+        return f"Longitud discrepante | Sentencia: {len(tokens)} vs Tag: {len(tags)}"
+    return None
+
+
+def _check_elements(tokens, tags):
+    """Comprobaciones de tipos de una línea, en el orden del validador original."""
+    if not _only_types(tags, TAG_TYPES):
+        return "Todos los elementos en 'tag' deben ser números"
+    if not _only_types(tokens, TOKEN_TYPES):
+        return "Todos los elementos en 'sentencia' deben ser strings"
+    return None
+
+
+def _tags_valid(packed):
+    """
+    Comprueba ids y transiciones BIO de etiquetas empaquetadas en bytes de una sola vez.
+
+    Cada transición se verifica alineando cada byte con el anterior: en orden
+    little-endian, desplazar el entero 8 bits coloca en cada posición el tipo de la
+    etiqueta previa, el XOR es cero donde el tipo se mantiene y la máscara de etiquetas
+    I_ se queda solo con las posiciones donde eso es obligatorio. Las sentencias de un
+    lote se separan con la etiqueta "O" para que ninguna herede el tipo de la anterior.
+    """
+    if packed.translate(None, _VALID_TAGS):
+        return False
+    types = int.from_bytes(packed.translate(_TYPE_TABLE), 'little')
+    inside = int.from_bytes(packed.translate(_INSIDE_TABLE), 'little')
+    return not ((types ^ (types << 8)) & inside)
+
+
+def _check_tags(tags):
+    """Comprobaciones semánticas de una línea; devuelve el mensaje del primer error o None."""
+    previous = None
+    for position, tag in enumerate(tags):
+        if not isinstance(tag, int):
+            return f"Etiqueta no entera en la posición {position}: {tag!r} (los ids deben ser enteros)"
+        if not 0 <= tag < 256 or tag not in _VALID_TAGS:
+            return f"Etiqueta fuera de rango en la posición {position}: {tag!r} (ids válidos 0-{OUTSIDE_TAG})"
+        if _INSIDE_TABLE[tag] and (previous is None or _TYPE_TABLE[previous] != _TYPE_TABLE[tag]):
+            previous_name = "inicio de sentencia" if previous is None else _TAG_NAMES[previous]
+            return f"Transición BIO inválida en la posición {position}: {previous_name} -> {_TAG_NAMES[tag]}"
+        previous = tag
+    return None
+
+
+def check_records(token_lists, tag_lists, semantic=True):
+    """
+    Comprueba tipos y, opcionalmente, ids y transiciones BIO de un lote de registros
+    cuya estructura ya es correcta (dos listas de la misma longitud por registro).
+
+    El lote se comprueba de una vez y solo se recorre registro a registro si falla.
+
+    Args:
+        token_lists (list): Tokens de cada registro
+        tag_lists (list): Etiquetas de cada registro
+        semantic (bool): Comprobar también ids de etiqueta y transiciones BIO
+
+    Returns:
+        list: Pares (índice del registro, mensaje) de los registros con error, en orden
+    """
+    failed = []
+    indices = range(len(tag_lists))
+
+    # Tipos de todos los elementos del lote de una vez; si falla, localizar registro a registro
+    if tag_lists and not (_only_types(chain.from_iterable(tag_lists), TAG_TYPES)
+                          and _only_types(chain.from_iterable(token_lists), TOKEN_TYPES)):
+        typed = []
+        for i in indices:
+            message = _check_elements(token_lists[i], tag_lists[i])
+            if message is not None:
+                failed.append((i, message))
+            else:
+                typed.append(i)
+        indices = typed
+
+    # Ids y transiciones BIO de todas las etiquetas del lote, separando sentencias con "O"
+    if semantic and indices:
+        try:
+            packed = _SENTENCE_SEPARATOR.join([bytes(tag_lists[i]) for i in indices])
+        except (TypeError, ValueError):  # floats o valores fuera de 0-255
+            packed = None
+        if packed is None or not _tags_valid(packed):
+            for i in indices:
+                message = _check_tags(tag_lists[i])
+                if message is not None:
+                    failed.append((i, message))
+            failed.sort()
+
+    return failed
+
+
+def validate_lines(lines, first_line_number=1, file_path=None, loads=json.loads, semantic=True):
+    """
+    Valida un lote de líneas JSONL consecutivas.
+
+    Args:
+        lines (list): Líneas de texto del lote
+        first_line_number (int): Número de la primera línea del lote en el archivo
+        file_path (str): Archivo al que pertenecen, para los registros de error
+        loads (callable): Función de parseo del backend elegido
+        semantic (bool): Comprobar también ids de etiqueta y transiciones BIO
+
+    Returns:
+        list: Registros de error ordenados por línea (como mucho uno por línea)
+    """
+    errors = []
+    parsed = []  # (número de línea, datos) de las líneas con estructura correcta
+
+    for line_number, line in enumerate(lines, first_line_number):
+        if not line.strip():
+            errors.append(make_error(file_path, line_number, "Línea vacía (permitida en JSONL)", LEVEL_WARNING))
+            continue
+        try:
+            data = loads(line)
+        except Exception:
+            # Repetir con json para que el resultado no dependa del backend (simdjson,
+            # por ejemplo, lanza RuntimeError con los enteros enormes)
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                errors.append(make_error(file_path, line_number, str(e)))
+                continue
+        message = _check_structure(data)
+        if message is not None:
+            errors.append(make_error(file_path, line_number, message))
+        else:
+            parsed.append((line_number, data, line))
+
+    failed = check_records([data['sentencia'] for _, data, _ in parsed], [data['tag'] for _, data, _ in parsed],
+                           semantic)
+    if failed and loads is not json.loads:
+        failed = _recheck_with_json(parsed, failed, semantic)
+    if failed:
+        errors.extend(make_error(file_path, parsed[i][0], message) for i, message in failed)
+        errors.sort(key=lambda error: error["line"])
+    return errors
+
+
+def _recheck_with_json(parsed, failed, semantic):
+    """
+    Vuelve a comprobar los registros con error tras parsear su línea con json, para que
+    el mensaje sea el mismo que sin decodificador rápido (ver la docstring del módulo).
+    """
+    rechecked = []
+    for i, message in failed:
+        try:
+            data = json.loads(parsed[i][2])
+        except json.JSONDecodeError:
+            rechecked.append((i, message))  # ujson acepta líneas que json rechaza
+            continue
+        retry = check_records([data['sentencia']], [data['tag']], semantic)
+        if retry:
+            rechecked.append((i, retry[0][1]))
+    return rechecked
+
+
+def validate_file(file_path, batch_hint=BATCH_HINT, backend=None, semantic=True):
+    """
+    Valida un archivo JSONL completo.
+
+    Los problemas que impiden leer el archivo se devuelven como un único registro con
+    "line" None, igual que el validador original los contaba como un error.
+
+    Args:
+        file_path (str): Ruta del archivo
+        batch_hint (int): Tamaño aproximado de cada lote de líneas
+        backend (str): Nombre del backend de parseo (None: el más rápido disponible)
+        semantic (bool): Comprobar también ids de etiqueta y transiciones BIO
+
+    Returns:
+        list: Registros de error del archivo
+    """
+    loads = load_backend(backend).loads
+    errors = []
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            line_number = 1
+            while True:
+                lines = file.readlines(batch_hint)
+                if not lines:
+                    break
+                errors.extend(validate_lines(lines, line_number, file_path, loads, semantic))
+                line_number += len(lines)
+    except FileNotFoundError:
+        return [make_error(file_path, None, f"Error: No se pudo encontrar el archivo '{file_path}'")]
+    except Exception as e:
+        return [make_error(file_path, None, f"Error inesperado: {str(e)}")]
+    return errors
+
+
+def _cache_key(cache, file_path, semantic, backend=None):
+    """
+    Clave del resultado de un archivo en la caché de etapas, o None si no se puede leer.
+
+    Incluye el backend de parseo resuelto, porque el veredicto depende de él (ujson
+    acepta líneas que json rechaza).
+    """
+    try:
+        return cache.clave(file_path, 'validar', semantic=semantic, backend=load_backend(backend).name,
+                           version=VALIDATION_VERSION)
+    except OSError:
+        return None  # validate_file informa del error de lectura
+
+
+def validate_file_cached(file_path, cache, backend=None, semantic=True, jobs=1):
+    """
+    validate_file (o validate_file_chunked con jobs > 1) con la caché de etapas: un
+    archivo con el mismo contenido que uno ya validado con las mismas opciones no se
+    vuelve a leer (ver stage_cache.py).
+    """
+    def validate():
+        if jobs > 1:
+            return validate_file_chunked(file_path, jobs, backend=backend, semantic=semantic)
+        return validate_file(file_path, backend=backend, semantic=semantic)
+
+    key = _cache_key(cache, file_path, semantic, backend)
+    if key is None:
+        return validate()
+    found, errors = cache.obtener(key)
+    if found:
+        # El resultado puede venir de otra ruta con el mismo contenido
+        return [dict(error, file=file_path) for error in errors]
+    errors = validate()
+    cache.guardar(key, errors)
+    return errors
+
+
+def validate_files(file_paths, jobs=1, backend=None, semantic=True, cache=None):
+    """
+    Valida varios archivos, en paralelo si jobs > 1.
+
+    Con `cache` (CacheEtapas), los archivos cuyo contenido ya se validó se resuelven
+    en el proceso principal y solo los demás se reparten entre los trabajadores.
+
+    Yields:
+        tuple: (ruta, lista de registros de error), en el orden de file_paths
+    """
+    file_paths = list(file_paths)
+    validate = partial(validate_file, backend=backend, semantic=semantic)
+    if cache is not None:
+        backend_name = load_backend(backend).name
+        keys = [_cache_key(cache, file_path, semantic, backend_name) for file_path in file_paths]
+        cached = {}
+        for i, key in enumerate(keys):
+            if key is not None:
+                found, errors = cache.obtener(key)
+                if found:
+                    cached[i] = [dict(error, file=file_paths[i]) for error in errors]
+        pending = [i for i in range(len(file_paths)) if i not in cached]
+        computed = validate_files([file_paths[i] for i in pending], jobs, backend, semantic)
+        results = dict(zip(pending, (errors for _, errors in computed)))
+        for i, file_path in enumerate(file_paths):
+            if i in cached:
+                yield file_path, cached[i]
+                continue
+            errors = results.pop(i)
+            if keys[i] is not None:
+                cache.guardar(keys[i], errors)
+            yield file_path, errors
+        return
+
+    if jobs > 1 and len(file_paths) > 1:
+        chunksize = max(1, len(file_paths) // (jobs * 8))
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            yield from zip(file_paths, pool.map(validate, file_paths, chunksize=chunksize))
+    else:
+        for file_path in file_paths:
+            yield file_path, validate(file_path)
+
+
+# Tamaño mínimo de archivo para repartirlo en rangos entre procesos
+CHUNKED_MIN_SIZE = 8 << 20
+
+
+def newline_aligned_ranges(mm, num_ranges):
+    """
+    Divide un archivo mapeado en rangos de bytes que empiezan justo después de un salto de línea.
+
+    Como en UTF-8 el byte 0x0A nunca forma parte de otro carácter, cada rango se puede
+    decodificar por separado, y un "\r\n" nunca queda partido entre dos rangos.
+
+    Returns:
+        list: Tuplas (inicio, fin) que cubren el archivo completo y en orden
+    """
+    size = len(mm)
+    step = max(1, size // num_ranges)
+    ranges = []
+    start = 0
+    while start < size:
+        cut = mm.find(b'\n', min(start + step, size) - 1)
+        end = size if cut < 0 else cut + 1
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def _validate_range(file_path, start, end, backend=None, semantic=True, batch_hint=BATCH_HINT):
+    """
+    Valida las líneas de un rango de bytes de un archivo, numeradas desde 1 dentro del rango.
+
+    El rango se recorre en lotes de ~batch_hint bytes cortados también en saltos de
+    línea, de modo que la memoria por proceso no depende del tamaño del rango.
+
+    Returns:
+        tuple: (número de líneas del rango, registros de error con números locales)
+    """
+    loads = load_backend(backend).loads
+    errors = []
+    line_count = 0
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        position = start
+        while position < end:
+            cut = mm.find(b'\n', min(position + batch_hint, end) - 1, end)
+            batch_end = end if cut < 0 else cut + 1
+            # Mismo reparto en líneas (saltos universales) que el modo texto del validador serie
+            lines = io.StringIO(mm[position:batch_end].decode('utf-8'), newline=None).readlines()
+            errors.extend(validate_lines(lines, line_count + 1, file_path, loads, semantic))
+            line_count += len(lines)
+            position = batch_end
+    return line_count, errors
+
+
+def validate_file_chunked(file_path, jobs, backend=None, semantic=True, min_size=CHUNKED_MIN_SIZE):
+    """
+    Valida un único archivo JSONL grande repartiendo rangos de bytes entre procesos.
+
+    El archivo se mapea en memoria y se corta en rangos alineados a saltos de línea;
+    cada proceso devuelve cuántas líneas tiene su rango y sus errores con números de
+    línea locales, que después se desplazan con la suma acumulada de líneas de los
+    rangos anteriores. El resultado es el mismo que el de validate_file: si algún rango
+    no se puede decodificar (o el archivo no se puede leer) se repite la validación en
+    serie para obtener exactamente el mismo registro de error.
+
+    Args:
+        file_path (str): Ruta del archivo
+        jobs (int): Número de procesos
+        backend (str): Nombre del backend de parseo
+        semantic (bool): Comprobar también ids de etiqueta y transiciones BIO
+        min_size (int): Por debajo de este tamaño se valida en serie
+
+    Returns:
+        list: Registros de error del archivo, ordenados por línea
+    """
+    try:
+        size = os.path.getsize(file_path)
+        if jobs <= 1 or size < min_size:
+            return validate_file(file_path, backend=backend, semantic=semantic)
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            ranges = newline_aligned_ranges(mm, jobs * 4)
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_validate_range, repeat(file_path), *zip(*ranges), repeat(backend), repeat(semantic)))
+    except (OSError, ValueError):
+        # Incluye UnicodeDecodeError: el validador serie genera el registro de error exacto
+        return validate_file(file_path, backend=backend, semantic=semantic)
+
+    errors = []
+    offset = 0
+    for line_count, range_errors in results:
+        for error in range_errors:
+            error["line"] += offset
+        errors.extend(range_errors)
+        offset += line_count
+    return errors
+
+
+def format_error(error):
+    """Línea coloreada con el mismo formato que imprimían los validadores."""
+    if error["line"] is None:
+        return f"\033[91m❌ {error['message']}\033[0m"
+    if error["level"] == LEVEL_WARNING:
+        return f"\033[93m⚠️  Línea {error['line']}: {error['message']}\033[0m"
+    return f"\033[91m❌ Línea {error['line']}: {error['message']}\033[0m"
+
+
+def print_file_result(file_path, errors):
+    """
+    Imprime los registros de error de un archivo y su línea de resultado.
+
+    Args:
+        file_path (str): Ruta del archivo validado
+        errors (list): Registros de error del archivo
+    """
+    for error in errors:
+        print(format_error(error))
+
+    if not errors:
+        print(f"\033[92m✅ {file_path} válido con la estructura requerida.\033[0m")
+    elif errors[0]["line"] is not None:
+        print(f"\n\033[91m❌ Se encontraron {len(errors)} errores en {file_path}\033[0m")
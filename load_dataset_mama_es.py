@@ -1,98 +1,125 @@
-from datasets import Dataset, DatasetDict, Features, Sequence, Value, ClassLabel
+from datasets import (Dataset, DatasetDict, Features, Sequence, Value, ClassLabel, IterableDataset,
+                      IterableDatasetDict, concatenate_datasets, load_dataset)
+from array import array
+from itertools import chain
+import argparse
 import json
+import os
 
+import pyarrow as pa
+import pyarrow.parquet as pq
 
-def load_dataset_from_json(train_file, valid_file, test_file):
+from corpus_bin import CorpusBin, es_corpus_bin
+
+# Definir las etiquetas
+LABELS = [
+    "B-AGE",
+    "B-STAGE",
+    "B-DATE",
+    "B-IMPLICIT_DATE",
+    "B-TNM",
+    "B-FAMILY",
+    "B-OCURRENCE_EVENT",
+    "B-TOXIC_HABITS",
+    "B-HABIT-QUANTITY",
+    "B-TREATMENT_NAME",
+    "B-LINE_CICLE_NUMBER",
+    "B-SURGERY",
+    "B-DRUG",
+    "B-DOSE",
+    "B-FREQ",
+    "B-BIOMARKER",
+    "B-CLINICAL_SERVICE",
+    "B-COMORBIDITY",
+    "B-PROGRESION",
+    "B-GINECOLOGICAL_HISTORY",
+    "B-GINE_OBSTETRICS",
+    "B-ALLERGIES",
+    "B-DURATION",
+    "I-AGE",
+    "I-STAGE",
+    "I-DATE",
+    "I-IMPLICIT_DATE",
+    "I-TNM",
+    "I-FAMILY",
+    "I-OCURRENCE_EVENT",
+    "I-TOXIC_HABITS",
+    "I-HABIT-QUANTITY",
+    "I-TREATMENT_NAME",
+    "I-LINE_CICLE_NUMBER",
+    "I-SURGERY",
+    "I-DRUG",
+    "I-DOSE",
+    "I-FREQ",
+    "I-BIOMARKER",
+    "I-CLINICAL_SERVICE",
+    "I-COMORBIDITY",
+    "I-PROGRESION",
+    "I-GINECOLOGICAL_HISTORY",
+    "I-GINE_OBSTETRICS",
+    "I-ALLERGIES",
+    "I-DURATION",
+    "B-CANCER_CONCEPT",
+    "I-CANCER_CONCEPT",
+    "O"
+]
+
+# Definir las características del dataset
+FEATURES = Features({
+    'sentencia': Sequence(Value('string')),
+    'tag': Sequence(ClassLabel(names=LABELS))
+})
+
+# Sentencias por lote Arrow y por fragmento Parquet en la carga directa
+BATCH_SIZE = 10_000
+SHARD_ROWS = 500_000
+
+# Tamaño del buffer de barajado del modo streaming
+SHUFFLE_BUFFER = 10_000
+
+
+def load_dataset_from_json(train_file, valid_file, test_file, streaming=False,
+                           shuffle_buffer=SHUFFLE_BUFFER, seed=None):
     """
-    Carga datos desde archivos JSON y los convierte al formato de Hugging Face datasets.
+    Carga datos desde archivos JSON (o corpus binarios .nerbin) y los convierte al
+    formato de Hugging Face datasets.
+
+    Cada split puede ser un archivo o una lista de archivos (p. ej. fragmentos), que se
+    leen en orden. Las columnas de un .nerbin pasan a Arrow sin copiarse a listas de
+    Python (ver corpus_bin_columns).
+
+    Args:
+        streaming (bool): Devolver un IterableDatasetDict que lee las líneas bajo demanda
+            en lugar de cargar los splits en memoria (ver streaming_dataset_from_json)
+        shuffle_buffer (int): Buffer de barajado del train en modo streaming (0: sin barajar)
+        seed (int): Semilla del barajado en modo streaming
     """
+    if streaming:
+        return streaming_dataset_from_json(train_file, valid_file, test_file, shuffle_buffer, seed)
 
     def read_json_file(file_path):
+        if not isinstance(file_path, (str, os.PathLike)):
+            parts = [read_json_file(path) for path in file_path]
+            return concatenate_datasets(parts) if parts else records_to_dataset([])
+        if es_corpus_bin(file_path):
+            with CorpusBin(file_path) as corpus:
+                return Dataset.from_dict(corpus_bin_columns(corpus), features=FEATURES)
         data = []
         with open(file_path, 'r', encoding='utf-8') as f:
             for line in f:
                 data.append(json.loads(line))
-        return data
-
-    # Cargar los datos
-    train_data = read_json_file(train_file)
-    valid_data = read_json_file(valid_file)
-    test_data = read_json_file(test_file)
-
-    # Definir las etiquetas
-    labels = [
-        "B-AGE",
-        "B-STAGE",
-        "B-DATE",
-        "B-IMPLICIT_DATE",
-        "B-TNM",
-        "B-FAMILY",
-        "B-OCURRENCE_EVENT",
-        "B-TOXIC_HABITS",
-        "B-HABIT-QUANTITY",
-        "B-TREATMENT_NAME",
-        "B-LINE_CICLE_NUMBER",
-        "B-SURGERY",
-        "B-DRUG",
-        "B-DOSE",
-        "B-FREQ",
-        "B-BIOMARKER",
-        "B-CLINICAL_SERVICE",
-        "B-COMORBIDITY",
-        "B-PROGRESION",
-        "B-GINECOLOGICAL_HISTORY",
-        "B-GINE_OBSTETRICS",
-        "B-ALLERGIES",
-        "B-DURATION",
-        "I-AGE",
-        "I-STAGE",
-        "I-DATE",
-        "I-IMPLICIT_DATE",
-        "I-TNM",
-        "I-FAMILY",
-        "I-OCURRENCE_EVENT",
-        "I-TOXIC_HABITS",
-        "I-HABIT-QUANTITY",
-        "I-TREATMENT_NAME",
-        "I-LINE_CICLE_NUMBER",
-        "I-SURGERY",
-        "I-DRUG",
-        "I-DOSE",
-        "I-FREQ",
-        "I-BIOMARKER",
-        "I-CLINICAL_SERVICE",
-        "I-COMORBIDITY",
-        "I-PROGRESION",
-        "I-GINECOLOGICAL_HISTORY",
-        "I-GINE_OBSTETRICS",
-        "I-ALLERGIES",
-        "I-DURATION",
-        "B-CANCER_CONCEPT",
-        "I-CANCER_CONCEPT",
-        "O"
-    ]
-
-    # Definir las características del dataset
-    features = Features({
-        'sentencia': Sequence(Value('string')),
-        'tag': Sequence(ClassLabel(names=labels))
-    })
-
-    # Crear los datasets
-    train_dataset = Dataset.from_dict({
-        'sentencia': [x['sentencia'] for x in train_data],
-        'tag': [x['tag'] for x in train_data]
-    }, features=features)
+        return records_to_dataset(data)
 
-    valid_dataset = Dataset.from_dict({
-        'sentencia': [x['sentencia'] for x in valid_data],
-        'tag': [x['tag'] for x in valid_data]
-    }, features=features)
+    def records_to_dataset(data):
+        return Dataset.from_dict({
+            'sentencia': [x['sentencia'] for x in data],
+            'tag': [x['tag'] for x in data]
+        }, features=FEATURES)
 
-    test_dataset = Dataset.from_dict({
-        'sentencia': [x['sentencia'] for x in test_data],
-        'tag': [x['tag'] for x in test_data]
-    }, features=features)
+    # Crear los datasets
+    train_dataset = read_json_file(train_file)
+    valid_dataset = read_json_file(valid_file)
+    test_dataset = read_json_file(test_file)
 
     # Combinar en un DatasetDict
     dataset_dict = DatasetDict({
@@ -104,16 +131,187 @@ def load_dataset_from_json(train_file, valid_file, test_file):
     return dataset_dict
 
 
+def corpus_bin_columns(corpus):
+    """
+    Columnas 'sentencia' y 'tag' de un corpus .nerbin como arreglos Arrow sobre su mapa.
+
+    Los tokens son un arreglo de strings cuyos offsets y datos son las secciones
+    token_offsets y blob, y las sentencias, listas cuyos offsets son sentence_offsets:
+    no se crea ningún objeto de Python por token. Los arreglos mantienen vivo el mapa
+    aunque el corpus se cierre (ver CorpusBin.close).
+
+    Returns:
+        dict: {'sentencia': list<string>, 'tag': list<uint8>}, para Dataset.from_dict
+    """
+    token_offsets = corpus.token_offsets
+    if token_offsets.format == 'I' and len(corpus.blob) < 1 << 31:
+        string_type = pa.string()
+    else:
+        string_type = pa.large_string()
+        if token_offsets.format == 'I':
+            token_offsets = array('Q', token_offsets)
+    tokens = pa.Array.from_buffers(string_type, corpus.num_tokens,
+                                   [None, pa.py_buffer(token_offsets), pa.py_buffer(corpus.blob)])
+    tags = pa.Array.from_buffers(pa.uint8(), corpus.num_tokens, [None, pa.py_buffer(corpus.tags)])
+
+    # sentence_offsets son uint64, que Arrow lee como los int64 de una large_list
+    sentence_offsets = pa.py_buffer(corpus.sentence_offsets)
+    return {
+        'sentencia': pa.Array.from_buffers(pa.large_list(string_type), corpus.num_sentences,
+                                           [None, sentence_offsets], children=[tokens]),
+        'tag': pa.Array.from_buffers(pa.large_list(pa.uint8()), corpus.num_sentences,
+                                     [None, sentence_offsets], children=[tags]),
+    }
+
+
+def iter_records(file_path):
+    """Genera (sentencia, tag) de un JSONL o de un corpus .nerbin, sin cargarlo entero."""
+    if es_corpus_bin(file_path):
+        with CorpusBin(file_path) as corpus:
+            yield from corpus
+        return
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                data = json.loads(line)
+                yield data['sentencia'], data['tag']
+
+
+def _file_list(file_path):
+    """Un split como lista de archivos, tanto si se dio un archivo como una lista."""
+    if isinstance(file_path, (str, os.PathLike)):
+        return [file_path]
+    return list(file_path)
+
+
+def record_batches(file_path, schema, batch_size=BATCH_SIZE):
+    """
+    Convierte un archivo (o una lista de archivos, en orden) en lotes Arrow de
+    `batch_size` sentencias con el esquema dado.
+
+    Solo un lote de listas de Python existe a la vez en memoria.
+    """
+    sentencias, tags = [], []
+    for sentencia, tag in chain.from_iterable(map(iter_records, _file_list(file_path))):
+        sentencias.append(sentencia)
+        tags.append(tag)
+        if len(sentencias) == batch_size:
+            yield pa.RecordBatch.from_pydict({'sentencia': sentencias, 'tag': tags}, schema=schema)
+            sentencias, tags = [], []
+    if sentencias:
+        yield pa.RecordBatch.from_pydict({'sentencia': sentencias, 'tag': tags}, schema=schema)
+
+
+def _generate_examples(file_paths):
+    """Generador de ejemplos del modo streaming; recorre sus archivos en orden."""
+    for file_path in file_paths:
+        for sentencia, tag in iter_records(file_path):
+            yield {'sentencia': sentencia, 'tag': tag}
+
+
+def streaming_dataset_from_json(train_file, valid_file, test_file, shuffle_buffer=SHUFFLE_BUFFER, seed=None):
+    """
+    Crea un IterableDatasetDict respaldado por un generador sobre las líneas JSONL.
+
+    No hay paso de conversión: el entrenamiento empieza con las primeras líneas leídas.
+    Cada split puede ser un archivo o una lista de archivos; la lista se pasa como
+    gen_kwargs, así que datasets la reparte en fragmentos entre los procesos de un
+    DataLoader (num_workers) y entre nodos. El train se baraja con un buffer de
+    `shuffle_buffer` ejemplos, que también baraja el orden de los fragmentos.
+
+    Returns:
+        IterableDatasetDict: Con las mismas FEATURES y etiquetas que el modo en memoria
+    """
+    splits = {'train': train_file, 'validation': valid_file, 'test': test_file}
+    dataset_dict = IterableDatasetDict()
+    for split, file_paths in splits.items():
+        dataset_dict[split] = IterableDataset.from_generator(
+            _generate_examples, features=FEATURES, gen_kwargs={'file_paths': _file_list(file_paths)})
+    if shuffle_buffer:
+        dataset_dict['train'] = dataset_dict['train'].shuffle(seed=seed, buffer_size=shuffle_buffer)
+    return dataset_dict
+
+
+def write_parquet_shards(file_path, output_dir, split, batch_size=BATCH_SIZE, shard_rows=SHARD_ROWS):
+    """
+    Escribe un split (un archivo o una lista de archivos) como fragmentos Parquet de
+    hasta `shard_rows` sentencias.
+
+    Cada lote Arrow se escribe como un row group en cuanto se completa, así que la
+    memoria usada depende del tamaño de lote y no del tamaño del corpus. El esquema
+    lleva los metadatos de FEATURES, de modo que las etiquetas se leen como ClassLabel.
+
+    Returns:
+        list: Rutas de los fragmentos escritos (al menos uno, aunque el split esté vacío)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    schema = FEATURES.arrow_schema
+    shards = []
+    writer = None
+    rows = 0
+    try:
+        for batch in record_batches(file_path, schema, batch_size):
+            if writer is None or rows >= shard_rows:
+                if writer is not None:
+                    writer.close()
+                shards.append(os.path.join(output_dir, f"{split}-{len(shards):05d}.parquet"))
+                writer = pq.ParquetWriter(shards[-1], schema)
+                rows = 0
+            writer.write_batch(batch)
+            rows += batch.num_rows
+        if writer is None:
+            shards.append(os.path.join(output_dir, f"{split}-00000.parquet"))
+            pq.write_table(schema.empty_table(), shards[-1])
+    finally:
+        if writer is not None:
+            writer.close()
+    return shards
+
+
+def load_dataset_from_parquet(train_file, valid_file, test_file, parquet_dir='parquet_cache',
+                              batch_size=BATCH_SIZE, shard_rows=SHARD_ROWS):
+    """
+    Carga los splits pasando por Parquet en lugar de por listas de Python.
+
+    Cada JSONL (o .nerbin) se convierte en lotes Arrow con el esquema de FEATURES y se
+    escribe en fragmentos Parquet; el DatasetDict se construye a partir de ellos y sus
+    tablas quedan mapeadas en memoria desde la caché de datasets. El pico de memoria
+    es el de un lote, sea cual sea el tamaño del corpus. Como en load_dataset_from_json,
+    cada split puede ser un archivo o una lista de archivos.
+
+    Args:
+        parquet_dir (str): Carpeta donde se escriben los fragmentos de cada split
+        batch_size (int): Sentencias por lote Arrow (y por row group)
+        shard_rows (int): Sentencias máximas por fragmento Parquet
+    """
+    splits = {'train': train_file, 'validation': valid_file, 'test': test_file}
+    data_files = {
+        split: write_parquet_shards(file_path, parquet_dir, split, batch_size, shard_rows)
+        for split, file_path in splits.items()
+    }
+    return load_dataset('parquet', data_files=data_files, features=FEATURES)
+
+
 def push_to_hub(dataset_dict, dataset_name, token):
     dataset_dict.push_to_hub(dataset_name, token=token)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga train/valid/test como DatasetDict y lo sube al Hub.")
+    parser.add_argument('--parquet', action='store_true',
+                        help="Cargar por lotes Arrow a través de fragmentos Parquet, con memoria acotada")
+    parser.add_argument('--directorio-parquet', default='parquet_cache',
+                        help="Carpeta de los fragmentos Parquet del modo --parquet")
+    args = parser.parse_args()
+
     train_file = "My_Biobert_mama_dataset/train.json"
     valid_file = "My_Biobert_mama_dataset/valid.json"
     test_file = "My_Biobert_mama_dataset/test.json"
 
-    dataset = load_dataset_from_json(train_file, valid_file, test_file)
+    if args.parquet:
+        dataset = load_dataset_from_parquet(train_file, valid_file, test_file, args.directorio_parquet)
+    else:
+        dataset = load_dataset_from_json(train_file, valid_file, test_file)
 
     # Por seguridad hemos excluído variables secretas
     your_token = "PUT_YOUR_OWN_TOKEN"
@@ -1,14 +1,29 @@
+import argparse
 import json
+import os
+import shutil
 import sys
+import tempfile
+from array import array
+
+from corpus_bin import CorpusBin, es_corpus_bin
 
 '''
 Une todas las oraciones y etiquetas, y devuelve un único objeto JSON.
 '''
 
+# Sentencias acumuladas antes de cada escritura en el modo en streaming
+LINEAS_POR_ESCRITURA = 1024
+
+# Tokens de un .nerbin que se decodifican y escriben de una vez
+TOKENS_POR_BLOQUE = 1 << 16
+
 def merge_json_lines(input_file_path):
     """
     Función que lee un archivo JSON (una línea por cada objeto JSON),
     une todas las oraciones y etiquetas, y devuelve un único objeto JSON.
+    
+    Para corpus .nerbin, o para no cargar el resultado en memoria, usa merge_json_files.
     """
     merged_sentences = []
     merged_tags = []
@@ -51,27 +66,214 @@ def merge_json_lines(input_file_path):
     
     return result
 
+def _iter_records(input_file_path):
+    """Genera (tokens, etiquetas) de cada línea válida de un .json."""
+    with open(input_file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line:  # Saltar líneas vacías
+                continue
+            
+            data = json.loads(line)
+            if 'sentencia' not in data or 'tag' not in data:
+                print(f"Advertencia: Línea no tiene formato correcto: {line}")
+                continue
+            yield data['sentencia'], data['tag']
+
+def _elements(values):
+    """Elementos de una lista serializados como en json.dump, sin los corchetes."""
+    if type(values) is not list:
+        values = list(values)  # extend() también aceptaba cualquier iterable
+    return json.dumps(values, ensure_ascii=False)[1:-1]
+
+def _write_bin_sidecar(corpus, sidecar, base):
+    """Vuelca las etiquetas de un .nerbin tal cual y sus offsets de sentencia desplazados en `base`."""
+    sidecar[0].write(corpus.tags)
+    sentence_offsets = corpus.sentence_offsets
+    for start in range(1, len(sentence_offsets), TOKENS_POR_BLOQUE):
+        array('q', [base + offset for offset in sentence_offsets[start:start + TOKENS_POR_BLOQUE]]).tofile(sidecar[1])
+
+def _write_npy(raw_path, npy_path, dtype, length):
+    """Escribe un .npy con la cabecera de NumPy seguida de los bytes ya volcados en raw_path."""
+    import numpy as np
+    
+    with open(npy_path, 'wb') as npy, open(raw_path, 'rb') as raw:
+        header = {'descr': np.dtype(dtype).str, 'fortran_order': False, 'shape': (length,)}
+        np.lib.format.write_array_header_1_0(npy, header)
+        shutil.copyfileobj(raw, npy, 1 << 20)
+
+def merge_json_files(input_paths, output_path, npy_prefix=None):
+    """
+    Une las oraciones y etiquetas de varios archivos .json o .nerbin en un único objeto
+    JSON, escrito a medida que se leen, con memoria constante.
+    
+    Los tokens se escriben directamente en la salida; las etiquetas, que van después
+    de todos ellos en el objeto, se vuelcan a un temporal y se copian al final. De un
+    .nerbin se leen sus columnas de tokens y etiquetas por bloques, sin pasar por las
+    sentencias. El
+    resultado es idéntico al de json.dump sobre merge_json_lines, y la salida se
+    reemplaza de forma atómica solo si todo el proceso termina bien.
+    
+    Args:
+        input_paths (list): Archivos de entrada, en el orden en que se unen
+        output_path (str): Archivo JSON de salida
+        npy_prefix (str): Si se indica, escribe además <npy_prefix>.tags.npy (uint8, las
+            etiquetas unidas) y <npy_prefix>.offsets.npy (int64, el token donde empieza
+            cada sentencia más el total), que NumPy puede abrir con mmap_mode='r'
+            
+    Returns:
+        tuple: (número de sentencias, número de tokens)
+    """
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    fd, tmp_output = tempfile.mkstemp(dir=output_dir, suffix='.tmp')
+    temporales = [tmp_output]
+    num_sentences = num_tokens = 0
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as out, \
+             tempfile.TemporaryFile('w+', encoding='utf-8', dir=output_dir) as tags_file:
+            sidecar = None
+            if npy_prefix is not None:
+                raw_tags = npy_prefix + '.tags.tmp'
+                raw_offsets = npy_prefix + '.offsets.tmp'
+                temporales += [raw_tags, raw_offsets]
+                sidecar = (open(raw_tags, 'wb'), open(raw_offsets, 'wb'))
+                packed_tags = array('B')
+                offsets = array('q', [0])
+            
+            out.write('{"sentencia": [')
+            token_parts, tag_parts = [], []
+            tokens_started = tags_started = False
+            
+            def flush():
+                nonlocal tokens_started, tags_started
+                if token_parts:
+                    out.write((', ' if tokens_started else '') + ', '.join(token_parts))
+                    tokens_started = True
+                    token_parts.clear()
+                if tag_parts:
+                    tags_file.write((', ' if tags_started else '') + ', '.join(tag_parts))
+                    tags_started = True
+                    tag_parts.clear()
+                if sidecar is not None:
+                    packed_tags.tofile(sidecar[0])
+                    offsets.tofile(sidecar[1])
+                    del packed_tags[:], offsets[:]
+            
+            try:
+                for input_path in input_paths:
+                    if es_corpus_bin(input_path):
+                        # Las columnas ya están unidas: se escriben por bloques de tokens
+                        flush()
+                        with CorpusBin(input_path) as corpus:
+                            for start in range(0, corpus.num_tokens, TOKENS_POR_BLOQUE):
+                                end = min(start + TOKENS_POR_BLOQUE, corpus.num_tokens)
+                                token_parts.append(_elements(corpus.tokens[start:end]))
+                                tag_parts.append(_elements(corpus.tags[start:end].tolist()))
+                                flush()
+                            if sidecar is not None:
+                                _write_bin_sidecar(corpus, sidecar, num_tokens)
+                            num_sentences += corpus.num_sentences
+                            num_tokens += corpus.num_tokens
+                        continue
+                    for tokens, tags in _iter_records(input_path):
+                        tokens = _elements(tokens)
+                        if tokens:
+                            token_parts.append(tokens)
+                        tags_text = _elements(tags)
+                        if tags_text:
+                            tag_parts.append(tags_text)
+                        num_sentences += 1
+                        num_tokens += len(tags)
+                        if sidecar is not None:
+                            try:
+                                packed_tags.extend(tags)
+                            except (OverflowError, TypeError) as e:
+                                raise ValueError(f"Las etiquetas deben ser enteros entre 0 y 255 para --npy: {e}") from None
+                            offsets.append(num_tokens)
+                        if len(token_parts) >= LINEAS_POR_ESCRITURA:
+                            flush()
+                flush()
+            finally:
+                if sidecar is not None:
+                    sidecar[0].close()
+                    sidecar[1].close()
+            
+            out.write('], "tag": [')
+            tags_file.seek(0)
+            shutil.copyfileobj(tags_file, out, 1 << 20)
+            out.write(']}')
+        
+        if npy_prefix is not None:
+            _write_npy(raw_tags, npy_prefix + '.tags.npy', 'uint8', num_tokens)
+            _write_npy(raw_offsets, npy_prefix + '.offsets.npy', 'int64', num_sentences + 1)
+        os.replace(tmp_output, output_path)
+    finally:
+        for temporal in temporales:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+    return num_sentences, num_tokens
+
+def expand_inputs(inputs):
+    """Expande las carpetas en sus .json y .nerbin (sin los *_merged.json ya generados), en orden."""
+    paths = []
+    for entry in inputs:
+        if os.path.isdir(entry):
+            paths.extend(os.path.join(entry, f) for f in sorted(os.listdir(entry))
+                         if (f.endswith('.json') and not f.endswith('_merged.json')) or es_corpus_bin(f))
+        else:
+            paths.append(entry)
+    return paths
+
 def main():
-    # Verificar que se proporcionó un archivo de entrada
-    if len(sys.argv) < 2:
-        print("Uso: python3 script.py archivo.json")
+    parser = argparse.ArgumentParser(
+        description="Une todas las oraciones y etiquetas de uno o varios archivos en un único objeto JSON.")
+    parser.add_argument('entradas', nargs='+', help="Archivos .json o .nerbin, o carpetas con ellos")
+    parser.add_argument('-o', '--salida', default=None,
+                        help="Archivo de salida (por defecto, <entrada>_merged.json con una sola entrada)")
+    parser.add_argument('--npy', action='store_true',
+                        help="Escribir también las etiquetas (uint8) y los offsets de sentencia (int64) como .npy")
+    args = parser.parse_args()
+    
+    input_paths = expand_inputs(args.entradas)
+    if not input_paths:
+        print("Error: No se encontraron archivos .json o .nerbin en las entradas")
         sys.exit(1)
     
-    input_file_path = sys.argv[1]
-    # Crear nombre del archivo de salida con el formato nombre_merged.json
-    output_file_path = input_file_path.replace('.json', '_merged.json')
+    if args.salida:
+        output_file_path = args.salida
+    elif len(args.entradas) == 1 and os.path.isdir(args.entradas[0]):
+        output_file_path = os.path.normpath(args.entradas[0]) + '_merged.json'
+    elif len(input_paths) == 1:
+        input_file_path = input_paths[0]
+        # Crear nombre del archivo de salida con el formato nombre_merged.json
+        if es_corpus_bin(input_file_path):
+            output_file_path = input_file_path[:-len('.nerbin')] + '_merged.json'
+        else:
+            output_file_path = input_file_path.replace('.json', '_merged.json')
+    else:
+        print("Error: Con varias entradas indica el archivo de salida con --salida")
+        sys.exit(1)
     
-    # Fusionar las líneas JSON
-    merged_data = merge_json_lines(input_file_path)
+    npy_prefix = None
+    if args.npy:
+        npy_prefix = output_file_path[:-len('.json')] if output_file_path.endswith('.json') else output_file_path
     
-    # Escribir el resultado en un archivo nuevo
     try:
-        with open(output_file_path, 'w', encoding='utf-8') as file:
-            json.dump(merged_data, file, ensure_ascii=False)
-        print(f"\nArchivo procesado exitosamente.\nResultado guardado en {output_file_path}")
+        num_sentences, num_tokens = merge_json_files(input_paths, output_file_path, npy_prefix)
+    except FileNotFoundError as e:
+        print(f"Error: No se encontró el archivo {e.filename}")
+        sys.exit(1)
+    except json.JSONDecodeError as e:
+        print(f"Error: El archivo no contiene JSON válido. {e}")
+        sys.exit(1)
     except Exception as e:
-        print(f"Error al escribir el archivo de salida: {e}")
+        print(f"Error inesperado: {e}")
         sys.exit(1)
+    
+    print(f"\nArchivo procesado exitosamente: {num_sentences} sentencias, {num_tokens} tokens de "
+          f"{len(input_paths)} archivos.\nResultado guardado en {output_file_path}")
+    if npy_prefix is not None:
+        print(f"Etiquetas y offsets en {npy_prefix}.tags.npy y {npy_prefix}.offsets.npy")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,285 @@
+"""
+Detección de sentencias casi duplicadas con MinHash y LSH por bandas (requiere NumPy).
+
+Cada sentencia se representa por el conjunto de sus shingles de k tokens consecutivos.
+Su firma MinHash (num_perm mínimos de permutaciones hash universales) permite estimar
+la similitud de Jaccard entre dos sentencias como la fracción de posiciones iguales.
+La firma se divide en bandas; dos sentencias son candidatas si coinciden en todas las
+filas de alguna banda, lo que se resuelve ordenando claves por banda en lugar de
+comparar todos los pares. Los candidatos se verifican con la similitud estimada y se
+agrupan alrededor de un representante: cada miembro de un grupo es casi duplicado del
+primero del grupo, no solo de algún otro miembro.
+
+Uso típico:
+
+    detector = DetectorCasiDuplicados(umbral=0.8)
+    for tokens in sentencias:
+        detector.agregar(tokens)
+    for ids in detector.grupos():
+        ...  # ids de sentencia (en orden de inserción) de cada grupo
+"""
+
+import os
+import zlib
+
+import numpy as np
+
+# Primo de Mersenne 2^31 - 1: (a * x + b) con a, x < 2^31 cabe en uint64 sin desbordar
+_PRIMO = np.uint64((1 << 31) - 1)
+_MASCARA_32 = np.uint64(0xFFFFFFFF)
+
+
+def parametros_lsh(umbral, num_perm, peso_falsos_positivos=0.5):
+    """
+    Elige el número de bandas y filas por banda para un umbral de Jaccard.
+
+    Minimiza la suma ponderada de las áreas de falsos positivos (similitud < umbral que
+    resulta candidata) y falsos negativos (similitud >= umbral que no lo resulta).
+
+    Returns:
+        tuple: (bandas, filas)
+    """
+    def probabilidad(s, bandas, filas):
+        return 1.0 - (1.0 - s ** filas) ** bandas
+
+    def area(desde, hasta, funcion, pasos=200):
+        ancho = (hasta - desde) / pasos
+        return sum(funcion(desde + (i + 0.5) * ancho) for i in range(pasos)) * ancho
+
+    mejor, mejor_error = (1, num_perm), float('inf')
+    for bandas in range(1, num_perm + 1):
+        for filas in range(1, num_perm // bandas + 1):
+            fp = area(0.0, umbral, lambda s: probabilidad(s, bandas, filas))
+            fn = area(umbral, 1.0, lambda s: 1.0 - probabilidad(s, bandas, filas))
+            error = peso_falsos_positivos * fp + (1.0 - peso_falsos_positivos) * fn
+            if error < mejor_error:
+                mejor, mejor_error = (bandas, filas), error
+    return mejor
+
+
+class DetectorCasiDuplicados:
+    """
+    Acumula firmas MinHash de sentencias y las agrupa por similitud de Jaccard.
+
+    Args:
+        umbral (float): Similitud de Jaccard mínima para considerar dos sentencias casi duplicadas
+        num_perm (int): Longitud de la firma MinHash
+        k (int): Tokens por shingle (las sentencias más cortas forman un único shingle)
+        seed (int): Semilla de las permutaciones, para resultados reproducibles
+        tam_lote (int): Sentencias por lote de cálculo de firmas
+        directorio (str): Si se indica, cada lote de firmas se guarda en disco y se abre
+            con memoria mapeada, de modo que la memoria no crece con el corpus
+    """
+
+    def __init__(self, umbral=0.8, num_perm=64, k=3, seed=1, tam_lote=5000, directorio=None):
+        self.umbral = umbral
+        self.num_perm = num_perm
+        self.k = k
+        self.tam_lote = tam_lote
+        self.directorio = directorio
+        self.bandas, self.filas = parametros_lsh(umbral, num_perm)
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIMO), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIMO), size=num_perm, dtype=np.uint64)
+        # Multiplicadores impares para combinar tokens en shingles y filas en claves de banda
+        self._mult_shingle = rng.integers(1, 1 << 63, size=k, dtype=np.uint64) | np.uint64(1)
+        self._mult_banda = rng.integers(1, 1 << 63, size=self.filas, dtype=np.uint64) | np.uint64(1)
+
+        self._hash_token = {}
+        self._pendientes = []
+        self._lotes = []
+        self.total = 0
+
+    def agregar(self, tokens):
+        """Añade una sentencia (lista de tokens) y devuelve su id."""
+        self._pendientes.append(tokens)
+        self.total += 1
+        if len(self._pendientes) >= self.tam_lote:
+            self._procesar_lote()
+        return self.total - 1
+
+    def _procesar_lote(self):
+        if not self._pendientes:
+            return
+        firmas = self._firmas(self._pendientes)
+        self._pendientes = []
+        if self.directorio:
+            ruta = os.path.join(self.directorio, f"firmas_{len(self._lotes):06d}.npy")
+            np.save(ruta, firmas)
+            firmas = np.load(ruta, mmap_mode='r')
+        self._lotes.append(firmas)
+
+    def _firmas(self, sentencias):
+        """Calcula las firmas MinHash (n, num_perm) de un lote de sentencias."""
+        hash_token = self._hash_token
+        largos = np.fromiter((len(t) for t in sentencias), dtype=np.int64, count=len(sentencias))
+        fin = np.cumsum(largos)
+        inicio = fin - largos
+
+        valores = []
+        for tokens in sentencias:
+            for token in tokens:
+                h = hash_token.get(token)
+                if h is None:
+                    h = hash_token[token] = zlib.crc32(token.encode('utf-8'))
+                valores.append(h)
+        t = np.array(valores, dtype=np.uint64)
+        n_tokens = t.shape[0]
+
+        # Shingle que empieza en cada posición, truncado al final de su sentencia
+        fin_de = np.repeat(fin, largos)
+        shingles = np.zeros(n_tokens, dtype=np.uint64)
+        for i in range(self.k):
+            posiciones = np.arange(n_tokens) + i
+            validas = posiciones < fin_de
+            shingles[validas] += t[posiciones[validas]] * self._mult_shingle[i]
+
+        # Shingles completos, más el primero de cada sentencia más corta que k
+        posicion = np.arange(n_tokens)
+        inicio_de = np.repeat(inicio, largos)
+        conservar = (posicion + self.k <= fin_de) | ((posicion == inicio_de) & (fin_de - inicio_de < self.k))
+        shingles = shingles[conservar]
+        por_sentencia = np.bincount(np.repeat(np.arange(len(sentencias)), largos)[conservar],
+                                    minlength=len(sentencias))
+
+        # Las sentencias vacías reciben un único shingle constante
+        vacias = por_sentencia == 0
+        if vacias.any():
+            insertar = np.cumsum(por_sentencia)[vacias] - por_sentencia[vacias]
+            shingles = np.insert(shingles, insertar, np.uint64(0))
+            por_sentencia[vacias] = 1
+        x = ((shingles >> np.uint64(32)) ^ (shingles & _MASCARA_32)) % _PRIMO
+        segmentos = np.concatenate(([0], np.cumsum(por_sentencia)[:-1]))
+
+        firmas = np.empty((len(sentencias), self.num_perm), dtype=np.uint32)
+        bloque = 16
+        for p in range(0, self.num_perm, bloque):
+            a = self._a[p:p + bloque, None]
+            b = self._b[p:p + bloque, None]
+            permutados = (a * x[None, :] + b) % _PRIMO
+            firmas[:, p:p + bloque] = np.minimum.reduceat(permutados, segmentos, axis=1).T
+        return firmas
+
+    def _columnas(self, desde, hasta):
+        """Columnas [desde, hasta) de las firmas de todas las sentencias."""
+        return np.concatenate([lote[:, desde:hasta] for lote in self._lotes])
+
+    def _filas_firmas(self, ids):
+        """Filas de firma para una lista de ids, leyendo cada lote una sola vez."""
+        salida = np.empty((ids.shape[0], self.num_perm), dtype=np.uint32)
+        orden = np.argsort(ids, kind='stable')
+        ordenados = ids[orden]
+        cortes = np.searchsorted(ordenados, np.arange(len(self._lotes) + 1) * self.tam_lote)
+        for n_lote, lote in enumerate(self._lotes):
+            d, h = cortes[n_lote], cortes[n_lote + 1]
+            if d < h:
+                salida[orden[d:h]] = lote[ordenados[d:h] - n_lote * self.tam_lote]
+        return salida
+
+    def pares_candidatos(self):
+        """
+        Pares (i, j), i < j, que coinciden en todas las filas de al menos una banda.
+
+        Dentro de cada grupo de una banda se empareja cada miembro con el de menor id.
+
+        Returns:
+            tuple: (arreglo de i, arreglo de j)
+        """
+        self._procesar_lote()
+        clave_par = []
+        for banda in range(self.bandas):
+            columnas = self._columnas(banda * self.filas, (banda + 1) * self.filas).astype(np.uint64)
+            claves = (columnas * self._mult_banda).sum(axis=1, dtype=np.uint64)
+            orden = np.argsort(claves, kind='stable')
+            ordenadas = claves[orden]
+            nuevo_grupo = np.empty(ordenadas.shape[0], dtype=bool)
+            nuevo_grupo[:1] = True
+            nuevo_grupo[1:] = ordenadas[1:] != ordenadas[:-1]
+            lider = orden[np.maximum.accumulate(np.where(nuevo_grupo, np.arange(orden.shape[0]), 0))]
+            miembros = ~nuevo_grupo
+            clave_par.append(lider[miembros].astype(np.uint64) * np.uint64(self.total) + orden[miembros].astype(np.uint64))
+
+        if not clave_par:
+            vacio = np.empty(0, dtype=np.int64)
+            return vacio, vacio
+        unicos = np.unique(np.concatenate(clave_par))
+        return (unicos // np.uint64(self.total)).astype(np.int64), (unicos % np.uint64(self.total)).astype(np.int64)
+
+    def similitud(self, i, j):
+        """Similitud de Jaccard estimada entre las sentencias i y j (escalares o arreglos)."""
+        self._procesar_lote()
+        i, j = np.atleast_1d(i), np.atleast_1d(j)
+        return (self._filas_firmas(i) == self._filas_firmas(j)).mean(axis=1)
+
+    def _componentes(self):
+        """
+        Componente conexa del grafo de pares con similitud >= umbral de cada sentencia.
+
+        Returns:
+            ndarray: Etiqueta de cada sentencia (el menor id de su componente)
+        """
+        etiquetas = np.arange(self.total, dtype=np.int64)
+        i, j = self.pares_candidatos()
+        if i.shape[0] == 0:
+            return etiquetas
+        similares = np.zeros(i.shape[0], dtype=bool)
+        for d in range(0, i.shape[0], 1_000_000):
+            similares[d:d + 1_000_000] = self.similitud(i[d:d + 1_000_000], j[d:d + 1_000_000]) >= self.umbral
+        i, j = i[similares], j[similares]
+
+        # Propagar la menor etiqueta y saltar punteros hasta converger
+        while True:
+            anteriores = etiquetas.copy()
+            np.minimum.at(etiquetas, j, etiquetas[i])
+            np.minimum.at(etiquetas, i, etiquetas[j])
+            etiquetas = etiquetas[etiquetas]
+            if np.array_equal(etiquetas, anteriores):
+                break
+        return etiquetas
+
+    def grupos(self):
+        """
+        Agrupa las sentencias casi duplicadas alrededor de un representante.
+
+        La similitud no es transitiva (A ~ B y B ~ C no implica A ~ C), así que las
+        componentes conexas del grafo de pares similares se dividen: el menor id
+        pendiente de cada componente es su representante y forma grupo con las
+        sentencias pendientes cuya similitud estimada con él es >= umbral; con las que
+        quedan se repite hasta agotar la componente.
+
+        Returns:
+            list: Arreglos de ids ordenados, uno por grupo de 2 o más sentencias, cuyo
+                primer id es el representante; ordenados por su primer id
+        """
+        etiquetas = self._componentes()
+        pendientes = np.flatnonzero(np.bincount(etiquetas, minlength=self.total)[etiquetas] > 1)
+        if pendientes.shape[0] == 0:
+            return []
+
+        representante_de = np.full(self.total, -1, dtype=np.int64)
+        # Menor id pendiente por componente; se reserva una vez y en cada pasada solo se
+        # restauran las entradas de las componentes que aún tienen pendientes
+        minimo = np.full(self.total, self.total, dtype=np.int64)
+        while pendientes.shape[0]:
+            componentes = etiquetas[pendientes]
+            np.minimum.at(minimo, componentes, pendientes)
+            representantes = minimo[componentes]
+            minimo[componentes] = self.total
+            # El representante tiene similitud 1 consigo mismo y entra en su grupo
+            unidos = np.zeros(pendientes.shape[0], dtype=bool)
+            for d in range(0, pendientes.shape[0], 1_000_000):
+                unidos[d:d + 1_000_000] = self.similitud(representantes[d:d + 1_000_000],
+                                                         pendientes[d:d + 1_000_000]) >= self.umbral
+            unidos |= representantes == pendientes
+            representante_de[pendientes[unidos]] = representantes[unidos]
+            pendientes = pendientes[~unidos]
+
+        ids = np.flatnonzero(representante_de >= 0)
+        ids = ids[np.bincount(representante_de[ids], minlength=self.total)[representante_de[ids]] > 1]
+        if ids.shape[0] == 0:
+            return []
+        # Cada representante es el menor id de su grupo: ordenar por representante ordena por primer id
+        ids = ids[np.lexsort((ids, representante_de[ids]))]
+        cortes = np.flatnonzero(np.diff(representante_de[ids])) + 1
+        return np.split(ids, cortes)
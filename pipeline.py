@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Pipeline en un solo proceso: tokenizar → validar → deduplicar → dividir → cargar.
+
+Cada script del kit vuelve a leer y parsear todo el corpus desde disco. Aquí el corpus
+se lee una sola vez y cada etapa es un generador sobre el mismo tipo de registro
+(Registro), de modo que los registros fluyen de una etapa a la siguiente sin
+escribirse ni re-parsearse entre medias. Las etapas son funciones públicas que se
+pueden encadenar a mano; ejecutar_pipeline las conecta según las opciones.
+
+Solo la división necesita ver el corpus completo antes de emitir nada (asigna
+archivos enteros a train/valid/test), así que es la única que acumula registros.
+
+Cada etapa lleva sus contadores de entrada, salida y descartes y su tiempo propio
+(sin contar el de las etapas anteriores). Con --workers, la lectura y la validación
+de cada archivo se hacen en un pool de procesos y el resto sigue en el principal.
+
+Uso:
+    python3 pipeline.py carpeta_o_archivos...                      # JSONL/.nerbin → output_data/
+    python3 pipeline.py textos/ --desde-txt                         # .txt tokenizados al vuelo
+    python3 pipeline.py carpeta --asignador estratificado --seed 1 --workers 8
+    python3 pipeline.py carpeta --cargar                            # además, DatasetDict en memoria
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain
+
+from corpus_bin import CorpusBin, es_corpus_bin
+from detect_duplicates import hash_sentencia
+from jsonl_validation import check_records, load_backend
+from script_tokenizeText import tokenize_line
+from split_assigner import SPLIT_RATIOS, balanced_assign, count_entities, cut_assign
+from tag_schema import OUTSIDE_TAG
+
+# Registro común a todas las etapas; `split` lo fija la etapa de división
+Registro = namedtuple('Registro', ['sentencia', 'tag', 'origen', 'linea', 'split'], defaults=(None,))
+
+SPLIT_NAMES = ('train', 'valid', 'test')
+
+# Registros por lote en la validación
+VALIDATION_BATCH = 1024
+
+
+class EstadisticasEtapa:
+    """Contadores y tiempo propio de una etapa, más los primeros motivos de descarte."""
+
+    MAX_MENSAJES = 20
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.entrada = 0
+        self.salida = 0
+        self.descartados = 0
+        self.segundos = 0.0
+        self.mensajes = []
+        self._inclusivo = 0.0  # tiempo de esta etapa más el de las anteriores
+
+    def descartar(self, origen, linea, mensaje):
+        self.descartados += 1
+        if len(self.mensajes) < self.MAX_MENSAJES:
+            self.mensajes.append(f"{origen}, línea {linea}: {mensaje}")
+
+    def combinar(self, otra):
+        """Suma las estadísticas de la misma etapa ejecutada en otro proceso."""
+        self.entrada += otra.entrada
+        self.salida += otra.salida
+        self.descartados += otra.descartados
+        self.segundos += otra.segundos
+        self.mensajes.extend(otra.mensajes[:self.MAX_MENSAJES - len(self.mensajes)])
+
+
+def medir(registros, estadisticas, anterior=None):
+    """
+    Envuelve la salida de una etapa para contar sus registros y medir su tiempo.
+
+    El tiempo de cada next() incluye el de las etapas anteriores que lo alimentan; al
+    terminar se le resta el de `anterior` para quedarse con el tiempo propio.
+    """
+    iterador = iter(registros)
+    reloj = time.perf_counter
+    while True:
+        inicio = reloj()
+        try:
+            registro = next(iterador)
+        except StopIteration:
+            estadisticas._inclusivo += reloj() - inicio
+            break
+        estadisticas._inclusivo += reloj() - inicio
+        estadisticas.salida += 1
+        yield registro
+    if anterior is not None:
+        estadisticas.entrada = anterior.salida
+        estadisticas.segundos = estadisticas._inclusivo - anterior._inclusivo
+    else:
+        estadisticas.segundos = estadisticas._inclusivo
+
+
+def leer_textos(rutas, estadisticas):
+    """Fuente: tokeniza cada línea no vacía de los .txt con etiquetas "O"."""
+    for ruta in rutas:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            for num_linea, linea in enumerate(f, start=1):
+                linea = linea.strip()
+                if not linea:
+                    continue
+                estadisticas.entrada += 1
+                tokens = tokenize_line(linea)
+                yield Registro(tokens, [OUTSIDE_TAG] * len(tokens), ruta, num_linea)
+
+
+def leer_corpus(rutas, estadisticas, backend=None):
+    """
+    Fuente: parsea una vez los JSONL (o lee los .nerbin, con su procedencia original).
+
+    Las líneas mal formadas o sin 'sentencia'/'tag' se descartan aquí; el resto de
+    comprobaciones corresponde a la etapa de validación.
+    """
+    loads = load_backend(backend).loads
+    for ruta in rutas:
+        if es_corpus_bin(ruta):
+            with CorpusBin(ruta) as corpus:
+                for i in range(len(corpus)):
+                    estadisticas.entrada += 1
+                    origen, linea = corpus.provenance(i)
+                    yield Registro(corpus.sentence_tokens(i), corpus.sentence_tags(i), origen, linea)
+            continue
+        with open(ruta, 'r', encoding='utf-8') as f:
+            for num_linea, linea in enumerate(f, start=1):
+                if not linea.strip():
+                    continue
+                estadisticas.entrada += 1
+                try:
+                    data = loads(linea)
+                except Exception:
+                    # Repetir con json para que el mensaje no dependa del backend (simdjson
+                    # lanza RuntimeError con los enteros enormes)
+                    try:
+                        data = json.loads(linea)
+                    except json.JSONDecodeError as e:
+                        estadisticas.descartar(ruta, num_linea, str(e))
+                        continue
+                if not isinstance(data, dict) or 'sentencia' not in data or 'tag' not in data:
+                    estadisticas.descartar(ruta, num_linea, "Faltan claves requeridas 'sentencia' o 'tag'")
+                    continue
+                yield Registro(data['sentencia'], data['tag'], ruta, num_linea)
+
+
+def validar(registros, estadisticas, semantic=True, lote=VALIDATION_BATCH):
+    """Descarta los registros que no pasarían validate-all-json.py, comprobándolos por lotes."""
+    def comprobar(pendientes):
+        validos = []
+        for registro in pendientes:
+            tokens, tags = registro.sentencia, registro.tag
+            if not isinstance(tokens, list) or not isinstance(tags, list):
+                estadisticas.descartar(registro.origen, registro.linea, "'sentencia' y 'tag' deben ser listas")
+            elif len(tokens) != len(tags):
+                estadisticas.descartar(registro.origen, registro.linea,
+                                       f"Longitud discrepante | Sentencia: {len(tokens)} vs Tag: {len(tags)}")
+            else:
+                validos.append(registro)
+        fallidos = dict(check_records([r.sentencia for r in validos], [r.tag for r in validos], semantic))
+        for i, registro in enumerate(validos):
+            if i in fallidos:
+                estadisticas.descartar(registro.origen, registro.linea, fallidos[i])
+            else:
+                yield registro
+
+    pendientes = []
+    for registro in registros:
+        pendientes.append(registro)
+        if len(pendientes) == lote:
+            yield from comprobar(pendientes)
+            pendientes = []
+    if pendientes:
+        yield from comprobar(pendientes)
+
+
+def deduplicar(registros, estadisticas):
+    """Elimina las sentencias repetidas conservando la primera, como script_automatic.py."""
+    vistos = set()
+    for registro in registros:
+        digest = hash_sentencia(registro.sentencia)
+        if digest in vistos:
+            estadisticas.descartar(registro.origen, registro.linea, "Sentencia duplicada")
+            continue
+        vistos.add(digest)
+        yield registro
+
+
+def dividir(registros, estadisticas, asignador='cortes', seed=None, ratios=SPLIT_RATIOS, tolerancia=0.02):
+    """
+    Asigna archivos de origen completos a train/valid/test, como
+    split_data_train-valid-test.py, y emite los registros de cada split en orden.
+
+    Raises:
+        ValueError: Con 'estratificado', si el reparto queda fuera de la tolerancia en
+            alguna dimensión (antes de emitir ningún registro)
+    """
+    por_origen = {}
+    for registro in registros:
+        por_origen.setdefault(registro.origen, []).append(registro)
+
+    grupos = list(por_origen.values())
+    del por_origen
+    if asignador == 'estratificado':
+        entidades = []
+        for grupo in grupos:
+            conteo = {}
+            for registro in grupo:
+                count_entities(registro.tag, conteo)
+            entidades.append(conteo)
+        splits, desviaciones = balanced_assign([len(g) for g in grupos], entidades, ratios, seed, tolerancia)
+        fuera = [fila for fila in desviaciones if fila[3] > fila[4]]
+        if fuera:
+            raise ValueError(
+                f"El reparto estratificado (semilla {seed}) supera la tolerancia en {len(fuera)} dimensiones: "
+                + ", ".join(f"{nombre} ±{desviacion:.1%} (tolerancia ±{permitida:.1%})"
+                            for nombre, _, _, desviacion, permitida in fuera))
+    else:
+        splits = cut_assign(len(grupos), ratios, seed)
+
+    for nombre, indices in zip(SPLIT_NAMES, splits):
+        for i in indices:
+            for registro in grupos[i]:
+                yield registro._replace(split=nombre)
+            grupos[i] = None
+
+
+def escribir_splits(registros, estadisticas, directorio='output_data'):
+    """Escribe train/valid/test.json en `directorio` y deja pasar los registros."""
+    # La salida se abre tras recibir el primer registro: si la división falla no se
+    # trunca ningún split anterior
+    registros = iter(registros)
+    primero = next(registros, None)
+    if primero is not None:
+        registros = chain((primero,), registros)
+    os.makedirs(directorio, exist_ok=True)
+    salidas = {nombre: open(os.path.join(directorio, f"{nombre}.json"), 'w', encoding='utf-8')
+               for nombre in SPLIT_NAMES}
+    try:
+        for registro in registros:
+            salidas[registro.split].write(
+                json.dumps({"sentencia": registro.sentencia, "tag": registro.tag}, ensure_ascii=False) + '\n')
+            yield registro
+    finally:
+        for salida in salidas.values():
+            salida.close()
+
+
+def cargar_dataset(registros):
+    """
+    Etapa final: construye el DatasetDict con las FEATURES de load_dataset_mama_es.py
+    directamente desde los registros (requiere datasets).
+    """
+    from datasets import Dataset, DatasetDict
+    from load_dataset_mama_es import FEATURES
+
+    columnas = {nombre: {'sentencia': [], 'tag': []} for nombre in SPLIT_NAMES}
+    for registro in registros:
+        columnas[registro.split]['sentencia'].append(registro.sentencia)
+        columnas[registro.split]['tag'].append(registro.tag)
+    return DatasetDict({
+        'train': Dataset.from_dict(columnas['train'], features=FEATURES),
+        'validation': Dataset.from_dict(columnas['valid'], features=FEATURES),
+        'test': Dataset.from_dict(columnas['test'], features=FEATURES),
+    })
+
+
+def _leer_y_validar(ruta, desde_txt, validar_registros, semantic, backend):
+    """Lectura y validación de un archivo en un proceso trabajador."""
+    fuente = EstadisticasEtapa('tokenizar' if desde_txt else 'leer')
+    validacion = EstadisticasEtapa('validar')
+    if desde_txt:
+        registros = medir(leer_textos([ruta], fuente), fuente)
+    else:
+        registros = medir(leer_corpus([ruta], fuente, backend), fuente)
+    if validar_registros:
+        registros = medir(validar(registros, validacion, semantic), validacion, fuente)
+    return list(registros), fuente, validacion
+
+
+def expandir_rutas(entradas, desde_txt=False):
+    """Carpetas → sus archivos de corpus (recursivo y en orden); los archivos se conservan."""
+    extensiones = ('.txt',) if desde_txt else ('.json', '.jsonl', '.nerbin')
+    rutas = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            for root, dirs, files in os.walk(entrada):
+                dirs.sort()
+                rutas.extend(os.path.join(root, f) for f in sorted(files) if f.endswith(extensiones))
+        else:
+            rutas.append(entrada)
+    return rutas
+
+
+def ejecutar_pipeline(rutas, desde_txt=False, validar_registros=True, semantic=True, deduplicar_registros=True,
+                      asignador='cortes', seed=None, directorio='output_data', cargar=False, workers=1,
+                      backend=None, tolerancia=0.02):
+    """
+    Ejecuta la cadena completa sobre los archivos dados.
+
+    Args:
+        rutas (list): Archivos de entrada (.txt con desde_txt; si no, JSONL o .nerbin)
+        desde_txt (bool): Tokenizar texto plano en lugar de leer JSONL
+        validar_registros (bool): Descartar los registros inválidos
+        semantic (bool): Validar también ids de etiqueta y transiciones BIO
+        deduplicar_registros (bool): Eliminar sentencias repetidas (se conserva la primera)
+        asignador (str): 'cortes' o 'estratificado', como en split_data_train-valid-test.py
+        seed (int): Semilla de la división
+        directorio (str): Carpeta de train/valid/test.json (None: no escribir)
+        cargar (bool): Construir también el DatasetDict en memoria
+        workers (int): Procesos para leer y validar los archivos en paralelo
+        backend (str): Backend de parseo JSON (None: el más rápido instalado)
+        tolerancia (float): Desviación máxima de las proporciones con 'estratificado'
+            (ver split_assigner.balanced_assign)
+
+    Returns:
+        tuple: (lista de EstadisticasEtapa en orden, DatasetDict o None)
+    """
+    fuente = EstadisticasEtapa('tokenizar' if desde_txt else 'leer')
+    validacion = EstadisticasEtapa('validar')
+    etapas = [fuente] + ([validacion] if validar_registros else [])
+
+    if workers > 1:
+        # Lectura y validación por archivo en el pool; sus estadísticas se suman aquí
+        trabajo = partial(_leer_y_validar, desde_txt=desde_txt, validar_registros=validar_registros,
+                          semantic=semantic, backend=backend)
+        pool = ProcessPoolExecutor(max_workers=workers)
+
+        def resultados():
+            for registros, parcial_fuente, parcial_validacion in pool.map(trabajo, rutas):
+                fuente.combinar(parcial_fuente)
+                validacion.combinar(parcial_validacion)
+                yield from registros
+
+        flujo = resultados()
+        # Las etapas siguientes miden su tiempo propio frente al de la espera del pool
+        anterior = EstadisticasEtapa('pool')
+        flujo = medir(flujo, anterior)
+    else:
+        pool = None
+        if desde_txt:
+            flujo = medir(leer_textos(rutas, fuente), fuente)
+        else:
+            flujo = medir(leer_corpus(rutas, fuente, backend), fuente)
+        anterior = fuente
+        if validar_registros:
+            flujo = medir(validar(flujo, validacion, semantic), validacion, anterior)
+            anterior = validacion
+
+    for nombre, etapa, opciones, activa in (
+            ('deduplicar', deduplicar, {}, deduplicar_registros),
+            ('dividir', dividir, {'asignador': asignador, 'seed': seed, 'tolerancia': tolerancia}, True),
+            ('escribir', escribir_splits, {'directorio': directorio}, directorio is not None)):
+        if not activa:
+            continue
+        estadisticas = EstadisticasEtapa(nombre)
+        flujo = medir(etapa(flujo, estadisticas, **opciones), estadisticas, anterior)
+        etapas.append(estadisticas)
+        anterior = estadisticas
+
+    try:
+        if cargar:
+            carga = EstadisticasEtapa('cargar')
+            inicio = time.perf_counter()
+            dataset = cargar_dataset(flujo)
+            carga.entrada = carga.salida = anterior.salida
+            carga.segundos = time.perf_counter() - inicio - anterior._inclusivo
+            etapas.append(carga)
+        else:
+            dataset = None
+            for _ in flujo:
+                pass
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return etapas, dataset
+
+
+def imprimir_resumen(etapas, workers=1):
+    print(f"\n\033[1m{'-' * 72}\033[0m")
+    print(f"\033[1mRESUMEN DEL PIPELINE\033[0m")
+    print(f"\033[1m{'-' * 72}\033[0m")
+    print(f"  {'ETAPA':<12} {'ENTRADA':>10} {'SALIDA':>10} {'DESCARTADOS':>12} {'SEGUNDOS':>9} {'REG/S':>11}")
+    for etapa in etapas:
+        ritmo = f"{etapa.entrada / etapa.segundos:11,.0f}" if etapa.segundos > 0 else f"{'-':>11}"
+        print(f"  {etapa.nombre:<12} {etapa.entrada:10d} {etapa.salida:10d} {etapa.descartados:12d} "
+              f"{etapa.segundos:9.2f} {ritmo}")
+    if workers > 1:
+        print(f"  (la lectura y la validación suman el tiempo de los {workers} procesos)")
+    for etapa in etapas:
+        if etapa.mensajes:
+            print(f"\n\033[93mPrimeros descartes en '{etapa.nombre}':\033[0m")
+            for mensaje in etapa.mensajes:
+                print(f"  - {mensaje}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('entradas', nargs='+', help="Archivos o carpetas del corpus")
+    parser.add_argument('--desde-txt', action='store_true', help="Las entradas son .txt a tokenizar")
+    parser.add_argument('--sin-validar', action='store_true', help="No descartar registros inválidos")
+    parser.add_argument('--solo-estructura', action='store_true',
+                        help="No comprobar ids de etiqueta ni transiciones BIO, solo la estructura")
+    parser.add_argument('--sin-dedup', action='store_true', help="No eliminar sentencias duplicadas")
+    parser.add_argument('--asignador', choices=['cortes', 'estratificado'], default='cortes',
+                        help="Asignación de archivos a train/valid/test (ver split_data_train-valid-test.py)")
+    parser.add_argument('--seed', type=int, default=None, help="Semilla para una división reproducible")
+    parser.add_argument('--tolerancia', type=float, default=0.02,
+                        help="Desviación máxima aceptada de las proporciones objetivo con --asignador estratificado "
+                             "(por defecto 0.02; mayor en los tipos donde un solo archivo aporta más); si no se "
+                             "alcanza no se escriben los splits")
+    parser.add_argument('--salida', default='output_data', help="Carpeta de train/valid/test.json")
+    parser.add_argument('--cargar', action='store_true',
+                        help="Construir también el DatasetDict en memoria (requiere datasets)")
+    parser.add_argument('--workers', type=int, default=1, help="Procesos para leer y validar en paralelo")
+    args = parser.parse_args()
+
+    rutas = expandir_rutas(args.entradas, args.desde_txt)
+    if not rutas:
+        parser.error("no se encontraron archivos de entrada")
+
+    try:
+        etapas, dataset = ejecutar_pipeline(
+            rutas, desde_txt=args.desde_txt, validar_registros=not args.sin_validar,
+            semantic=not args.solo_estructura, deduplicar_registros=not args.sin_dedup,
+            asignador=args.asignador, seed=args.seed, directorio=args.salida, cargar=args.cargar,
+            workers=args.workers, tolerancia=args.tolerancia)
+    except ValueError as e:
+        print(f"\n❌ {e}; no se escriben train/valid/test. Prueba con otra --seed o con una --tolerancia mayor.")
+        sys.exit(1)
+    imprimir_resumen(etapas, args.workers)
+    if dataset is not None:
+        print(f"\n{dataset}")
+
+
+if __name__ == "__main__":
+    main()
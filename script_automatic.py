@@ -1,13 +1,27 @@
 import os
 import json
+import argparse
+import tempfile
+from array import array
 from collections import defaultdict
 import datetime
 
+from dedup_index import IndiceDuplicados, INDICE_POR_DEFECTO
+from dedup_rewrite import eliminar_lineas_en_archivos
+
 def normalizar_texto(texto):
     return ' '.join(texto)
     #return ' '.join(texto).lower()
 
-def eliminar_duplicados_automaticamente(carpeta_base):
+def eliminar_duplicados_automaticamente(carpeta_base, indice=None, workers=1, umbral_casi=None):
+    """
+    Elimina las sentencias duplicadas conservando la primera ocurrencia.
+
+    Con `umbral_casi` se agrupan también las casi duplicadas (similitud de Jaccard
+    estimada con MinHash/LSH mayor o igual al umbral; requiere NumPy) y de cada grupo
+    se conserva la primera sentencia encontrada. Solo se eliminan las sentencias casi
+    duplicadas de la que se conserva (ver DetectorCasiDuplicados.grupos).
+    """
     sentencias = defaultdict(list)  # clave: sentencia -> lista de (ruta, línea, entrada_completa)
     print(f"🔍 Buscando duplicados en: {carpeta_base}")
     
@@ -15,31 +29,68 @@ def eliminar_duplicados_automaticamente(carpeta_base):
     archivos_procesados = 0
     lineas_procesadas = 0
     
-    for root, _, files in os.walk(carpeta_base):
-        for archivo in files:
-            if archivo.endswith('.json'):
-                ruta = os.path.join(root, archivo)
-                try:
-                    with open(ruta, 'r', encoding='utf-8') as f:
-                        lineas = f.readlines()
-                        for num_linea, linea in enumerate(lineas, start=1):
-                            if not linea.strip():
-                                continue
-                            try:
-                                entrada = json.loads(linea)
-                                clave = normalizar_texto(entrada['sentencia'])
-                                sentencias[clave].append((ruta, num_linea, linea.strip()))
-                                lineas_procesadas += 1
-                            except json.JSONDecodeError as e:
-                                print(f"[ERROR] JSON mal formado en {ruta}, línea {num_linea}: {e}")
-                except Exception as e:
-                    print(f"[ERROR] No se pudo leer {ruta}: {e}")
-                archivos_procesados += 1
+    detector = None
+    if umbral_casi is not None:
+        if indice is not None:
+            raise ValueError("La detección de casi duplicados no se puede combinar con el índice")
+        from near_duplicates import DetectorCasiDuplicados
+        directorio_firmas = tempfile.TemporaryDirectory()
+        detector = DetectorCasiDuplicados(umbral=umbral_casi, directorio=directorio_firmas.name)
+        # id de sentencia del detector -> id de archivo << 32 | línea; el contenido de las
+        # eliminadas se recupera al reescribir cada archivo en el paso 4
+        rutas_casi = []
+        ubicaciones_casi = array('Q')
+    
+    if indice is not None:
+        # Con índice: solo se reparsean los archivos nuevos o modificados desde la última ejecución
+        estadisticas = indice.actualizar(carpeta_base)
+        archivos_procesados = estadisticas["archivos"]
+        lineas_procesadas = indice.total_sentencias(carpeta_base)
+        print(f"📇 Índice {indice.ruta_db}: {estadisticas['reindexados']} archivos reindexados, "
+              f"{estadisticas['sin_cambios']} sin cambios, {estadisticas['errores']} con errores, "
+              f"{estadisticas['eliminados']} eliminados.")
+        # El contenido de cada línea se recupera al reescribir el archivo en el paso 4
+        for clave, ubicaciones in indice.duplicados(carpeta_base).items():
+            sentencias[clave] = [(ruta, linea, None) for ruta, linea in ubicaciones]
+    else:
+        for root, _, files in os.walk(carpeta_base):
+            for archivo in files:
+                if archivo.endswith('.json'):
+                    ruta = os.path.join(root, archivo)
+                    if detector is not None:
+                        id_archivo = len(rutas_casi)
+                        rutas_casi.append(ruta)
+                    try:
+                        with open(ruta, 'r', encoding='utf-8') as f:
+                            lineas = f.readlines()
+                            for num_linea, linea in enumerate(lineas, start=1):
+                                if not linea.strip():
+                                    continue
+                                try:
+                                    entrada = json.loads(linea)
+                                    lineas_procesadas += 1
+                                    if detector is not None:
+                                        detector.agregar(entrada['sentencia'])
+                                        ubicaciones_casi.append(id_archivo << 32 | num_linea)
+                                        continue
+                                    clave = normalizar_texto(entrada['sentencia'])
+                                    sentencias[clave].append((ruta, num_linea, linea.strip()))
+                                except json.JSONDecodeError as e:
+                                    print(f"[ERROR] JSON mal formado en {ruta}, línea {num_linea}: {e}")
+                    except Exception as e:
+                        print(f"[ERROR] No se pudo leer {ruta}: {e}")
+                    archivos_procesados += 1
     
     print(f"✅ Procesados {archivos_procesados} archivos con {lineas_procesadas} líneas JSON.")
     
     # Paso 2: Filtrar las sentencias que aparecen en más de un archivo o en varias líneas
-    duplicadas = {s: ubicaciones for s, ubicaciones in sentencias.items() if len(ubicaciones) > 1}
+    if detector is not None:
+        # Cada grupo de casi duplicados (que incluye a los idénticos) reemplaza a los grupos exactos
+        duplicadas = {f"grupo {n}": [(rutas_casi[u >> 32], u & 0xFFFFFFFF, None) for u in map(ubicaciones_casi.__getitem__, ids)]
+                      for n, ids in enumerate(detector.grupos(), 1)}
+        directorio_firmas.cleanup()
+    else:
+        duplicadas = {s: ubicaciones for s, ubicaciones in sentencias.items() if len(ubicaciones) > 1}
 
     if not duplicadas:
         print("✅ No se encontraron sentencias duplicadas entre archivos.")
@@ -75,28 +126,21 @@ def eliminar_duplicados_automaticamente(carpeta_base):
     # Paso 4: Realizar las eliminaciones
     archivos_modificados = 0
     lineas_eliminadas = 0
+    contenidos_eliminados = {}
     
-    for archivo, lineas_a_eliminar in cambios_por_archivo.items():
-        try:
-            # Ordenar líneas en orden descendente para eliminar desde el final
-            lineas_a_eliminar.sort(reverse=True)
-            
-            with open(archivo, 'r', encoding='utf-8') as f:
-                lineas = f.readlines()
-            
-            # Eliminar las líneas marcadas (ajustando el índice porque las líneas comienzan en 1)
-            for linea_num in lineas_a_eliminar:
-                del lineas[linea_num - 1]
-                lineas_eliminadas += 1
-            
-            # Escribir el archivo actualizado
-            with open(archivo, 'w', encoding='utf-8') as f:
-                f.writelines(lineas)
-            
-            archivos_modificados += 1
-            
-        except Exception as e:
-            print(f"[ERROR] Error al modificar el archivo {archivo}: {e}")
+    # Cada archivo se lee una vez y se reemplaza de forma atómica (temporal + os.replace)
+    for archivo, eliminadas, error in eliminar_lineas_en_archivos(cambios_por_archivo, workers):
+        if error is not None:
+            print(f"[ERROR] Error al modificar el archivo {archivo}: {error}")
+            continue
+        
+        for linea_num, contenido in eliminadas.items():
+            contenidos_eliminados[(archivo, linea_num)] = contenido
+        lineas_eliminadas += len(eliminadas)
+        archivos_modificados += 1
+        
+        if indice is not None:
+            indice.reindexar_archivo(archivo)
     
     # Paso 5: Generar reporte
     ahora = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
@@ -105,6 +149,8 @@ def eliminar_duplicados_automaticamente(carpeta_base):
     # Agrupar por archivo para el reporte
     reporte_por_archivo = defaultdict(list)
     for item in reporte:
+        if item["contenido"] is None:
+            item["contenido"] = contenidos_eliminados.get((item["archivo"], item["linea"]), "")
         reporte_por_archivo[item["archivo"]].append(item)
     
     with open(nombre_reporte, 'w', encoding='utf-8') as f:
@@ -131,5 +177,20 @@ def eliminar_duplicados_automaticamente(carpeta_base):
     print(f"📝 Se ha generado un reporte detallado en: {nombre_reporte}")
 
 if __name__ == "__main__":
-    carpeta_actual = os.getcwd()
-    eliminar_duplicados_automaticamente(carpeta_actual)
+    parser = argparse.ArgumentParser(description="Elimina sentencias duplicadas conservando la primera ocurrencia.")
+    parser.add_argument('carpeta', nargs='?', default=os.getcwd(), help="Carpeta base (por defecto, la actual)")
+    parser.add_argument('--indice', nargs='?', const=INDICE_POR_DEFECTO, default=None,
+                        help=f"Usar un índice incremental en SQLite (por defecto {INDICE_POR_DEFECTO})")
+    parser.add_argument('--workers', type=int, default=1, help="Procesos para reescribir los archivos afectados")
+    parser.add_argument('--casi-duplicados', nargs='?', type=float, const=0.8, default=None, metavar='UMBRAL',
+                        help="Eliminar también casi duplicados con similitud de Jaccard >= UMBRAL (por defecto 0.8)")
+    args = parser.parse_args()
+
+    if args.casi_duplicados is not None and args.indice:
+        parser.error("--casi-duplicados necesita los tokens de cada sentencia y no se puede combinar con --indice")
+
+    if args.indice:
+        with IndiceDuplicados(args.indice) as indice:
+            eliminar_duplicados_automaticamente(args.carpeta, indice=indice, workers=args.workers)
+    else:
+        eliminar_duplicados_automaticamente(args.carpeta, workers=args.workers, umbral_casi=args.casi_duplicados)
@@ -1,61 +1,216 @@
 import re
+import io
 import json
 import sys
 import os
+import glob
+import mmap
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from jsonl_validation import newline_aligned_ranges
+
+# Expresión regular para dividir palabras, números, símbolos y mantener juntos casos como "3+", "90%", "HER2/neu".
+# Con el primer carácter ya se sabe qué alternativa puede avanzar (dígito, palabra o resto),
+# así que no hay retroceso entre alternativas; los decimales van dentro de la de números
+TOKEN_PATTERN = r'''
+        \d+(?:\.\d+)?[+\-]?%?   # Números y decimales con +/- o % (ej: 3+, 90%, 3.5, 2.5%)
+        |\w+(?:[\-/]\w+)?       # Palabras, con guion o barra (ej: HER2/neu, ki-67)
+        |\S                      # Símbolos individuales (ej: (, ), /, :)
+    '''
+
+_TOKEN_FINDALL = re.compile(TOKEN_PATTERN, re.X).findall
 
 def tokenize_line(line):
-    # Expresión regular para dividir palabras, números, símbolos y mantener juntos casos como "3+", "90%", "HER2/neu"
-    tokens = re.findall(r'''
-        \d+[+\-]?%?      # Números con +/- o % (ej: 3+, 90%)
-        |\d+\.\d+        # Decimales (ej: 3.5)
-        |\w+[\-/]\w+     # Palabras con guiones o barras (ej: HER2/neu, ki-67)
-        |\w+              # Palabras normales
-        |[^\s]            # Símbolos individuales (ej: (, ), /, :)
-    ''', line, re.X | re.UNICODE)
+    """
+    Tokeniza una línea con TOKEN_PATTERN.
     
+    Las palabras separadas por espacios que son un único token (solo letras y dígitos,
+    sin empezar por dígito, o solo dígitos) se añaden directamente, sin pasar por la
+    expresión regular; el resultado es el mismo que el de aplicarla a toda la línea.
+    """
+    tokens = []
+    for word in line.split():
+        if word.isalnum() and (word.isdecimal() or not word[0].isdecimal()):
+            tokens.append(word)
+        else:
+            tokens.extend(_TOKEN_FINDALL(word))
     return tokens
 
-def txt_to_jsonl(input_path, output_path):
-    with open(input_path, 'r', encoding='utf-8') as f_in, \
-         open(output_path, 'w', encoding='utf-8') as f_out:
+# Tamaño aproximado de cada rango de bytes que tokeniza un proceso en el modo paralelo
+CHUNK_BYTES = 8 << 20
+
+def to_jsonl_line(tokens):
+    """
+    Serializa una sentencia tokenizada con todas las etiquetas a 48 ("O"). Equivale a
+    json.dumps({"sentencia": tokens, "tag": [48] * len(tokens)}, ensure_ascii=False) + '\n'.
+    """
+    return '{"sentencia": ' + json.dumps(tokens, ensure_ascii=False) + ', "tag": [' + ', '.join(['48'] * len(tokens)) + ']}\n'
+
+def _tokenize_text(text):
+    """Tokeniza las líneas no vacías de un texto y devuelve (JSONL, número de líneas)."""
+    lines = []
+    # Mismo reparto en líneas (saltos universales) que la lectura en modo texto
+    for line in io.StringIO(text, newline=None):
+        line = line.strip()
+        if line:
+            lines.append(to_jsonl_line(tokenize_line(line)))
+    return ''.join(lines), len(lines)
+
+def _tokenize_range(input_path, start, end):
+    """Tokeniza un rango de bytes alineado a saltos de línea y lo devuelve ya serializado en UTF-8."""
+    with open(input_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text = mm[start:end].decode('utf-8')
+    jsonl, line_count = _tokenize_text(text)
+    return jsonl.encode('utf-8'), line_count
+
+def _txt_to_jsonl_chunked(input_path, output_path, workers, chunk_bytes=CHUNK_BYTES):
+    """
+    Reparte el archivo en rangos alineados a saltos de línea entre un pool de procesos y
+    escribe sus resultados en el orden del archivo. Como mucho hay 2 * workers rangos en
+    vuelo, así que la memoria no depende del tamaño del archivo.
+    
+    Returns:
+        int: Número de líneas escritas
+    """
+    with open(input_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            open(output_path, 'wb').close()
+            return 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            ranges = newline_aligned_ranges(mm, max(workers, len(mm) // chunk_bytes))
+    
+    line_count = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(output_path, 'wb') as f_out:
+        pending = deque()
+        for start, end in ranges:
+            pending.append(pool.submit(_tokenize_range, input_path, start, end))
+            if len(pending) >= 2 * workers:
+                data, count = pending.popleft().result()
+                f_out.write(data)
+                line_count += count
+        while pending:
+            data, count = pending.popleft().result()
+            f_out.write(data)
+            line_count += count
+    return line_count
+
+def txt_to_jsonl(input_path, output_path, cache=None, workers=1):
+    """
+    Tokeniza un .txt y escribe una línea JSONL por cada línea no vacía.
+    
+    Args:
+        input_path (str): Archivo de texto de entrada
+        output_path (str): Archivo JSONL de salida
+        cache (CacheEtapas): Si se indica, un .txt con el mismo contenido y el mismo
+            patrón de tokenización no se vuelve a tokenizar (ver stage_cache.py)
+        workers (int): Con más de uno, el archivo se tokeniza por rangos en un pool de
+            procesos (mismo resultado que en serie)
         
-        for line in f_in:
-            line = line.strip()
-            if line:
-                tokens = tokenize_line(line)
-                json_obj = {
-                    "sentencia": tokens,
-                    "tag": [48] * len(tokens)  # Todos los tags a 48 (ajusta según necesidades)
-                }
-                f_out.write(json.dumps(json_obj, ensure_ascii=False) + '\n')
+    Returns:
+        int: Número de líneas escritas
+    """
+    key = None
+    if cache is not None:
+        # El JSONL se guarda en la caché como archivo y se copia por bloques: ni al
+        # guardarlo ni al recuperarlo se carga entero en memoria
+        key = cache.clave(input_path, 'tokenizar', patron=TOKEN_PATTERN, version=2)
+        if cache.obtener_archivo(key, output_path):
+            return _count_lines(output_path)
+    
+    if workers > 1:
+        line_count = _txt_to_jsonl_chunked(input_path, output_path, workers)
+    else:
+        line_count = 0
+        with open(input_path, 'r', encoding='utf-8') as f_in, \
+             open(output_path, 'w', encoding='utf-8') as f_out:
+            
+            for line in f_in:
+                line = line.strip()
+                if line:
+                    # Todos los tags a 48 (ajusta según necesidades)
+                    f_out.write(to_jsonl_line(tokenize_line(line)))
+                    line_count += 1
+    
+    if key is not None:
+        cache.guardar_archivo(key, output_path)
+    return line_count
+
+def _count_lines(path):
+    """Número de saltos de línea de un archivo, leído por bloques."""
+    with open(path, 'rb') as f:
+        return sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 20), b''))
+
+def expand_inputs(inputs):
+    """Expande carpetas (sus .txt) y patrones glob; devuelve las rutas .txt sin repetir y en orden."""
+    paths = []
+    for entry in inputs:
+        if os.path.isdir(entry):
+            paths.extend(sorted(glob.glob(os.path.join(glob.escape(entry), '*.txt'))))
+        elif glob.has_magic(entry):
+            paths.extend(sorted(glob.glob(entry)))
+        else:
+            paths.append(entry)
+    return list(dict.fromkeys(paths))
 
 def main():
-    # Verificar si se proporcionó un archivo como argumento
-    if len(sys.argv) != 2:
-        print("Uso: python3 script_tokenizar_textos.py archivo.txt")
-        sys.exit(1)
-    
-    # Obtener el nombre del archivo de entrada
-    input_file = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Tokeniza archivos .txt y los convierte en JSONL.")
+    parser.add_argument('archivos', nargs='+', help="Archivos .txt, carpetas o patrones glob (p. ej. 'textos/*.txt')")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Procesos para tokenizar cada archivo por rangos (por defecto 1, en serie)")
+    parser.add_argument('--cache', nargs='?', const='.cache_etapas', default=None,
+                        help="Reutilizar la tokenización de archivos sin cambios (directorio de la caché)")
+    args = parser.parse_args()
     
-    # Verificar que el archivo exista
-    if not os.path.isfile(input_file):
-        print(f"Error: El archivo '{input_file}' no existe.")
+    input_files = expand_inputs(args.archivos)
+    if not input_files:
+        print("Error: No se encontraron archivos .txt")
         sys.exit(1)
     
-    # Verificar que sea un archivo .txt
-    if not input_file.lower().endswith('.txt'):
-        print("Error: El archivo debe tener extensión .txt")
-        sys.exit(1)
+    cache = None
+    if args.cache:
+        from stage_cache import CacheEtapas
+        cache = CacheEtapas(args.cache)
     
-    # Generar el nombre del archivo de salida
-    # Quitar la extensión .txt y añadir _valid.json
-    base_name = os.path.splitext(input_file)[0]
-    output_file = f"{base_name}_valid.json"
+    errors = 0
+    total_lines = 0
+    total_start = time.perf_counter()
+    for input_file in input_files:
+        # Verificar que el archivo exista
+        if not os.path.isfile(input_file):
+            print(f"Error: El archivo '{input_file}' no existe.")
+            errors += 1
+            continue
+        
+        # Verificar que sea un archivo .txt
+        if not input_file.lower().endswith('.txt'):
+            print(f"Error: El archivo '{input_file}' debe tener extensión .txt")
+            errors += 1
+            continue
+        
+        # Generar el nombre del archivo de salida
+        # Quitar la extensión .txt y añadir _valid.json
+        base_name = os.path.splitext(input_file)[0]
+        output_file = f"{base_name}_valid.json"
+        
+        # Procesar el archivo
+        start = time.perf_counter()
+        line_count = txt_to_jsonl(input_file, output_file, cache, args.workers)
+        elapsed = time.perf_counter() - start
+        total_lines += line_count
+        print(f"Archivo procesado correctamente: {line_count} líneas ({line_count / max(elapsed, 1e-9):,.0f} líneas/s). "
+              f"\nResultado guardado en: '{output_file}'")
     
-    # Procesar el archivo
-    txt_to_jsonl(input_file, output_file)
-    print(f"Archivo procesado correctamente. \nResultado guardado en: '{output_file}'")
+    if len(input_files) > 1:
+        elapsed = time.perf_counter() - total_start
+        print(f"\nTotal: {total_lines} líneas de {len(input_files) - errors} archivos en {elapsed:.2f} s "
+              f"({total_lines / max(elapsed, 1e-9):,.0f} líneas/s)")
+    if cache is not None:
+        cache.cerrar()
+    if errors:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -1,13 +1,17 @@
 import os
 import json
+import argparse
 from collections import defaultdict
 import datetime
 
+from dedup_index import IndiceDuplicados, INDICE_POR_DEFECTO
+from dedup_rewrite import eliminar_lineas_en_archivos
+
 def normalizar_texto(texto):
     return ' '.join(texto)
     #return ' '.join(texto).lower()
 
-def eliminar_duplicados_automaticamente(carpeta_base, carpeta_prioritaria="nuevos_andres check 2"):
+def eliminar_duplicados_automaticamente(carpeta_base, carpeta_prioritaria="nuevos_andres check 2", indice=None, workers=1):
     sentencias = defaultdict(list)  # clave: sentencia -> lista de (ruta, línea, entrada_completa)
     print(f"🔍 Buscando duplicados en: {carpeta_base}")
     print(f"🌟 Carpeta prioritaria: {carpeta_prioritaria}")
@@ -16,28 +20,40 @@ def eliminar_duplicados_automaticamente(carpeta_base, carpeta_prioritaria="nuevo
     archivos_procesados = 0
     lineas_procesadas = 0
     
-    for root, _, files in os.walk(carpeta_base):
-        for archivo in files:
-            if archivo.endswith('.json'):
-                ruta = os.path.join(root, archivo)
-                try:
-                    with open(ruta, 'r', encoding='utf-8') as f:
-                        lineas = f.readlines()
-                        for num_linea, linea in enumerate(lineas, start=1):
-                            if not linea.strip():
-                                continue
-                            try:
-                                entrada = json.loads(linea)
-                                clave = normalizar_texto(entrada['sentencia'])
-                                # Guardamos si el archivo está en la carpeta prioritaria
-                                es_prioritario = carpeta_prioritaria in ruta
-                                sentencias[clave].append((ruta, num_linea, linea.strip(), es_prioritario))
-                                lineas_procesadas += 1
-                            except json.JSONDecodeError as e:
-                                print(f"[ERROR] JSON mal formado en {ruta}, línea {num_linea}: {e}")
-                except Exception as e:
-                    print(f"[ERROR] No se pudo leer {ruta}: {e}")
-                archivos_procesados += 1
+    if indice is not None:
+        # Con índice: solo se reparsean los archivos nuevos o modificados desde la última ejecución
+        estadisticas = indice.actualizar(carpeta_base)
+        archivos_procesados = estadisticas["archivos"]
+        lineas_procesadas = indice.total_sentencias(carpeta_base)
+        print(f"📇 Índice {indice.ruta_db}: {estadisticas['reindexados']} archivos reindexados, "
+              f"{estadisticas['sin_cambios']} sin cambios, {estadisticas['errores']} con errores, "
+              f"{estadisticas['eliminados']} eliminados.")
+        # El contenido de cada línea se recupera al reescribir el archivo en el paso 4
+        for clave, ubicaciones in indice.duplicados(carpeta_base).items():
+            sentencias[clave] = [(ruta, linea, None, carpeta_prioritaria in ruta) for ruta, linea in ubicaciones]
+    else:
+        for root, _, files in os.walk(carpeta_base):
+            for archivo in files:
+                if archivo.endswith('.json'):
+                    ruta = os.path.join(root, archivo)
+                    try:
+                        with open(ruta, 'r', encoding='utf-8') as f:
+                            lineas = f.readlines()
+                            for num_linea, linea in enumerate(lineas, start=1):
+                                if not linea.strip():
+                                    continue
+                                try:
+                                    entrada = json.loads(linea)
+                                    clave = normalizar_texto(entrada['sentencia'])
+                                    # Guardamos si el archivo está en la carpeta prioritaria
+                                    es_prioritario = carpeta_prioritaria in ruta
+                                    sentencias[clave].append((ruta, num_linea, linea.strip(), es_prioritario))
+                                    lineas_procesadas += 1
+                                except json.JSONDecodeError as e:
+                                    print(f"[ERROR] JSON mal formado en {ruta}, línea {num_linea}: {e}")
+                    except Exception as e:
+                        print(f"[ERROR] No se pudo leer {ruta}: {e}")
+                    archivos_procesados += 1
     
     print(f"✅ Procesados {archivos_procesados} archivos con {lineas_procesadas} líneas JSON.")
     
@@ -92,28 +108,21 @@ def eliminar_duplicados_automaticamente(carpeta_base, carpeta_prioritaria="nuevo
     # Paso 4: Realizar las eliminaciones
     archivos_modificados = 0
     lineas_eliminadas = 0
+    contenidos_eliminados = {}
     
-    for archivo, lineas_a_eliminar in cambios_por_archivo.items():
-        try:
-            # Ordenar líneas en orden descendente para eliminar desde el final
-            lineas_a_eliminar.sort(reverse=True)
-            
-            with open(archivo, 'r', encoding='utf-8') as f:
-                lineas = f.readlines()
-            
-            # Eliminar las líneas marcadas (ajustando el índice porque las líneas comienzan en 1)
-            for linea_num in lineas_a_eliminar:
-                del lineas[linea_num - 1]
-                lineas_eliminadas += 1
-            
-            # Escribir el archivo actualizado
-            with open(archivo, 'w', encoding='utf-8') as f:
-                f.writelines(lineas)
-            
-            archivos_modificados += 1
-            
-        except Exception as e:
-            print(f"[ERROR] Error al modificar el archivo {archivo}: {e}")
+    # Cada archivo se lee una vez y se reemplaza de forma atómica (temporal + os.replace)
+    for archivo, eliminadas, error in eliminar_lineas_en_archivos(cambios_por_archivo, workers):
+        if error is not None:
+            print(f"[ERROR] Error al modificar el archivo {archivo}: {error}")
+            continue
+        
+        for linea_num, contenido in eliminadas.items():
+            contenidos_eliminados[(archivo, linea_num)] = contenido
+        lineas_eliminadas += len(eliminadas)
+        archivos_modificados += 1
+        
+        if indice is not None:
+            indice.reindexar_archivo(archivo)
     
     # Paso 5: Generar reporte
     ahora = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
@@ -122,6 +131,8 @@ def eliminar_duplicados_automaticamente(carpeta_base, carpeta_prioritaria="nuevo
     # Agrupar por archivo para el reporte
     reporte_por_archivo = defaultdict(list)
     for item in reporte:
+        if item["contenido"] is None:
+            item["contenido"] = contenidos_eliminados.get((item["archivo"], item["linea"]), "")
         reporte_por_archivo[item["archivo"]].append(item)
     
     with open(nombre_reporte, 'w', encoding='utf-8') as f:
@@ -149,5 +160,16 @@ def eliminar_duplicados_automaticamente(carpeta_base, carpeta_prioritaria="nuevo
     print(f"📝 Se ha generado un reporte detallado en: {nombre_reporte}")
 
 if __name__ == "__main__":
-    carpeta_actual = os.getcwd()
-    eliminar_duplicados_automaticamente(carpeta_actual)
+    parser = argparse.ArgumentParser(description="Elimina sentencias duplicadas dando prioridad a una carpeta.")
+    parser.add_argument('carpeta', nargs='?', default=os.getcwd(), help="Carpeta base (por defecto, la actual)")
+    parser.add_argument('--prioritaria', default="nuevos_andres check 2", help="Carpeta cuyas ocurrencias se conservan")
+    parser.add_argument('--indice', nargs='?', const=INDICE_POR_DEFECTO, default=None,
+                        help=f"Usar un índice incremental en SQLite (por defecto {INDICE_POR_DEFECTO})")
+    parser.add_argument('--workers', type=int, default=1, help="Procesos para reescribir los archivos afectados")
+    args = parser.parse_args()
+
+    if args.indice:
+        with IndiceDuplicados(args.indice) as indice:
+            eliminar_duplicados_automaticamente(args.carpeta, args.prioritaria, indice=indice, workers=args.workers)
+    else:
+        eliminar_duplicados_automaticamente(args.carpeta, args.prioritaria, workers=args.workers)
@@ -0,0 +1,399 @@
+"""
+Asignación de archivos completos a train/valid/test.
+
+Además de los cortes fijos sobre una lista barajada (el comportamiento original del
+divisor), ofrece un asignador estratificado: cada archivo se describe por su número de
+líneas y su número de entidades de cada tipo (etiquetas de inicio B_ de TAG_SCHEMA), y
+se reparte de forma voraz para que las proporciones de líneas y de cada tipo de entidad
+en cada split se acerquen a las proporciones objetivo.
+
+Los archivos se recorren de mayor a menor aporte (los pequeños ajustan el final) y cada
+uno va al split donde menos aumenta el error cuadrático relativo entre la fracción
+acumulada y la fracción objetivo, sumado sobre todas las dimensiones en las que el
+archivo tiene algo. Al ser relativo a la proporción de cada split, valid y test se
+llenan al mismo ritmo que train en lugar de recibir solo los archivos del final. Con
+una semilla fija el resultado es reproducible.
+
+refine_assign ajusta después las dimensiones que queden fuera de la tolerancia. La
+tolerancia se adapta a los datos: en una dimensión donde un solo archivo aporta más
+que ella, no se exige más precisión que la de ese archivo (ver dimension_tolerances).
+"""
+
+import random
+
+from tag_schema import TAG_SCHEMA
+
+SPLIT_RATIOS = (0.8, 0.1, 0.1)
+
+
+def count_entities(tags, counts, schema=TAG_SCHEMA):
+    """
+    Suma a `counts` las entidades de una sentencia, contando sus etiquetas de inicio.
+
+    Args:
+        tags (list): Etiquetas numéricas de la sentencia
+        counts (dict): id de tipo de entidad -> número de entidades (se modifica)
+        schema (TagSchema): Esquema de etiquetas
+    """
+    if not isinstance(tags, list):
+        return
+    is_begin, tag_type, size = schema.is_begin, schema.tag_type, schema.size
+    for tag in tags:
+        if type(tag) is int and 0 <= tag < size and is_begin[tag]:
+            type_id = tag_type[tag]
+            counts[type_id] = counts.get(type_id, 0) + 1
+
+
+def cut_assign(num_files, ratios=SPLIT_RATIOS, seed=None):
+    """
+    Baraja los archivos y los corta por número de archivos según las proporciones.
+
+    Args:
+        num_files (int): Número de archivos
+        ratios (tuple): Proporción de archivos de cada split
+        seed (int): Semilla del barajado (None: no reproducible)
+
+    Returns:
+        list: Listas de índices de archivo, una por split
+    """
+    order = list(range(num_files))
+    random.Random(seed).shuffle(order)
+    splits, start, cumulative = [], 0, 0.0
+    for ratio in ratios[:-1]:
+        cumulative += ratio
+        end = int(cumulative * num_files)
+        splits.append(order[start:end])
+        start = end
+    splits.append(order[start:])
+    return splits
+
+
+def _dimension_totals(line_counts, entity_counts):
+    """Totales por dimensión: 0 para líneas y 1 + id de tipo para cada tipo de entidad."""
+    totals = {0: sum(line_counts)}
+    for counts in entity_counts:
+        for type_id, count in counts.items():
+            totals[type_id + 1] = totals.get(type_id + 1, 0) + count
+    return totals
+
+
+def stratified_assign(line_counts, entity_counts, ratios=SPLIT_RATIOS, seed=None, line_weight=None):
+    """
+    Reparte archivos completos equilibrando líneas y entidades por tipo.
+
+    Args:
+        line_counts (list): Líneas válidas de cada archivo
+        entity_counts (list): Por archivo, dict id de tipo de entidad -> número de entidades
+        ratios (tuple): Proporción objetivo de cada split
+        seed (int): Semilla para desempatar archivos con el mismo aporte
+        line_weight (float): Peso del error en líneas frente al de cada tipo de entidad
+            (por defecto, el número de tipos presentes: líneas y entidades pesan lo mismo)
+
+    Returns:
+        list: Listas de índices de archivo, una por split, en orden creciente
+    """
+    num_files = len(line_counts)
+    totals = _dimension_totals(line_counts, entity_counts)
+    if line_weight is None:
+        line_weight = max(1, sum(1 for dim, total in totals.items() if dim and total))
+
+    # Aporte de cada archivo como fracción del total de cada dimensión: las entidades se
+    # escalan por tipo al vuelo. Escalar las líneas por sqrt(peso) multiplica su error
+    # cuadrático por el peso
+    line_share = (1.0 / totals[0]) * line_weight ** 0.5 if totals[0] else 0.0
+    type_share = [0.0] * max(totals)
+    for dim, total in totals.items():
+        if dim and total:
+            type_share[dim - 1] = 1.0 / total
+    squares = []
+    for lines, counts in zip(line_counts, entity_counts):
+        w = lines * line_share
+        square = w * w
+        for type_id, count in counts.items():
+            w = count * type_share[type_id]
+            square += w * w
+        squares.append(square)
+
+    # Mayor aporte primero; una clave aleatoria previa desempata de forma reproducible
+    rng = random.Random(seed)
+    tiebreak = [rng.random() for _ in range(num_files)]
+    order = sorted(range(num_files), key=tiebreak.__getitem__)
+    order.sort(key=squares.__getitem__, reverse=True)
+
+    greedy = _greedy_three if len(ratios) == 3 else _greedy
+    assignment = greedy(order, line_counts, entity_counts, line_share, type_share, squares, ratios)
+    for indices in assignment:
+        indices.sort()
+    return assignment
+
+
+def _greedy(order, line_counts, entity_counts, line_share, type_share, squares, ratios):
+    """
+    Asigna cada archivo, en `order`, al split donde menos aumenta el error.
+
+    El aumento de sum((f_s - r_s)^2 / r_s) al añadir el archivo al split s es, salvo un
+    término común a todos los splits, (2 * sum(w * f_s) + sum(w^2)) / r_s.
+    """
+    line_filled = [0.0] * len(ratios)
+    filled = [[0.0] * len(type_share) for _ in ratios]
+    assignment = [[] for _ in ratios]
+    for i in order:
+        counts = entity_counts[i]
+        w_line = line_counts[i] * line_share
+        best, best_score = 0, None
+        for s, ratio in enumerate(ratios):
+            split_filled = filled[s]
+            dot = w_line * line_filled[s]
+            for type_id, count in counts.items():
+                dot += count * type_share[type_id] * split_filled[type_id]
+            score = (2 * dot + squares[i]) / ratio
+            if best_score is None or score < best_score:
+                best, best_score = s, score
+        line_filled[best] += w_line
+        target = filled[best]
+        for type_id, count in counts.items():
+            target[type_id] += count * type_share[type_id]
+        assignment[best].append(i)
+    return assignment
+
+
+def _greedy_three(order, line_counts, entity_counts, line_share, type_share, squares, ratios):
+    """
+    _greedy para los tres splits habituales, con los tres productos escalares calculados
+    en una sola pasada por las entidades del archivo. Da el mismo resultado.
+    """
+    r0, r1, r2 = ratios
+    l0 = l1 = l2 = 0.0
+    filled = [[0.0] * len(type_share) for _ in ratios]
+    f0, f1, f2 = filled
+    assignment = [[] for _ in ratios]
+    append0, append1, append2 = (indices.append for indices in assignment)
+    for i in order:
+        counts = entity_counts[i]
+        w_line = line_counts[i] * line_share
+        d0, d1, d2 = w_line * l0, w_line * l1, w_line * l2
+        for type_id, count in counts.items():
+            w = count * type_share[type_id]
+            d0 += w * f0[type_id]
+            d1 += w * f1[type_id]
+            d2 += w * f2[type_id]
+        square = squares[i]
+        s0, s1, s2 = (2 * d0 + square) / r0, (2 * d1 + square) / r1, (2 * d2 + square) / r2
+        # A igualdad gana el primer split, como en _greedy
+        if s0 <= s1 and s0 <= s2:
+            l0 += w_line
+            target = f0
+            append0(i)
+        elif s1 <= s2:
+            l1 += w_line
+            target = f1
+            append1(i)
+        else:
+            l2 += w_line
+            target = f2
+            append2(i)
+        for type_id, count in counts.items():
+            target[type_id] += count * type_share[type_id]
+    return assignment
+
+
+def _split_fill(line_counts, entity_counts, assignment):
+    """
+    Totales por dimensión de cada split de un reparto (0 para líneas, 1 + id de tipo para
+    cada tipo de entidad) y mayor aporte de un solo archivo a cada dimensión, en una pasada.
+
+    Returns:
+        tuple: (lista por split de totales por dimensión, mayor aporte por dimensión)
+    """
+    num_dims = max(map(max, filter(None, entity_counts)), default=-1) + 2
+    largest = [0] * num_dims
+    largest[0] = max(line_counts, default=0)
+    filled = []
+    for indices in assignment:
+        split_filled = [0] * num_dims
+        for i in indices:
+            split_filled[0] += line_counts[i]
+            for type_id, count in entity_counts[i].items():
+                split_filled[type_id + 1] += count
+                if count > largest[type_id + 1]:
+                    largest[type_id + 1] = count
+        filled.append(split_filled)
+    return filled, largest
+
+
+def _tolerances(totals, largest, tolerance):
+    return [max(tolerance, big / total) if total else tolerance for total, big in zip(totals, largest)]
+
+
+def dimension_tolerances(line_counts, entity_counts, tolerance):
+    """
+    Tolerancia efectiva de cada dimensión (0 para líneas, 1 + id de tipo para cada tipo).
+
+    Mover un archivo de split cambia la proporción de una dimensión en lo que ese archivo
+    aporta a ella, así que una dimensión en la que un solo archivo supera la tolerancia
+    (un tipo de entidad presente en pocos archivos, un corpus de pocas decenas de
+    archivos) no se puede ajustar con ese margen: su tolerancia es la mayor fracción
+    que aporta un archivo.
+
+    Returns:
+        list: Desviación máxima aceptada en cada dimensión
+    """
+    (totals,), largest = _split_fill(line_counts, entity_counts, [range(len(line_counts))])
+    return _tolerances(totals, largest, tolerance)
+
+
+def refine_assign(line_counts, entity_counts, assignment, ratios=SPLIT_RATIOS, tolerance=0.02,
+                  max_moves=1000, candidates=64):
+    """
+    Ajusta un reparto moviendo archivos sueltos de un split a otro hasta que todas las
+    dimensiones (líneas y cada tipo de entidad) queden dentro de su tolerancia (ver
+    dimension_tolerances).
+
+    En cada paso se toma la dimensión y el split con mayor desviación y se prueban los
+    `candidates` archivos cuyo aporte a esa dimensión más se acerca al exceso o al
+    defecto; se aplica el movimiento que más reduce lo que las desviaciones superan la
+    tolerancia, sumado sobre todas las dimensiones (y, a igualdad, la suma de
+    desviaciones). Así una dimensión imposible de equilibrar (un tipo de entidad que
+    solo aparece en un archivo) no impide corregir las demás. Se detiene al entrar en
+    la tolerancia, cuando ningún movimiento mejora o tras `max_moves` movimientos.
+
+    Args:
+        line_counts (list): Líneas válidas de cada archivo
+        entity_counts (list): Por archivo, dict id de tipo de entidad -> número de entidades
+        assignment (list): Reparto inicial, listas de índices de archivo por split
+        ratios (tuple): Proporción objetivo de cada split
+        tolerance (float): Desviación máxima absoluta aceptada en cada dimensión, salvo
+            en las que un solo archivo aporta más
+        max_moves (int): Movimientos máximos
+        candidates (int): Archivos evaluados en cada paso
+
+    Returns:
+        list: Listas de índices de archivo, una por split, en orden creciente
+    """
+    filled, largest = _split_fill(line_counts, entity_counts, assignment)
+    totals = [sum(column) for column in zip(*filled)]
+    dims = [dim for dim, total in enumerate(totals) if total]
+    num_splits = len(ratios)
+    tolerances = _tolerances(totals, largest, tolerance)
+
+    split_of = [0] * len(line_counts)
+    for s, indices in enumerate(assignment):
+        for i in indices:
+            split_of[i] = s
+
+    def evaluate(source=None, target=None, vector=None):
+        """
+        (exceso sobre la tolerancia, suma de desviaciones) del reparto actual, moviendo
+        `vector` de `source` a `target` si se indica.
+        """
+        total, over = 0.0, 0.0
+        for dim in dims:
+            allowed = tolerances[dim]
+            moved = vector.get(dim, 0) if vector else 0
+            for s in range(num_splits):
+                value = filled[s][dim]
+                if moved:
+                    if s == source:
+                        value -= moved
+                    elif s == target:
+                        value += moved
+                excess = abs(value / totals[dim] - ratios[s])
+                total += excess
+                if excess > allowed:
+                    over += excess - allowed
+        return over, total
+
+    def best_move(dim, split, excess):
+        """Mejor movimiento (resultado, archivo, split de destino) para corregir una dimensión de un split."""
+        needed = abs(excess) * totals[dim]
+        # Con exceso se saca de `split` un archivo con aporte en la dimensión; con
+        # defecto se trae de otro split
+        pool = [i for i in files_with[dim] if (split_of[i] == split) == (excess > 0)]
+        pool.sort(key=lambda i: (abs(vectors[i][dim] - needed), i))
+        best = None
+        for i in pool[:candidates]:
+            source = split_of[i]
+            for target in (range(num_splits) if excess > 0 else (split,)):
+                if target != source:
+                    result = evaluate(source, target, vectors[i])
+                    if best is None or result < best[0]:
+                        best = (result, i, target)
+        return best
+
+    current = evaluate()
+    if current[0]:
+        # Aporte de cada archivo por dimensión y archivos con aporte en cada dimensión
+        vectors = []
+        files_with = {dim: [] for dim in dims}
+        for i, (lines, counts) in enumerate(zip(line_counts, entity_counts)):
+            vector = {0: lines} if lines else {}
+            for type_id, count in counts.items():
+                if count:
+                    vector[type_id + 1] = count
+            for dim in vector:
+                files_with[dim].append(i)
+            vectors.append(vector)
+
+    for _ in range(max_moves):
+        if not current[0]:
+            break
+        # Dimensiones fuera de tolerancia, de mayor a menor desviación: si la peor no
+        # tiene arreglo se intenta con la siguiente
+        outside = sorted(((filled[s][dim] / totals[dim] - ratios[s], dim, s)
+                          for dim in dims for s in range(num_splits)
+                          if abs(filled[s][dim] / totals[dim] - ratios[s]) > tolerances[dim]),
+                         key=lambda row: -abs(row[0]))
+        for excess, dim, split in outside:
+            best = best_move(dim, split, excess)
+            if best is not None and best[0] < current:
+                break
+        else:
+            break
+        current, i, target = best
+        for d, c in vectors[i].items():
+            filled[split_of[i]][d] -= c
+            filled[target][d] += c
+        split_of[i] = target
+
+    refined = [[] for _ in ratios]
+    for i, s in enumerate(split_of):
+        refined[s].append(i)
+    return refined
+
+
+def split_deviations(line_counts, entity_counts, assignment, ratios=SPLIT_RATIOS, schema=TAG_SCHEMA,
+                     tolerance=0.02):
+    """
+    Compara las proporciones obtenidas con las objetivo, por líneas y por tipo de entidad.
+
+    Returns:
+        list: Filas (nombre, total, proporciones por split, desviación máxima absoluta,
+            tolerancia de la dimensión según dimension_tolerances), primero la de líneas
+            y después una por tipo de entidad presente
+    """
+    per_split, largest = _split_fill(line_counts, entity_counts, assignment)
+    totals = [sum(column) for column in zip(*per_split)]
+    tolerances = _tolerances(totals, largest, tolerance)
+
+    rows = []
+    for dim, total in enumerate(totals):
+        if not total:
+            continue
+        name = "LÍNEAS" if dim == 0 else schema.type_names[dim - 1]
+        obtained = [partial[dim] / total for partial in per_split]
+        deviation = max(abs(o - r) for o, r in zip(obtained, ratios))
+        rows.append((name, total, obtained, deviation, tolerances[dim]))
+    return rows
+
+
+def balanced_assign(line_counts, entity_counts, ratios=SPLIT_RATIOS, seed=None, tolerance=0.02):
+    """
+    Reparto del asignador 'estratificado': stratified_assign, ajuste con refine_assign y
+    comprobación de la tolerancia de cada dimensión.
+
+    Returns:
+        tuple: (listas de índices de archivo por split, filas de split_deviations)
+    """
+    assignment = stratified_assign(line_counts, entity_counts, ratios, seed)
+    assignment = refine_assign(line_counts, entity_counts, assignment, ratios, tolerance)
+    return assignment, split_deviations(line_counts, entity_counts, assignment, ratios, tolerance=tolerance)
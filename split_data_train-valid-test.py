@@ -7,10 +7,16 @@ Esto con el fin de no dañar el contexto de una historia médica completa
 
 import os
 import json
-import random
 import logging
+import argparse
+import sys
+from array import array
 from pathlib import Path
 
+from corpus_bin import CorpusBin
+from split_assigner import SPLIT_RATIOS, balanced_assign, count_entities, cut_assign, split_deviations
+from vocabulary import Vocabulary
+
 # Configurar el sistema de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -21,14 +27,133 @@ logging.basicConfig(
     ]
 )
 
-def process_folders():
-    """Procesa todas las carpetas y divide por archivos completos en lugar de líneas."""
+def copy_valid_lines(file_info, output):
+    """
+    Copia las líneas válidas de un archivo tal cual, como bytes, sin decodificar el JSON.
+    
+    Args:
+        file_info (dict): Información del archivo registrada en la primera pasada
+        output: Archivo de salida abierto en modo binario
+        
+    Returns:
+        int: Número de líneas copiadas
+    """
+    if 'bin_range' in file_info:
+        bin_file, start, end = file_info['bin_range']
+        with CorpusBin(bin_file) as corpus:
+            for i in range(start, end):
+                item = {"sentencia": corpus.sentence_tokens(i), "tag": corpus.sentence_tags(i)}
+                output.write(json.dumps(item, ensure_ascii=False).encode('utf-8') + b'\n')
+        return end - start
+    
+    copied = 0
+    skip_lines = file_info['skip_lines']
+    with open(file_info['file_path'], 'rb') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if line and line_number not in skip_lines:
+                output.write(line + b'\n')
+                copied += 1
+    return copied
+
+def pack_record(json_data, vocabulary):
+    """
+    Forma compacta de una línea para los buffers del modo en memoria.
+    
+    Una línea que es exactamente {"sentencia": [str, ...], "tag": [int, ...]} se guarda
+    como (ids en el vocabulario, array('B') de etiquetas); cualquier otra (claves extra
+    u otro orden, etiquetas fuera de 0-255...) se guarda como el dict leído, para que
+    unpack_record la devuelva idéntica y la salida no cambie.
+    
+    Args:
+        json_data: Línea decodificada
+        vocabulary (Vocabulary): Vocabulario compartido por todos los archivos
+        
+    Returns:
+        tuple o dict: Registro para file_info['data']
+    """
+    if type(json_data) is dict and list(json_data) == ['sentencia', 'tag']:
+        sentencia = json_data['sentencia']
+        tag = json_data['tag']
+        if (type(sentencia) is list and type(tag) is list
+                and set(map(type, sentencia)) <= {str} and set(map(type, tag)) <= {int}):
+            try:
+                return vocabulary.encode(sentencia), array('B', tag)
+            except OverflowError:
+                pass
+    return json_data
+
+def unpack_record(record, vocabulary):
+    """Línea original a partir de un registro de pack_record."""
+    if type(record) is tuple:
+        ids, tags = record
+        return {"sentencia": vocabulary.decode(ids), "tag": tags.tolist()}
+    return record
+
+def collect_bin_units(bin_file, streaming=False, assigner='cortes', vocabulary=None):
+    """
+    Convierte un corpus binario .nerbin en unidades de división: cada archivo de origen
+    registrado en el corpus se trata como un archivo completo, igual que un .json suelto.
+    
+    Args:
+        bin_file (Path): Ruta al archivo .nerbin
+        streaming (bool): No cargar las sentencias; se leerán del mapa al copiarlas
+        assigner (str): Con 'estratificado' se cuentan las entidades de cada unidad
+        vocabulary (Vocabulary): Si se indica, las sentencias se guardan con pack_record
+        
+    Returns:
+        list: Información de cada unidad, con la misma forma que la de los .json
+    """
+    units = []
+    with CorpusBin(bin_file) as corpus:
+        for source, start, end in corpus.source_ranges():
+            entity_counts = {}
+            file_data = []
+            for i in range(start, end):
+                tags = corpus.sentence_tags(i)
+                if assigner == 'estratificado':
+                    count_entities(tags, entity_counts)
+                if not streaming:
+                    record = {"sentencia": corpus.sentence_tokens(i), "tag": tags}
+                    file_data.append(record if vocabulary is None else pack_record(record, vocabulary))
+            units.append({
+                'file_path': Path(f"{bin_file}::{source}"),
+                'data': file_data,
+                'count': end - start,
+                'skip_lines': set(),
+                'entities': entity_counts,
+                'bin_range': (bin_file, start, end)
+            })
+    return units
+
+def process_folders(streaming=False, assigner='cortes', seed=None, tolerance=0.02):
+    """
+    Procesa todas las carpetas y divide por archivos completos en lugar de líneas.
+    
+    Args:
+        streaming (bool): Modo en dos pasadas que no mantiene el corpus en memoria. La
+            primera pasada valida cada archivo y solo guarda su ruta, su número de líneas
+            válidas y las líneas a omitir; tras la división, la segunda copia las líneas
+            válidas directamente como bytes a train/valid/test.
+        assigner (str): 'cortes' baraja y corta 80/10/10 por número de archivos;
+            'estratificado' reparte los archivos para acercar a 80/10/10 las líneas y
+            las entidades de cada tipo (ver split_assigner.py)
+        seed (int): Semilla de la división, para que sea reproducible
+        tolerance (float): Desviación máxima aceptada respecto a las proporciones
+            objetivo, salvo en las dimensiones en las que un solo archivo aporta más
+            (ver split_assigner.dimension_tolerances). Con 'estratificado' el reparto se ajusta (refine_assign) hasta
+            quedar dentro de ella y, si no lo consigue, no se escribe ningún split y se
+            devuelve False; con 'cortes' las dimensiones que la superan solo se señalan
+            en el reporte
+    """
     # Crear el directorio de salida si no existe
     output_dir = Path('output_data')
     output_dir.mkdir(exist_ok=True)
     
     # Lista para almacenar información de todos los archivos
     all_files_info = []
+    # Tokens internados de las sentencias guardadas en memoria (ver pack_record)
+    vocabulary = Vocabulary()
     error_count = 0
     
     # Carpeta a omitir
@@ -49,6 +174,17 @@ def process_folders():
     for folder in folders:
         try:
             folder_path = Path(folder)
+            
+            # Los corpus binarios aportan una unidad por cada archivo de origen que contienen
+            for bin_file in sorted(folder_path.glob('*.nerbin')):
+                try:
+                    units = collect_bin_units(bin_file, streaming, assigner, vocabulary)
+                    all_files_info.extend(units)
+                    logging.info(f"Corpus binario: {bin_file} con {len(units)} archivos de origen")
+                except Exception as e:
+                    logging.error(f"Error al procesar el corpus binario {bin_file}: {str(e)}")
+                    error_count += 1
+            
             json_files = list(folder_path.glob('*.json'))
             
             if not json_files:
@@ -61,7 +197,16 @@ def process_folders():
             for json_file in json_files:
                 try:
                     file_data = []
-                    with open(json_file, 'r', encoding='utf-8') as f:
+                    valid_count = 0
+                    skip_lines = set()  # Líneas inválidas que no se copian en modo streaming
+                    entity_counts = {}  # id de tipo de entidad -> entidades del archivo
+                    
+                    # En modo streaming se lee en binario para numerar las líneas igual que al copiarlas
+                    if streaming:
+                        f = open(json_file, 'rb')
+                    else:
+                        f = open(json_file, 'r', encoding='utf-8')
+                    with f:
                         for line_number, line in enumerate(f, 1):
                             try:
                                 line = line.strip()
@@ -69,22 +214,30 @@ def process_folders():
                                     json_data = json.loads(line)
                                     # Verificar que el formato es correcto
                                     if "sentencia" in json_data and "tag" in json_data:
-                                        file_data.append(json_data)
+                                        valid_count += 1
+                                        if assigner == 'estratificado':
+                                            count_entities(json_data["tag"], entity_counts)
+                                        if not streaming:
+                                            file_data.append(pack_record(json_data, vocabulary))
                                     else:
                                         logging.warning(f"Formato incorrecto en {json_file}, línea {line_number}")
+                                        skip_lines.add(line_number)
                                         error_count += 1
                             except json.JSONDecodeError:
                                 logging.error(f"Error al decodificar JSON en {json_file}, línea {line_number}")
+                                skip_lines.add(line_number)
                                 error_count += 1
                     
                     # Solo agregar archivos que tengan datos válidos
-                    if file_data:
+                    if valid_count:
                         all_files_info.append({
                             'file_path': json_file,
                             'data': file_data,
-                            'count': len(file_data)
+                            'count': valid_count,
+                            'skip_lines': skip_lines,
+                            'entities': entity_counts
                         })
-                        logging.info(f"Archivo válido: {json_file} con {len(file_data)} líneas")
+                        logging.info(f"Archivo válido: {json_file} con {valid_count} líneas")
                     else:
                         logging.warning(f"Archivo sin datos válidos: {json_file}")
                         
@@ -101,30 +254,49 @@ def process_folders():
         print("❌ Error: No se encontraron archivos válidos para procesar.")
         return False
     
-    # Mezclar los archivos aleatoriamente
-    random.shuffle(all_files_info)
-    
-    # Calcular índices para la división (por número de archivos)
     total_files = len(all_files_info)
-    train_files_idx = int(0.8 * total_files)
-    valid_files_idx = int(0.9 * total_files)
+    line_counts = [file_info['count'] for file_info in all_files_info]
+    entity_counts = [file_info['entities'] for file_info in all_files_info]
+    
+    if assigner == 'estratificado':
+        # Archivos completos repartidos equilibrando líneas y entidades por tipo, con un
+        # ajuste posterior de las dimensiones que queden fuera de la tolerancia
+        splits, deviations = balanced_assign(line_counts, entity_counts, SPLIT_RATIOS, seed, tolerance)
+    else:
+        # Mezclar los archivos y dividir por número de archivos
+        splits = cut_assign(total_files, SPLIT_RATIOS, seed)
+        deviations = split_deviations(line_counts, entity_counts, splits, SPLIT_RATIOS, tolerance=tolerance)
     
-    # Dividir los archivos
-    train_files = all_files_info[:train_files_idx]
-    valid_files = all_files_info[train_files_idx:valid_files_idx]
-    test_files = all_files_info[valid_files_idx:]
+    train_files, valid_files, test_files = ([all_files_info[i] for i in indices] for indices in splits)
+    out_of_tolerance = [row for row in deviations if row[3] > row[4]]
+    if out_of_tolerance and assigner == 'estratificado':
+        logging.error(f"El reparto estratificado supera la tolerancia de ±{tolerance:.1%} en "
+                      f"{len(out_of_tolerance)} dimensiones; no se escriben los splits")
+        print(f"\n❌ No hay reparto dentro de la tolerancia de ±{tolerance:.1%} (semilla {seed}); "
+              f"no se escriben train/valid/test:")
+        for name, total, obtained, deviation, allowed in out_of_tolerance:
+            print(f"  {name:<22} {total:8d} → " + " / ".join(f"{o:.1%}" for o in obtained)
+                  + f"  (±{deviation:.1%}, tolerancia ±{allowed:.1%})")
+        print("  Prueba con otra --seed o con una --tolerancia mayor.")
+        return False
     
     # Función auxiliar para escribir archivos y contar líneas
     def write_dataset(files_list, output_filename, dataset_name):
         total_lines = 0
         file_names = []
         
-        with open(output_dir / output_filename, 'w', encoding='utf-8') as f:
-            for file_info in files_list:
-                file_names.append(file_info['file_path'].name)
-                for item in file_info['data']:
-                    f.write(json.dumps(item, ensure_ascii=False) + '\n')
-                    total_lines += 1
+        if streaming:
+            with open(output_dir / output_filename, 'wb') as f:
+                for file_info in files_list:
+                    file_names.append(file_info['file_path'].name)
+                    total_lines += copy_valid_lines(file_info, f)
+        else:
+            with open(output_dir / output_filename, 'w', encoding='utf-8') as f:
+                for file_info in files_list:
+                    file_names.append(file_info['file_path'].name)
+                    for record in file_info['data']:
+                        f.write(json.dumps(unpack_record(record, vocabulary), ensure_ascii=False) + '\n')
+                        total_lines += 1
         
         logging.info(f"Dataset {dataset_name}:")
         logging.info(f"  - {len(files_list)} archivos ({len(files_list)/total_files:.2%})")
@@ -152,6 +324,13 @@ def process_folders():
         print(f"  🟢 TRAIN:  {len(train_files):3d} archivos ({len(train_files)/total_files:.1%}) → {train_lines:5d} líneas ({train_lines/total_lines:.1%})")
         print(f"  🟡 VALID:  {len(valid_files):3d} archivos ({len(valid_files)/total_files:.1%}) → {valid_lines:5d} líneas ({valid_lines/total_lines:.1%})")
         print(f"  🔴 TEST:   {len(test_files):3d} archivos ({len(test_files)/total_files:.1%}) → {test_lines:5d} líneas ({test_lines/total_lines:.1%})")
+        print(f"\nASIGNADOR: {assigner} (semilla {seed}); desviación máxima respecto a "
+              f"{'/'.join(f'{r:.0%}' for r in SPLIT_RATIOS)}:")
+        for name, total, obtained, deviation, allowed in deviations:
+            mark = "⚠️ " if deviation > allowed else "  "
+            print(f"  {mark}{name:<22} {total:8d} → " + " / ".join(f"{o:.1%}" for o in obtained) + f"  (±{deviation:.1%})")
+        if out_of_tolerance:
+            print(f"  {len(out_of_tolerance)} dimensiones superan la tolerancia de ±{tolerance:.1%}")
         print("="*60)
         
         # Guardar reporte detallado
@@ -171,6 +350,15 @@ def process_folders():
             f.write(f"\nARCHIVOS DE PRUEBA ({len(test_files)}):\n")
             for i, file_info in enumerate(test_files, 1):
                 f.write(f"  {i:2d}. {file_info['file_path']} ({file_info['count']} líneas)\n")
+            
+            f.write(f"\nPROPORCIONES OBTENIDAS (asignador {assigner}, semilla {seed}, tolerancia ±{tolerance:.1%}):\n")
+            f.write(f"  {'DIMENSIÓN':<22} {'TOTAL':>8}  {'TRAIN':>7} {'VALID':>7} {'TEST':>7}  DESVIACIÓN\n")
+            for name, total, obtained, deviation, allowed in deviations:
+                status = "FUERA DE TOLERANCIA" if deviation > allowed else "ok"
+                if allowed > tolerance:
+                    status += f" (tolerancia ±{allowed:.2%}: un archivo aporta esa fracción)"
+                f.write(f"  {name:<22} {total:8d}  " + " ".join(f"{o:7.2%}" for o in obtained)
+                        + f"  {deviation:.2%} {status}\n")
         
         logging.info(f"Reporte detallado guardado en: {report_path}")
         
@@ -189,10 +377,26 @@ def process_folders():
         return False
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Divide los archivos JSON en train/valid/test por archivos completos.")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Dos pasadas sin cargar el corpus en memoria; copia las líneas válidas sin re-serializarlas")
+    parser.add_argument('--asignador', choices=['cortes', 'estratificado'], default='cortes',
+                        help="'cortes': 80/10/10 por número de archivos (por defecto); "
+                             "'estratificado': equilibra líneas y entidades por tipo")
+    parser.add_argument('--seed', type=int, default=None, help="Semilla para una división reproducible")
+    parser.add_argument('--tolerancia', type=float, default=0.02,
+                        help="Desviación máxima aceptada de las proporciones objetivo (por defecto 0.02; mayor "
+                             "en los tipos donde un solo archivo aporta más); con --asignador estratificado, "
+                             "si no se alcanza no se escriben los splits")
+    args = parser.parse_args()
+    
     logging.info("Iniciando proceso de división de datos POR ARCHIVOS")
-    result = process_folders()
+    result = process_folders(streaming=args.streaming, assigner=args.asignador,
+                             seed=args.seed, tolerance=args.tolerancia)
     if result:
         print("✅ Proceso finalizado con éxito")
     else:
         print("❌ Proceso finalizado con errores")
     logging.info("Proceso finalizado")
+    if not result:
+        sys.exit(1)
@@ -0,0 +1,230 @@
+"""
+Caché direccionada por contenido de los resultados de cada etapa, archivo a archivo.
+
+La clave de un resultado es el hash del contenido del archivo de entrada junto con el
+nombre de la etapa y sus parámetros (incluida su versión), así que corregir una
+anotación solo invalida los resultados del archivo corregido, y renombrar o mover un
+archivo no invalida nada. Cada resultado se guarda serializado con pickle en un
+archivo propio dentro del directorio de la caché (o, si el resultado es un archivo,
+como una copia de él: ver guardar_archivo); un SQLite lleva su tamaño y su último
+acceso, y cuando el total supera el límite se desalojan los menos usados
+recientemente (LRU).
+
+Para no leer dos veces un archivo sin cambios, su hash de contenido se recuerda junto
+a su ruta, tamaño y mtime, igual que hace dedup_index.py.
+
+La usan txt_to_jsonl (script_tokenizeText.py), los validadores, process_single_file
+(all-entity-extractor.py) y el modo --hash de detect_duplicates.py con la opción --cache.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import time
+
+CACHE_POR_DEFECTO = ".cache_etapas"
+TAMANO_MAXIMO = 1 << 30  # 1 GiB
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS entradas (
+    clave TEXT PRIMARY KEY,
+    tamano INTEGER NOT NULL,
+    ultimo_acceso REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entradas_acceso ON entradas(ultimo_acceso);
+CREATE TABLE IF NOT EXISTS huellas (
+    ruta TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    tamano INTEGER NOT NULL,
+    huella TEXT NOT NULL
+);
+"""
+
+
+class CacheEtapas:
+    """
+    Caché de resultados por (contenido del archivo, etapa, parámetros) con desalojo LRU.
+
+    Varios procesos pueden compartir el mismo directorio: cada resultado se escribe en
+    un temporal y se coloca con os.replace, y SQLite serializa las actualizaciones.
+
+    Args:
+        directorio (str): Directorio de la caché (se crea si no existe)
+        tamano_maximo (int): Bytes máximos de resultados guardados antes de desalojar
+    """
+
+    def __init__(self, directorio=CACHE_POR_DEFECTO, tamano_maximo=TAMANO_MAXIMO):
+        self.directorio = directorio
+        self.tamano_maximo = tamano_maximo
+        self.aciertos = 0
+        self.fallos = 0
+        os.makedirs(os.path.join(directorio, "objetos"), exist_ok=True)
+        self.conexion = sqlite3.connect(os.path.join(directorio, "cache.sqlite"), timeout=60)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.executescript(_ESQUEMA)
+
+    def cerrar(self):
+        self.conexion.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def __getstate__(self):
+        # Al enviarla a un proceso trabajador se reabre allí sobre el mismo directorio
+        return {"directorio": self.directorio, "tamano_maximo": self.tamano_maximo}
+
+    def __setstate__(self, estado):
+        self.__init__(estado["directorio"], estado["tamano_maximo"])
+
+    def huella(self, ruta):
+        """
+        Hash del contenido de un archivo; si su tamaño y mtime no cambiaron desde la
+        última vez, se reutiliza sin leerlo.
+        """
+        ruta = os.path.abspath(ruta)
+        st = os.stat(ruta)
+        fila = self.conexion.execute(
+            "SELECT huella FROM huellas WHERE ruta = ? AND mtime_ns = ? AND tamano = ?",
+            (ruta, st.st_mtime_ns, st.st_size)).fetchone()
+        if fila is not None:
+            return fila[0]
+
+        h = hashlib.blake2b(digest_size=16)
+        with open(ruta, 'rb') as f:
+            for bloque in iter(lambda: f.read(1 << 20), b''):
+                h.update(bloque)
+        huella = h.hexdigest()
+        with self.conexion:
+            self.conexion.execute("INSERT OR REPLACE INTO huellas VALUES (?, ?, ?, ?)",
+                                  (ruta, st.st_mtime_ns, st.st_size, huella))
+        return huella
+
+    def clave(self, ruta, etapa, **parametros):
+        """Clave de un resultado: contenido del archivo + etapa + parámetros."""
+        descripcion = json.dumps([etapa, parametros, self.huella(ruta)], sort_keys=True, default=str)
+        return hashlib.blake2b(descripcion.encode('utf-8'), digest_size=16).hexdigest()
+
+    def _ruta_objeto(self, clave):
+        return os.path.join(self.directorio, "objetos", clave[:2], clave)
+
+    def obtener(self, clave):
+        """
+        Returns:
+            tuple: (True, valor) si la clave está en la caché; (False, None) si no
+        """
+        try:
+            with open(self._ruta_objeto(clave), 'rb') as f:
+                valor = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.fallos += 1
+            return False, None
+        with self.conexion:
+            self.conexion.execute("UPDATE entradas SET ultimo_acceso = ? WHERE clave = ?", (time.time(), clave))
+        self.aciertos += 1
+        return True, valor
+
+    def guardar(self, clave, valor):
+        """Guarda un resultado y desaloja los menos usados si se supera el tamaño máximo."""
+        self._escribir_objeto(clave, lambda f: pickle.dump(valor, f, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def guardar_archivo(self, clave, ruta):
+        """
+        Guarda como resultado una copia de un archivo, sin cargarlo en memoria. Un
+        archivo mayor que tamano_maximo no se guarda, porque se desalojaría al momento.
+
+        Returns:
+            bool: True si se guardó
+        """
+        if os.path.getsize(ruta) > self.tamano_maximo:
+            return False
+        with open(ruta, 'rb') as origen:
+            self._escribir_objeto(clave, lambda f: shutil.copyfileobj(origen, f, 1 << 20))
+        return True
+
+    def obtener_archivo(self, clave, destino):
+        """
+        Copia a `destino` el archivo guardado con guardar_archivo.
+
+        Returns:
+            bool: True si la clave estaba en la caché
+        """
+        try:
+            shutil.copyfile(self._ruta_objeto(clave), destino)
+        except FileNotFoundError:
+            self.fallos += 1
+            return False
+        with self.conexion:
+            self.conexion.execute("UPDATE entradas SET ultimo_acceso = ? WHERE clave = ?", (time.time(), clave))
+        self.aciertos += 1
+        return True
+
+    def _escribir_objeto(self, clave, escribir):
+        """Escribe un resultado con escribir(f) en un temporal, lo coloca con os.replace y lo registra."""
+        ruta = self._ruta_objeto(clave)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                escribir(f)
+                tamano = f.tell()
+            os.replace(temporal, ruta)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        with self.conexion:
+            self.conexion.execute("INSERT OR REPLACE INTO entradas VALUES (?, ?, ?)", (clave, tamano, time.time()))
+        self._desalojar()
+
+    def calcular(self, ruta, etapa, funcion, **parametros):
+        """
+        Devuelve el resultado guardado de `etapa` para el contenido actual de `ruta`, o
+        lo calcula con funcion() y lo guarda.
+        """
+        clave = self.clave(ruta, etapa, **parametros)
+        encontrado, valor = self.obtener(clave)
+        if not encontrado:
+            valor = funcion()
+            self.guardar(clave, valor)
+        return valor
+
+    def tamano_total(self):
+        return self.conexion.execute("SELECT COALESCE(SUM(tamano), 0) FROM entradas").fetchone()[0]
+
+    def _desalojar(self):
+        """Borra los resultados menos usados recientemente hasta volver bajo el límite."""
+        exceso = self.tamano_total() - self.tamano_maximo
+        if exceso <= 0:
+            return
+        victimas = []
+        for clave, tamano in self.conexion.execute("SELECT clave, tamano FROM entradas ORDER BY ultimo_acceso"):
+            victimas.append(clave)
+            exceso -= tamano
+            if exceso <= 0:
+                break
+        with self.conexion:
+            self.conexion.executemany("DELETE FROM entradas WHERE clave = ?", [(clave,) for clave in victimas])
+        for clave in victimas:
+            try:
+                os.remove(self._ruta_objeto(clave))
+            except FileNotFoundError:
+                pass
+
+    def vaciar(self):
+        """Borra todos los resultados (las huellas de archivo se conservan)."""
+        claves = [clave for clave, in self.conexion.execute("SELECT clave FROM entradas")]
+        with self.conexion:
+            self.conexion.execute("DELETE FROM entradas")
+        for clave in claves:
+            try:
+                os.remove(self._ruta_objeto(clave))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,160 @@
+"""
+Esquema compilado de etiquetas de entidades.
+
+Convierte ENTITY_TAGS en tablas planas indexadas por número de etiqueta, de forma
+que saber si una etiqueta es de inicio (B_), a qué tipo de entidad pertenece o cuál
+es su etiqueta interior (I_) sea un acceso directo a una lista en lugar de un
+recorrido del diccionario con comparaciones de prefijos.
+"""
+
+# Define entity tags mapping
+ENTITY_TAGS = {
+    0: "B_AGE",                   23: "I_AGE",
+    1: "B_STAGE",                 24: "I_STAGE",
+    2: "B_DATE",                  25: "I_DATE",
+    3: "B_IMPLICIT_DATE",         26: "I_IMPLICIT_DATE",
+    4: "B_TNM",                   27: "I_TNM",
+    5: "B_FAMILY",                28: "I_FAMILY",
+    6: "B_OCURRENCE_EVENT",       29: "I_OCURRENCE_EVENT",
+    7: "B_TOXIC_HABITS",          30: "I_TOXIC_HABITS",
+    8: "B_HABIT-QUANTITY",        31: "I_HABIT-QUANTITY",
+    9: "B_TREATMENT_NAME",        32: "I_TREATMENT_NAME",
+    10: "B_LINE_CICLE_NUMBER",    33: "I_LINE_CICLE_NUMBER",
+    11: "B_SURGERY",              34: "I_SURGERY",
+    12: "B_DRUG",                 35: "I_DRUG",
+    13: "B_DOSE",                 36: "I_DOSE",
+    14: "B_FREQ",                 37: "I_FREQ",
+    15: "B_BIOMARKER",            38: "I_BIOMARKER",
+    16: "B_CLINICAL_SERVICE",     39: "I_CLINICAL_SERVICE",
+    17: "B_COMORBIDITY",          40: "I_COMORBIDITY",
+    18: "B_PROGRESION",           41: "I_PROGRESION",
+    19: "B_GINECOLOGICAL_HISTORY", 42: "I_GINECOLOGICAL_HISTORY",
+    20: "B_GINE_OBSTETRICS",      43: "I_GINE_OBSTETRICS",
+    21: "B_ALLERGIES",            44: "I_ALLERGIES",
+    22: "B_DURATION",             45: "I_DURATION",
+    46: "B-CANCER_CONCEPT",       47: "I-CANCER_CONCEPT",
+}
+
+# Etiqueta "O" (fuera de entidad): último elemento de la lista labels de load_dataset_mama_es.py
+OUTSIDE_TAG = 48
+
+
+class TagSchema:
+    """
+    Tablas de consulta construidas una sola vez a partir de un mapeo de etiquetas.
+
+    Todas las tablas por etiqueta tienen longitud `size` (mayor número de etiqueta + 1)
+    y usan -1 para indicar "sin valor".
+
+    Attributes:
+        tag_names (list): número de etiqueta -> nombre ("B_DRUG") o None
+        type_names (list): id de tipo -> nombre del tipo de entidad ("DRUG")
+        type_ids (dict): nombre del tipo de entidad -> id de tipo
+        tag_type (list): número de etiqueta -> id de tipo de entidad
+        is_begin (list): número de etiqueta -> True si es una etiqueta de inicio
+        inside_of (list): número de etiqueta de inicio -> número de su etiqueta interior
+        begin_of_type (list): id de tipo -> número de su etiqueta de inicio
+        inside_of_type (list): id de tipo -> número de su etiqueta interior
+    """
+
+    def __init__(self, entity_tags):
+        self.size = max(entity_tags) + 1
+        self.tag_names = [None] * self.size
+        self.type_names = []
+        self.type_ids = {}
+        self.tag_type = [-1] * self.size
+        self.is_begin = [False] * self.size
+        self.inside_of = [-1] * self.size
+        self.begin_of_type = []
+        self.inside_of_type = []
+        # Número de etiqueta por clave: 1.0 o True encuentran la etiqueta 1, como en
+        # la consulta `tag in ENTITY_TAGS` original
+        self._tag_ids = {tag_num: tag_num for tag_num in entity_tags}
+
+        for tag_num, tag_name in sorted(entity_tags.items()):
+            self.tag_names[tag_num] = tag_name
+            prefix, entity_type = tag_name[:2], tag_name[2:]
+            if prefix not in ("B_", "B-", "I_", "I-"):
+                # Etiquetas sin prefijo B/I se tratan como su propio tipo
+                entity_type = tag_name
+
+            type_id = self.type_ids.get(entity_type)
+            if type_id is None:
+                type_id = len(self.type_names)
+                self.type_ids[entity_type] = type_id
+                self.type_names.append(entity_type)
+                self.begin_of_type.append(-1)
+                self.inside_of_type.append(-1)
+            self.tag_type[tag_num] = type_id
+
+            if prefix in ("B_", "B-"):
+                self.is_begin[tag_num] = True
+                self.begin_of_type[type_id] = tag_num
+            elif prefix in ("I_", "I-"):
+                self.inside_of_type[type_id] = tag_num
+
+        for tag_num in range(self.size):
+            if self.is_begin[tag_num]:
+                self.inside_of[tag_num] = self.inside_of_type[self.tag_type[tag_num]]
+
+    def tag_id(self, value):
+        """
+        Número de etiqueta de un valor que no es int (p. ej. 1.0 en un JSON escrito
+        con floats), o -1 si no corresponde a ninguna etiqueta.
+        """
+        return self._tag_ids.get(value, -1)
+
+    def spans(self, tags):
+        """
+        Genera (inicio, fin, id de tipo) de cada entidad de una secuencia de etiquetas.
+
+        Una entidad empieza en una etiqueta B_ y sigue mientras las etiquetas siguientes
+        sean la I_ de su mismo tipo, igual que en extract_entities (all-entity-extractor.py),
+        que repite este bucle en línea por rendimiento; `fin` es exclusivo. Las etiquetas
+        desconocidas o fuera de rango se ignoran y las numéricas no enteras (1.0) se
+        convierten con tag_id.
+        """
+        size = self.size
+        is_begin = self.is_begin
+        inside_of = self.inside_of
+        tag_type = self.tag_type
+        n = len(tags)
+        i = 0
+        while i < n:
+            t = tags[i]
+            if type(t) is not int:
+                t = self.tag_id(t)
+            if 0 <= t < size and is_begin[t]:
+                inside_tag = inside_of[t]
+                j = i + 1
+                while j < n and tags[j] == inside_tag:
+                    j += 1
+                yield i, j, tag_type[t]
+                i = j
+            else:
+                i += 1
+
+    def entity_type(self, tag_num):
+        """Devuelve el tipo de entidad de una etiqueta, o "UNKNOWN" si no existe."""
+        if type(tag_num) is not int:
+            tag_num = self.tag_id(tag_num)
+        if 0 <= tag_num < self.size and self.tag_type[tag_num] >= 0:
+            return self.type_names[self.tag_type[tag_num]]
+        return "UNKNOWN"
+
+    def beginning_tag(self, entity_type):
+        """Devuelve el número de la etiqueta B_ de un tipo de entidad, o None."""
+        type_id = self.type_ids.get(entity_type)
+        if type_id is None or self.begin_of_type[type_id] < 0:
+            return None
+        return self.begin_of_type[type_id]
+
+    def inside_tag(self, entity_type):
+        """Devuelve el número de la etiqueta I_ de un tipo de entidad, o None."""
+        type_id = self.type_ids.get(entity_type)
+        if type_id is None or self.inside_of_type[type_id] < 0:
+            return None
+        return self.inside_of_type[type_id]
+
+
+TAG_SCHEMA = TagSchema(ENTITY_TAGS)
@@ -0,0 +1,14 @@
+import importlib.util
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def cargar_script(nombre):
+    """Importa un script de la raíz cuyo nombre no es un identificador (p. ej. con guiones)."""
+    spec = importlib.util.spec_from_file_location(nombre.replace('-', '_'), os.path.join(RAIZ, nombre + '.py'))
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
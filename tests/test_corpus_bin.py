@@ -0,0 +1,29 @@
+import json
+
+import corpus_bin
+
+
+def _escribir_jsonl(ruta, registros):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        for registro in registros:
+            f.write((registro if isinstance(registro, str) else json.dumps(registro, ensure_ascii=False)) + '\n')
+
+
+def test_linea_omitida_no_desplaza_las_siguientes(tmp_path):
+    entrada = tmp_path / "corpus.json"
+    _escribir_jsonl(entrada, [
+        {"sentencia": ["a", "b"], "tag": [1, 2]},
+        {"sentencia": ["c", 5], "tag": [3, 4]},        # token no str
+        {"sentencia": ["x", "y"], "tag": [7, 300]},    # etiqueta que no cabe en un byte
+        {"sentencia": ["é", "f"], "tag": [15, 38]},
+    ])
+    salida = tmp_path / "corpus.nerbin"
+
+    estadisticas = corpus_bin.jsonl_a_bin([str(entrada)], str(salida))
+
+    assert estadisticas["omitidas"] == 2
+    with corpus_bin.CorpusBin(str(salida)) as corpus:
+        assert corpus.num_sentences == 2
+        assert corpus.num_tokens == 4
+        assert list(corpus) == [(["a", "b"], [1, 2]), (["é", "f"], [15, 38])]
+        assert corpus.provenance(1) == (str(entrada), 4)
@@ -0,0 +1,62 @@
+import json
+
+from dedup_index import IndiceDuplicados
+
+
+def _escribir_jsonl(ruta, sentencias):
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        for sentencia in sentencias:
+            f.write(json.dumps({"sentencia": sentencia, "tag": [48] * len(sentencia)}) + '\n')
+
+
+def test_carpetas_que_comparten_indice(tmp_path):
+    # "a_b" cae en el rango de "a" si el prefijo se tratara sin el separador final
+    _escribir_jsonl(tmp_path / "a" / "x.json", [["uno"], ["dos"]])
+    _escribir_jsonl(tmp_path / "a" / "y.json", [["uno"]])
+    _escribir_jsonl(tmp_path / "a_b" / "z.json", [["dos"], ["tres"]])
+
+    with IndiceDuplicados(str(tmp_path / "indice.sqlite")) as indice:
+        indice.actualizar(str(tmp_path / "a"))
+        estadisticas = indice.actualizar(str(tmp_path / "a_b"))
+
+        # Indexar otra carpeta no da de baja los archivos de la primera
+        assert estadisticas["eliminados"] == 0
+        assert indice.total_sentencias() == 5
+        assert indice.total_sentencias(str(tmp_path / "a")) == 3
+
+        # "dos" aparece en las dos carpetas, pero solo una vez en cada una
+        duplicados = indice.duplicados(str(tmp_path / "a"))
+        assert list(duplicados.values()) == [[(str(tmp_path / "a" / "x.json"), 1),
+                                              (str(tmp_path / "a" / "y.json"), 1)]]
+        assert not indice.duplicados(str(tmp_path / "a_b"))
+        assert len(indice.duplicados()) == 2
+
+
+def test_archivo_ilegible_no_conserva_sus_sentencias(tmp_path):
+    _escribir_jsonl(tmp_path / "c" / "a.json", [["x", "y"]])
+    _escribir_jsonl(tmp_path / "c" / "b.json", [["z"], ["x", "y"]])
+
+    with IndiceDuplicados(str(tmp_path / "indice.sqlite")) as indice:
+        indice.actualizar(str(tmp_path / "c"))
+        assert len(indice.duplicados()) == 1
+
+        (tmp_path / "c" / "a.json").write_bytes(b'\xff\xfe\n')
+        estadisticas = indice.actualizar(str(tmp_path / "c"))
+
+        assert estadisticas["errores"] == 1
+        assert not indice.duplicados()
+        assert indice.total_sentencias() == 2
+
+
+def test_lineas_sin_sentencia_se_omiten(tmp_path):
+    ruta = tmp_path / "c" / "a.json"
+    ruta.parent.mkdir()
+    ruta.write_text('{"tag": [48]}\n[1, 2]\n{"sentencia": ["x"], "tag": [48]}\n{"sentencia": ["x"], "tag": [48]}\n',
+                    encoding='utf-8')
+
+    with IndiceDuplicados(str(tmp_path / "indice.sqlite")) as indice:
+        estadisticas = indice.actualizar(str(tmp_path / "c"))
+
+        assert estadisticas["reindexados"] == 1
+        assert list(indice.duplicados().values()) == [[(str(ruta), 3), (str(ruta), 4)]]
@@ -0,0 +1,57 @@
+import pytest
+
+from conftest import cargar_script
+
+from tag_schema import TAG_SCHEMA
+
+extractor = cargar_script('all-entity-extractor')
+
+
+def _como_sets(entidades):
+    return {tipo: set(frases) for tipo, frases in entidades.items()}
+
+
+def test_etiquetas_float_enteras():
+    entidades = extractor.extract_entities(['HER2', 'neu', 'positivo'], [1.0, 24.0, 48])
+    assert _como_sets(entidades) == {'STAGE': {'HER2 neu'}}
+    assert _como_sets(extractor.extract_entities(['HER2', 'neu'], [1.0, 25.0])) == {'STAGE': {'HER2'}}
+    assert extractor.get_entity_type(1.0) == 'STAGE'
+
+
+def test_etiquetas_no_numericas_se_ignoran():
+    entidades = extractor.extract_entities(['a', 'b', 'c', 'd'], ['1', None, 12, 35.0])
+    assert _como_sets(entidades) == {'DRUG': {'c d'}}
+
+
+def test_spans_con_etiquetas_float():
+    assert list(TAG_SCHEMA.spans([48, 12.0, 35, 35.0, 1.5, 0])) == [
+        (1, 4, TAG_SCHEMA.type_ids['DRUG']), (5, 6, TAG_SCHEMA.type_ids['AGE'])]
+
+
+def test_modo_lote_igual_que_modo_serie(tmp_path):
+    pytest.importorskip("numpy")
+    ruta = tmp_path / "corpus.json"
+    ruta.write_text('\n'.join([
+        '{"sentencia": ["Ki", "67"], "tag": [15.0, 38]}',
+        '{"sentencia": ["HER2", "neu", "x"], "tag": [1, 24.0, 15.5]}',
+        '{"sentencia": ["a", "b", "c"], "tag": [12, 99999999999999999999999, null]}',
+        '{"sentencia": ["d", "e"], "tag": [12, 35]}',
+    ]) + '\n', encoding='utf-8')
+
+    serie = extractor.process_single_file(str(ruta))[1]
+    lote = extractor.process_single_file(str(ruta), batch=True)[1]
+
+    assert serie == lote
+    assert _como_sets(lote) == {'BIOMARKER': {'Ki 67'}, 'STAGE': {'HER2 neu'}, 'DRUG': {'a', 'd e'}}
+
+
+def test_decodificador_vectorizado_no_trunca_etiquetas_no_enteras():
+    pytest.importorskip("numpy")
+    sentencias = [['Ki', '67', 'x'], ['HER2', 'neu'], ['a', 'b']]
+    tags = [[15.0, 38, 15.5], [1, 24.0], [float('nan'), 12]]
+    lote = extractor.extract_entities_batch(sentencias, tags)
+    serie = {}
+    for sentencia, etiquetas in zip(sentencias, tags):
+        for tipo, frases in extractor.extract_entities(sentencia, etiquetas).items():
+            serie.setdefault(tipo, set()).update(frases)
+    assert _como_sets(lote) == serie == {'BIOMARKER': {'Ki 67'}, 'STAGE': {'HER2 neu'}, 'DRUG': {'b'}}
@@ -0,0 +1,43 @@
+import json
+
+import corpus_bin
+import entity_index
+
+
+def test_jsonl_y_su_nerbin_cuentan_una_vez(tmp_path):
+    carpeta = tmp_path / "corpus"
+    carpeta.mkdir()
+    registros = [(["Ki", "67", "alto"], [15, 38, 48]), (["Ki", "67"], [15, 38])]
+    with open(carpeta / "a.json", 'w', encoding='utf-8') as f:
+        for sentencia, tags in registros:
+            f.write(json.dumps({"sentencia": sentencia, "tag": tags}) + '\n')
+    # .nerbin antiguo, con la ruta de origen relativa a su carpeta
+    with corpus_bin.CorpusWriter(str(carpeta / "a.nerbin")) as writer:
+        for num_linea, (sentencia, tags) in enumerate(registros, start=1):
+            writer.add(sentencia, tags, "a.json", num_linea)
+
+    with entity_index.IndiceEntidades(str(tmp_path / "indice.sqlite")) as indice:
+        indice.actualizar(str(carpeta))
+        (tipo, frase, ubicaciones), = indice.buscar("ki 67")
+        assert ubicaciones == [(str(carpeta / "a.json"), 2, ubicaciones[0][2])]
+        assert entity_index.decodificar_posiciones(ubicaciones[0][2]) == [(1, 0), (2, 0)]
+        assert indice.estadisticas()["apariciones"] == 2
+
+        # Sin el JSONL, las posiciones siguen disponibles a través del .nerbin
+        (carpeta / "a.json").unlink()
+        indice.actualizar(str(carpeta))
+        (_, _, ubicaciones), = indice.buscar("ki 67")
+        assert [(ruta, total) for ruta, total, _ in ubicaciones] == [(str(carpeta / "a.json"), 2)]
+
+
+def test_prefijo_con_el_ultimo_caracter_unicode(tmp_path):
+    ruta = tmp_path / "a.json"
+    frases = ["x\U0010ffff", "x\U0010ffffz", "y"]
+    with open(ruta, 'w', encoding='utf-8') as f:
+        for frase in frases:
+            f.write(json.dumps({"sentencia": [frase], "tag": [12]}) + '\n')
+
+    with entity_index.IndiceEntidades(str(tmp_path / "indice.sqlite")) as indice:
+        indice.actualizar(str(tmp_path))
+        assert [r[1] for r in indice.buscar("x\U0010ffff", prefijo=True)] == frases[:2]
+        assert [r[1] for r in indice.buscar("\U0010ffff", prefijo=True)] == []
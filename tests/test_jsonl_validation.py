@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+import jsonl_validation
+
+
+def test_etiqueta_no_entera_tiene_su_propio_mensaje():
+    lineas = [
+        '{"sentencia": ["a", "b"], "tag": [48, 1.0]}',
+        '{"sentencia": ["a", "b"], "tag": [48, 99]}',
+        '{"sentencia": ["a", "b"], "tag": [0, 23]}',
+    ]
+    mensajes = [error['message'] for error in jsonl_validation.validate_lines(lineas)]
+
+    assert mensajes == [
+        "Etiqueta no entera en la posición 1: 1.0 (los ids deben ser enteros)",
+        f"Etiqueta fuera de rango en la posición 1: 99 (ids válidos 0-{jsonl_validation.OUTSIDE_TAG})",
+    ]
+
+
+LINEAS_ENTEROS_ENORMES = [
+    '{"sentencia": ["a"], "tag": [99999999999999999999999]}',
+    '{"sentencia": ["a"], "tag": [1e23]}',
+    '{"sentencia": ["a", "b"], "tag": [48, 1.0]',
+    '{"sentencia": ["a"], "tag": [48]}',
+]
+
+
+def _mensajes(loads):
+    return [(error['line'], error['message'])
+            for error in jsonl_validation.validate_lines(LINEAS_ENTEROS_ENORMES, loads=loads)]
+
+
+def test_orjson_da_los_mismos_mensajes_que_json():
+    orjson = pytest.importorskip("orjson")
+    assert _mensajes(orjson.loads) == _mensajes(json.loads)
+
+
+def test_cualquier_excepcion_del_backend_vuelve_a_json():
+    def loads(line):
+        # Como simdjson con un entero que no cabe en 64 bits
+        if '99999' in line:
+            raise RuntimeError("BIGINT_ERROR")
+        return json.loads(line)
+
+    mensajes = _mensajes(loads)
+    assert mensajes == _mensajes(json.loads)
+    assert [linea for linea, _ in mensajes] == [1, 2, 3]
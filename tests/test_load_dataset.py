@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+pytest.importorskip("datasets")
+pytest.importorskip("pyarrow")
+
+import load_dataset_mama_es
+
+
+def _escribir(ruta, sentencias):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        for sentencia in sentencias:
+            f.write(json.dumps({"sentencia": sentencia, "tag": [48] * len(sentencia)}) + '\n')
+    return str(ruta)
+
+
+def test_parquet_con_varios_archivos_por_split(tmp_path):
+    train = [_escribir(tmp_path / "train-0.json", [["a"], ["b", "c"]]),
+             _escribir(tmp_path / "train-1.json", [["d"]])]
+    valid = _escribir(tmp_path / "valid.json", [["e"]])
+    test = [_escribir(tmp_path / "test.json", [["f"]])]
+
+    dataset = load_dataset_mama_es.load_dataset_from_parquet(
+        train, valid, test, parquet_dir=str(tmp_path / "parquet"), batch_size=2)
+
+    assert dataset['train']['sentencia'] == [["a"], ["b", "c"], ["d"]]
+    assert dataset['validation']['sentencia'] == [["e"]]
+    assert dataset['test']['tag'] == [[48]]
+    assert dataset['train'].features == load_dataset_mama_es.FEATURES
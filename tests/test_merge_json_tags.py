@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+import corpus_bin
+from merge_json_tags import merge_json_files, merge_json_lines
+
+REGISTROS = [
+    {"sentencia": ["Ki-67", "del", "20%"], "tag": [15, 48, 38]},
+    {"sentencia": [], "tag": []},
+    {"sentencia": ["ñandú", "\"x\""], "tag": [48, 48]},
+]
+
+
+def _escribir(ruta, registros):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        for registro in registros:
+            f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        f.write('\n')
+    return str(ruta)
+
+
+def test_union_en_streaming_igual_que_en_memoria(tmp_path):
+    entrada = _escribir(tmp_path / "a.json", REGISTROS)
+    salida = tmp_path / "a_merged.json"
+
+    assert merge_json_files([entrada], str(salida)) == (3, 5)
+    with open(tmp_path / "esperado.json", 'w', encoding='utf-8') as f:
+        json.dump(merge_json_lines(entrada), f, ensure_ascii=False)
+    assert salida.read_bytes() == (tmp_path / "esperado.json").read_bytes()
+
+
+def test_union_de_json_y_nerbin_con_npy(tmp_path):
+    np = pytest.importorskip("numpy")
+    a = _escribir(tmp_path / "a.json", REGISTROS)
+    b = _escribir(tmp_path / "b.json", REGISTROS[:1])
+    corpus_bin.jsonl_a_bin([b], str(tmp_path / "b.nerbin"))
+    salida = tmp_path / "todo.json"
+
+    assert merge_json_files([a, str(tmp_path / "b.nerbin")], str(salida), str(tmp_path / "todo")) == (4, 8)
+    unido = json.loads(salida.read_text(encoding='utf-8'))
+    assert unido["sentencia"] == ["Ki-67", "del", "20%", "ñandú", "\"x\"", "Ki-67", "del", "20%"]
+    assert unido["tag"] == [15, 48, 38, 48, 48, 15, 48, 38]
+    assert np.load(tmp_path / "todo.tags.npy", mmap_mode='r').tolist() == unido["tag"]
+    assert np.load(tmp_path / "todo.offsets.npy").tolist() == [0, 3, 3, 5, 8]
+
+
+def test_error_no_deja_salida_a_medias(tmp_path):
+    salida = tmp_path / "todo.json"
+    salida.write_text("anterior", encoding='utf-8')
+    malo = tmp_path / "malo.json"
+    malo.write_text('{"sentencia": ["a"], "tag": [1]}\n{no es json\n', encoding='utf-8')
+
+    with pytest.raises(json.JSONDecodeError):
+        merge_json_files([_escribir(tmp_path / "a.json", REGISTROS), str(malo)], str(salida))
+    assert salida.read_text(encoding='utf-8') == "anterior"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.json", "malo.json", "todo.json"]
@@ -0,0 +1,25 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from near_duplicates import DetectorCasiDuplicados
+
+
+def _cambiar(tokens, n):
+    tokens = list(tokens)
+    for k in range(n):
+        tokens[k * 3] = f"x{k}"
+    return tokens
+
+
+def test_grupos_no_son_transitivos():
+    a = [f"t{i}" for i in range(20)]
+    b, c = _cambiar(a, 1), _cambiar(a, 2)
+    detector = DetectorCasiDuplicados(umbral=0.78)
+    for tokens in (a, ["otra", "cosa", "distinta"], b, c, a):
+        detector.agregar(tokens)
+    # a ~ b y b ~ c, pero c no llega al umbral respecto de a
+    assert detector.similitud(0, 2)[0] >= 0.78 and detector.similitud(2, 3)[0] >= 0.78
+    assert detector.similitud(0, 3)[0] < 0.78
+
+    assert [ids.tolist() for ids in detector.grupos()] == [[0, 2, 4]]
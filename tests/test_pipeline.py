@@ -0,0 +1,88 @@
+import json
+import random
+
+import pytest
+
+import pipeline
+
+
+def _escribir(ruta, filas):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        for fila in filas:
+            f.write((fila if isinstance(fila, str) else json.dumps(fila)) + '\n')
+
+
+def _leer_splits(directorio):
+    return {nombre: [json.loads(linea) for linea in open(directorio / f"{nombre}.json", encoding='utf-8')]
+            for nombre in pipeline.SPLIT_NAMES}
+
+
+def test_pipeline_descarta_invalidos_y_duplicados(tmp_path):
+    a, b = tmp_path / "a.json", tmp_path / "b.json"
+    _escribir(a, [{"sentencia": ["El", "tumor"], "tag": [48, 0]},
+                  {"sentencia": ["x"], "tag": [48, 48]},
+                  "{no es json"])
+    _escribir(b, [{"sentencia": ["El", "tumor"], "tag": [48, 0]},
+                  {"sentencia": ["Otra"], "tag": [48]}])
+
+    etapas, dataset = pipeline.ejecutar_pipeline([str(a), str(b)], directorio=tmp_path / "salida", seed=0)
+
+    assert dataset is None
+    por_nombre = {etapa.nombre: etapa for etapa in etapas}
+    assert (por_nombre['leer'].entrada, por_nombre['leer'].descartados) == (5, 1)
+    assert por_nombre['validar'].descartados == 1
+    assert por_nombre['deduplicar'].descartados == 1
+    escritas = [fila["sentencia"] for filas in _leer_splits(tmp_path / "salida").values() for fila in filas]
+    assert sorted(escritas) == [["El", "tumor"], ["Otra"]]
+
+
+def test_pipeline_estratificado_respeta_la_tolerancia(tmp_path):
+    rng = random.Random(0)
+    rutas = []
+    for n in range(40):
+        inicios = rng.sample(range(23), 3)
+        filas = []
+        for _ in range(max(1, int(rng.lognormvariate(2, 1)))):
+            inicio = rng.choice(inicios)
+            filas.append({"sentencia": [f"t{n}_{len(filas)}", "b", "c", "d"], "tag": [inicio, inicio + 23, 48, 48]})
+        rutas.append(str(tmp_path / f"{n:02d}.json"))
+        _escribir(rutas[-1], filas)
+
+    etapas, _ = pipeline.ejecutar_pipeline(rutas, asignador='estratificado', seed=1, directorio=tmp_path / "salida")
+
+    splits = _leer_splits(tmp_path / "salida")
+    assert all(splits.values())
+    assert sum(map(len, splits.values())) == etapas[-1].salida
+
+
+def test_dividir_fuera_de_tolerancia_no_trunca_la_salida(tmp_path, monkeypatch):
+    salida = tmp_path / "salida"
+    salida.mkdir()
+    (salida / "train.json").write_text("anterior\n", encoding='utf-8')
+    monkeypatch.setattr(pipeline, 'balanced_assign', lambda *args: (
+        [[0], [], []], [("Líneas", 1, 1, 0.2, 0.02), ("Tipo", 1, 1, 0.0, 0.02)]))
+    registros = [pipeline.Registro(["a"], [48], "a.json", 1)]
+
+    flujo = pipeline.escribir_splits(
+        pipeline.dividir(iter(registros), pipeline.EstadisticasEtapa('dividir'), asignador='estratificado'),
+        pipeline.EstadisticasEtapa('escribir'), directorio=salida)
+    with pytest.raises(ValueError, match="Líneas ±20.0%") as error:
+        list(flujo)
+    assert "Tipo" not in str(error.value)
+    assert (salida / "train.json").read_text(encoding='utf-8') == "anterior\n"
+
+
+def test_pipeline_con_workers_igual_que_en_serie(tmp_path):
+    rutas = []
+    for n in range(6):
+        rutas.append(str(tmp_path / f"{n}.json"))
+        _escribir(rutas[-1], [{"sentencia": [f"s{n}", str(i % 3)], "tag": [12, 35]} for i in range(5)]
+                  + ['{"sentencia": ["x"]}'])
+
+    salidas = {}
+    for workers in (1, 2):
+        directorio = tmp_path / f"salida{workers}"
+        etapas, _ = pipeline.ejecutar_pipeline(rutas, seed=3, directorio=directorio, workers=workers)
+        salidas[workers] = (_leer_splits(directorio), [(e.entrada, e.salida, e.descartados) for e in etapas[-3:]])
+    assert salidas[1] == salidas[2]
+    assert salidas[1][1][0] == (30, 18, 12)  # deduplicar: tres sentencias distintas por archivo
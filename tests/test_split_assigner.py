@@ -0,0 +1,50 @@
+import json
+import random
+
+import split_assigner
+from conftest import cargar_script
+
+
+def _conteos(num_archivos, seed):
+    rng = random.Random(seed)
+    lineas = [rng.randint(1, 200) for _ in range(num_archivos)]
+    entidades = [{rng.randrange(24): rng.randint(1, 30) for _ in range(rng.randint(0, 6))}
+                 for _ in range(num_archivos)]
+    return lineas, entidades
+
+
+def test_reparto_de_tres_splits_igual_que_el_general():
+    lineas, entidades = _conteos(500, 3)
+    rapido = split_assigner.stratified_assign(lineas, entidades, seed=3)
+    # Con un cuarto split vacío se usa el bucle general; sin archivos, el resultado es el mismo
+    general = split_assigner.stratified_assign(lineas, entidades, (0.8, 0.1, 0.1, 1e-300), seed=3)
+    assert general[3] == []
+    assert general[:3] == rapido
+
+
+def test_tolerancia_de_dimensiones_con_archivos_grandes():
+    tolerancias = split_assigner.dimension_tolerances([10, 10, 80], [{0: 1}, {0: 1, 3: 5}, {}], 0.02)
+    assert tolerancias[0] == 0.8    # un archivo tiene el 80 % de las líneas
+    assert tolerancias[1] == 0.5
+    assert tolerancias[4] == 1.0
+    assert tolerancias[2] == 0.02   # tipo sin entidades
+
+
+def test_divisor_estratificado_con_pocos_archivos(tmp_path, monkeypatch):
+    rng = random.Random(0)
+    carpeta = tmp_path / "corpus"
+    carpeta.mkdir()
+    for n in range(40):
+        # Archivos de longitud muy variable, cada uno con sus propios tipos de entidad
+        inicios = rng.sample(range(23), 3)
+        with open(carpeta / f"{n:02d}.json", 'w', encoding='utf-8') as f:
+            for _ in range(max(1, int(rng.lognormvariate(2, 1)))):
+                inicio = rng.choice(inicios)
+                tags = [inicio, inicio + 23, 48, 48]
+                f.write(json.dumps({"sentencia": ["t"] * 4, "tag": tags}) + '\n')
+    monkeypatch.chdir(tmp_path)
+    divisor = cargar_script('split_data_train-valid-test')
+
+    assert divisor.process_folders(assigner='estratificado', seed=1)
+    for nombre in ('train.json', 'valid.json', 'test.json'):
+        assert (tmp_path / "output_data" / nombre).stat().st_size > 0
@@ -0,0 +1,49 @@
+import os
+
+from script_tokenizeText import txt_to_jsonl
+from stage_cache import CacheEtapas
+
+
+def test_acierto_con_el_archivo_sin_cambios(tmp_path):
+    ruta = tmp_path / "a.json"
+    ruta.write_text('{"sentencia": ["a"], "tag": [48]}\n', encoding='utf-8')
+    llamadas = []
+
+    def contar():
+        llamadas.append(1)
+        return {"lineas": len(llamadas)}
+
+    with CacheEtapas(str(tmp_path / "cache")) as cache:
+        assert cache.calcular(str(ruta), 'validar', contar, version=1) == {"lineas": 1}
+        assert cache.calcular(str(ruta), 'validar', contar, version=1) == {"lineas": 1}
+        assert (cache.aciertos, len(llamadas)) == (1, 1)
+
+        # Otros parámetros u otro contenido son otra clave
+        assert cache.calcular(str(ruta), 'validar', contar, version=2) == {"lineas": 2}
+        ruta.write_text('{"sentencia": ["b"], "tag": [48]}\n', encoding='utf-8')
+        os.utime(ruta, ns=(1, 1))
+        assert cache.calcular(str(ruta), 'validar', contar, version=1) == {"lineas": 3}
+
+    # Una caché reabierta sobre el mismo directorio conserva los resultados
+    with CacheEtapas(str(tmp_path / "cache")) as cache:
+        assert cache.calcular(str(ruta), 'validar', contar, version=1) == {"lineas": 3}
+        assert len(llamadas) == 3
+
+
+def test_tokenizado_repetido_sale_de_la_cache(tmp_path, monkeypatch):
+    entrada = tmp_path / "textos.txt"
+    entrada.write_text("Ki-67 del 3.5%\n\nHER2/neu 3+\n", encoding='utf-8')
+    salida = tmp_path / "textos_valid.json"
+
+    with CacheEtapas(str(tmp_path / "cache")) as cache:
+        assert txt_to_jsonl(str(entrada), str(salida), cache) == 2
+        esperado = salida.read_bytes()
+        salida.unlink()
+
+        def no_tokenizar(*args):
+            raise AssertionError("no debería volver a tokenizar")
+
+        monkeypatch.setattr('script_tokenizeText.tokenize_line', no_tokenizar)
+        assert txt_to_jsonl(str(entrada), str(salida), cache) == 2
+        assert salida.read_bytes() == esperado
+        assert cache.aciertos == 1
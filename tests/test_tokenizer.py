@@ -0,0 +1,32 @@
+import json
+
+from script_tokenizeText import TOKEN_PATTERN, _txt_to_jsonl_chunked, tokenize_line, txt_to_jsonl
+
+
+def test_decimales_y_porcentajes():
+    assert tokenize_line("Ki-67 del 3.5 y RE 2.5% (HER2/neu 3+)") == [
+        "Ki-67", "del", "3.5", "y", "RE", "2.5%", "(", "HER2/neu", "3+", ")"]
+    # Un punto sin dígitos detrás no forma parte del número
+    assert tokenize_line("mide 3. Tras 90%.") == ["mide", "3", ".", "Tras", "90%", "."]
+
+
+def test_atajo_igual_que_la_expresion_regular():
+    import re
+    findall = re.compile(TOKEN_PATTERN, re.X).findall
+    for linea in ("T2N0M0 ciclo 12 de 6", "Dosis 75mg/m2 cada 21 días", "pT1c ² ½ año2024 2024año"):
+        assert tokenize_line(linea) == findall(linea)
+
+
+def test_tokenizado_paralelo_igual_que_en_serie(tmp_path):
+    entrada = tmp_path / "textos.txt"
+    lineas = [f"Paciente {i} con Ki-67 del {i % 40}.5% y dosis {i}mg/m2 — ñandú" for i in range(3000)]
+    lineas[10:13] = ["", "   ", "\tsolo tabulador\t"]
+    # Saltos \r\n y \r, que el modo texto trata como fin de línea
+    entrada.write_bytes(("\r\n".join(lineas[:1500]) + "\r" + "\n".join(lineas[1500:]) + "\n").encode('utf-8'))
+    serie, paralelo = tmp_path / "serie.json", tmp_path / "paralelo.json"
+
+    assert txt_to_jsonl(str(entrada), str(serie)) == 2998
+    assert _txt_to_jsonl_chunked(str(entrada), str(paralelo), workers=2, chunk_bytes=4096) == 2998
+    assert paralelo.read_bytes() == serie.read_bytes()
+    primera = json.loads(serie.read_text(encoding='utf-8').splitlines()[0])
+    assert primera == {"sentencia": tokenize_line(lineas[0]), "tag": [48] * len(primera["sentencia"])}
@@ -1,90 +1,49 @@
-import json
 import sys
 import os
 import glob
+import argparse
 
-def validate_jsonl_file(file_path):
+from jsonl_validation import (BACKENDS, LEVEL_WARNING, load_backend, validate_file, validate_file_cached, validate_files,
+                              print_file_result)
+
+def validate_jsonl_file(file_path, backend=None, semantic=True, cache=None):
     """
     Valida un archivo JSONL que contiene anotaciones de tokens y etiquetas.
     
     Args:
         file_path (str): Ruta al archivo JSONL a validar
+        backend (str): Backend de parseo (None: el más rápido instalado)
+        semantic (bool): Comprobar también que las etiquetas existan y sigan el esquema BIO
+        cache (CacheEtapas): Reutilizar el resultado si el contenido del archivo no cambió
         
     Returns:
         int: Número de errores encontrados
     """
-    error_count = 0
-    
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            for line_number, line in enumerate(file, 1):
-                try:
-                    # Verificar que la línea no esté vacía
-                    if not line.strip():
-                        print(f"\033[93m⚠️  Línea {line_number}: Línea vacía (permitida en JSONL)\033[0m")
-                        error_count += 1
-                        continue
-                    
-                    # Intentar parsear el JSON
-                    data = json.loads(line)
-                    
-                    # Verificar que el JSON tiene las claves requeridas
-                    if not all(key in data for key in ['sentencia', 'tag']):
-                        print(f"\033[91m❌ Línea {line_number}: Faltan claves requeridas 'sentencia' o 'tag'\033[0m")
-                        error_count += 1
-                        continue
-                    
-                    # Verificar que los valores son listas
-                    if not isinstance(data['sentencia'], list) or not isinstance(data['tag'], list):
-                        print(f"\033[91m❌ Línea {line_number}: 'sentencia' y 'tag' deben ser listas\033[0m")
-                        error_count += 1
-                        continue
-                    
-                    # Verificar que las longitudes coinciden
-                    if len(data['sentencia']) != len(data['tag']):
-                        print(f"\033[91m❌ Línea {line_number}: Longitud discrepante | Sentencia: {len(data['sentencia'])} vs Tag: {len(data['tag'])}\033[0m")
-                        error_count += 1
-                        continue
-                    
-                    # Verificar que todos los elementos en 'tag' son números
-                    if not all(isinstance(tag, (int, float)) for tag in data['tag']):
-                        print(f"\033[91m❌ Línea {line_number}: Todos los elementos en 'tag' deben ser números\033[0m")
-                        error_count += 1
-                        continue
-                    
-                    # Verificar que todos los elementos en 'sentencia' son strings
-                    if not all(isinstance(token, str) for token in data['sentencia']):
-                        print(f"\033[91m❌ Línea {line_number}: Todos los elementos en 'sentencia' deben ser strings\033[0m")
-                        error_count += 1
-                        continue
-                    
-                except json.JSONDecodeError as e:
-                    print(f"\033[91m❌ Línea {line_number}: {str(e)}\033[0m")
-                    error_count += 1
-                    
-    except FileNotFoundError:
-        print(f"\033[91m❌ Error: No se pudo encontrar el archivo '{file_path}'\033[0m")
-        return 1
-    except Exception as e:
-        print(f"\033[91m❌ Error inesperado: {str(e)}\033[0m")
-        return 1
-    
-    if error_count == 0:
-        print(f"\033[92m✅ {file_path} válido con la estructura requerida.\033[0m")
+    if cache is not None:
+        errors = validate_file_cached(file_path, cache, backend=backend, semantic=semantic)
     else:
-        print(f"\n\033[91m❌ Se encontraron {error_count} errores en {file_path}\033[0m")
-    
-    return error_count
+        errors = validate_file(file_path, backend=backend, semantic=semantic)
+    print_file_result(file_path, errors)
+    return len(errors)
 
-def validate_all_jsonl_files():
+def validate_all_jsonl_files(directory='.', jobs=1, backend=None, semantic=True, cache=None):
     """
-    Busca y valida todos los archivos .json y .jsonl en el directorio actual.
+    Busca y valida todos los archivos .json y .jsonl de un directorio.
+    
+    Args:
+        directory (str): Directorio a validar (por defecto, el actual)
+        jobs (int): Procesos de validación. Con jobs > 1 los archivos se validan en
+            paralelo y, en lugar de imprimir cada archivo, se genera un único reporte
+            con los errores de los archivos inválidos al final
+        backend (str): Backend de parseo (None: el más rápido instalado)
+        semantic (bool): Comprobar también que las etiquetas existan y sigan el esquema BIO
+        cache (CacheEtapas): Caché de etapas; los archivos sin cambios no se vuelven a validar
     
     Returns:
         dict: Diccionario con resultados de la validación
     """
-    # Buscar todos los archivos .json y .jsonl en el directorio actual
-    json_files = glob.glob("*.json") + glob.glob("*.jsonl")
+    # Buscar todos los archivos .json y .jsonl en el directorio
+    json_files = glob.glob("*.json", root_dir=directory) + glob.glob("*.jsonl", root_dir=directory)
     
     if not json_files:
         print("\033[93m⚠️  No se encontraron archivos .json o .jsonl en el directorio actual\033[0m")
@@ -94,23 +53,38 @@ def validate_all_jsonl_files():
     valid_files = 0
     invalid_files = 0
     total_errors = 0
+    total_warnings = 0
     invalid_files_list = []
+    errors_by_file = {}
     
     print(f"\n\033[1mValidando {total_files} archivos JSONL en el directorio actual...\033[0m\n")
     
-    for json_file in json_files:
-        print(f"\n\033[1m{'-' * 50}\033[0m")
-        print(f"\033[1mValidando: {json_file}\033[0m")
-        print(f"\033[1m{'-' * 50}\033[0m\n")
+    file_paths = [os.path.join(directory, json_file) for json_file in json_files]
+    for json_file, (_, errors) in zip(json_files, validate_files(file_paths, jobs, backend, semantic, cache)):
+        if jobs <= 1:
+            print(f"\n\033[1m{'-' * 50}\033[0m")
+            print(f"\033[1mValidando: {json_file}\033[0m")
+            print(f"\033[1m{'-' * 50}\033[0m\n")
+            print_file_result(json_file, errors)
         
-        error_count = validate_jsonl_file(json_file)
+        error_count = len(errors)
         total_errors += error_count
+        total_warnings += sum(1 for error in errors if error["level"] == LEVEL_WARNING)
         
         if error_count == 0:
             valid_files += 1
         else:
             invalid_files += 1
             invalid_files_list.append({"file": json_file, "errors": error_count})
+            errors_by_file[json_file] = errors
+    
+    # Reporte agregado del modo paralelo: solo los archivos con errores
+    if jobs > 1:
+        for json_file, errors in errors_by_file.items():
+            print(f"\n\033[1m{'-' * 50}\033[0m")
+            print(f"\033[1mErrores en: {json_file}\033[0m")
+            print(f"\033[1m{'-' * 50}\033[0m\n")
+            print_file_result(json_file, errors)
     
     # Resumen final
     print(f"\n\033[1m{'-' * 50}\033[0m")
@@ -122,6 +96,8 @@ def validate_all_jsonl_files():
     if invalid_files > 0:
         print(f"\033[91mArchivos con errores: {invalid_files}\033[0m")
         print(f"\033[91mTotal de errores encontrados: {total_errors}\033[0m")
+        if total_warnings:
+            print(f"\033[93m  (de ellos, {total_warnings} líneas vacías)\033[0m")
         
         # Listar archivos con errores
         print(f"\n\033[1mLISTA DE ARCHIVOS CON ERRORES:\033[0m")
@@ -138,5 +114,28 @@ def validate_all_jsonl_files():
 
 # Ejecución principal
 if __name__ == "__main__":
-    results = validate_all_jsonl_files()
+    parser = argparse.ArgumentParser(description="Valida todos los archivos .json y .jsonl de un directorio.")
+    parser.add_argument('directorio', nargs='?', default='.', help="Directorio a validar (por defecto, el actual)")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="Procesos de validación; con más de uno se imprime un único reporte al final")
+    parser.add_argument('--parser', choices=['auto'] + list(BACKENDS), default='auto',
+                        help="Backend de parseo JSON (por defecto, el más rápido instalado que rechaza lo mismo que json)")
+    parser.add_argument('--solo-estructura', action='store_true',
+                        help="No comprobar ids de etiqueta ni transiciones BIO, solo la estructura")
+    parser.add_argument('--cache', nargs='?', const='.cache_etapas', default=None,
+                        help="Reutilizar los resultados de los archivos sin cambios (directorio de la caché)")
+    args = parser.parse_args()
+    
+    try:
+        backend = load_backend(args.parser).name
+    except ImportError:
+        parser.error(f"el backend '{args.parser}' no está instalado")
+    
+    cache = None
+    if args.cache:
+        from stage_cache import CacheEtapas
+        cache = CacheEtapas(args.cache)
+    
+    results = validate_all_jsonl_files(args.directorio, jobs=args.jobs, backend=backend,
+                                       semantic=not args.solo_estructura, cache=cache)
     sys.exit(1 if results["invalid_files"] > 0 else 0)
@@ -0,0 +1,115 @@
+"""
+Vocabulario compartido de tokens internados como ids enteros.
+
+Los textos clínicos repiten mucho su vocabulario, y json.loads crea un str nuevo por
+cada token de cada línea: un corpus de millones de sentencias guardado como listas de
+str ocupa decenas de bytes por token. Con un Vocabulary cada token distinto se guarda
+una sola vez y cada sentencia pasa a ser un array('I') de ids (4 bytes por token).
+
+La tabla token -> id es un dict de CPython, que ya es una tabla hash compacta (índices
+de pocos bytes sobre un arreglo denso de entradas), y la tabla id -> token es una lista
+que apunta a los mismos objetos str que las claves del dict, así que cada token
+distinto existe una única vez en memoria.
+
+Lo usan el modo --batch de all-entity-extractor.py, el modo en memoria de
+detect_duplicates.py y los buffers del modo en memoria de split_data_train-valid-test.py.
+"""
+
+from array import array
+
+
+class Vocabulary:
+    """
+    Asigna ids consecutivos (desde 0) a los tokens en orden de primera aparición.
+
+    Args:
+        tokens (iterable): Tokens con los que se inicializa el vocabulario
+    """
+
+    __slots__ = ('_ids', '_tokens')
+
+    def __init__(self, tokens=()):
+        self._ids = {}
+        self._tokens = []
+        for token in tokens:
+            self.id(token)
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def __contains__(self, token):
+        return token in self._ids
+
+    def id(self, token):
+        """Id de un token, que se añade al vocabulario si aún no está."""
+        token_id = self._ids.get(token)
+        if token_id is None:
+            token_id = self._ids[token] = len(self._tokens)
+            self._tokens.append(token)
+        return token_id
+
+    def token(self, token_id):
+        return self._tokens[token_id]
+
+    def intern(self, token):
+        """El objeto str guardado para un token igual, para no tener copias en memoria."""
+        return self._tokens[self.id(token)]
+
+    def encode(self, tokens):
+        """
+        Convierte una secuencia de tokens en un array('I') de ids, internando los nuevos.
+
+        Returns:
+            array: Ids de los tokens, en el mismo orden
+        """
+        try:
+            # Caso habitual cuando el vocabulario ya está formado: ningún token nuevo
+            return array('I', map(self._ids.__getitem__, tokens))
+        except KeyError:
+            return array('I', map(self.id, tokens))
+
+    def extend(self, ids, tokens):
+        """Añade al final de `ids` (un array('I')) los ids de `tokens`."""
+        start = len(ids)
+        try:
+            ids.extend(map(self._ids.__getitem__, tokens))
+        except KeyError:
+            # extend con un iterador deja añadidos los ids anteriores al token nuevo
+            del ids[start:]
+            ids.extend(map(self.id, tokens))
+
+    def decode(self, ids):
+        """Lista de tokens de una secuencia de ids."""
+        return list(map(self._tokens.__getitem__, ids))
+
+    def view(self, ids):
+        """Secuencia de solo lectura que presenta los ids como tokens (ver TokenView)."""
+        return TokenView(self, ids)
+
+
+class TokenView:
+    """
+    Vista de una secuencia de ids como secuencia de tokens.
+
+    Indexar devuelve el token y un corte devuelve la lista de tokens del tramo, así que
+    el código que une frases con ' '.join(sentencia[i:j]) (extract_entities,
+    bio_spans.span_phrases) funciona sobre ella sin cambios y solo decodifica los
+    tramos que usa.
+    """
+
+    __slots__ = ('_tokens', 'ids')
+
+    def __init__(self, vocabulary, ids):
+        self._tokens = vocabulary._tokens
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(map(self._tokens.__getitem__, self.ids[index]))
+        return self._tokens[self.ids[index]]
+
+    def __iter__(self):
+        return map(self._tokens.__getitem__, self.ids)